@@ -0,0 +1,12 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse serialized with orjson. Routes return it directly, which also
+    skips FastAPI's jsonable_encoder walk over every nested payload dict.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
@@ -1,10 +1,23 @@
 from fastapi import APIRouter
-from app.models.query_models import QueryRequest
-from app.services.qdrant_service import search_vectors
+from app.api.responses import FastJSONResponse
+from app.models.query_models import QueryRequest, BatchQueryRequest
+from app.services.qdrant_service import search_vectors, search_vectors_batch, cache_stats
 
 router = APIRouter()
 
-@router.post("/search")
+@router.post("/search", response_class=FastJSONResponse)
 async def search(request: QueryRequest):
-    results = await search_vectors(request.query, request.top_k)
-    return {"matches": results}
\ No newline at end of file
+    results = await search_vectors(request.query, request.top_k, request.filters, request.fields, request.snippet_chars)
+    return FastJSONResponse({"matches": results})
+
+@router.post("/search/batch", response_class=FastJSONResponse)
+async def search_batch(request: BatchQueryRequest):
+    results = await search_vectors_batch(
+        request.queries, request.top_k, request.filters, request.fields, request.snippet_chars
+    )
+    return FastJSONResponse({"results": [{"query": q, "matches": m} for q, m in zip(request.queries, results)]})
+
+@router.get("/cache/stats")
+async def search_cache_stats():
+    """Hit rates of the query-vector and search-result caches of this worker."""
+    return cache_stats()
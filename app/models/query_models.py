@@ -1,5 +1,36 @@
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Annotated
+from pydantic import BaseModel, Field
 
-class QueryRequest(BaseModel):
+class SearchFilters(BaseModel):
+    """
+    Restrict a search to matching chunks. Fields are ANDed; a list matches any
+    of its values. All fields are indexed payload fields, so filtering happens
+    inside Qdrant's HNSW search rather than on an over-fetched result list.
+    """
+    domain: list[str] | None = Field(None, description="Site of URL sources, e.g. 'index.hr' (www. is ignored)")
+    source: list[str] | None = Field(None, description="Exact source URL or path")
+    doc_id: list[str] | None = None
+    extension: list[str] | None = Field(None, description="File type of the original file, e.g. 'pdf' or '.docx'")
+    ingested_after: datetime | None = None
+    ingested_before: datetime | None = None
+
+class ResultOptions(BaseModel):
+    """What each match carries besides its id and score; smaller responses serialize and transfer faster."""
+    fields: list[str] | None = Field(
+        None, description="Payload fields to return, e.g. ['text', 'source']; [] for ids and scores only; all if unset",
+    )
+    snippet_chars: int | None = Field(
+        None, ge=20, le=10_000, description="Cut the returned 'text' to about this many characters",
+    )
+
+class QueryRequest(ResultOptions):
     query: str = Field(..., min_length=3, max_length=512)
-    top_k: int = Field(3, ge=1, le=30)
\ No newline at end of file
+    top_k: int = Field(3, ge=1, le=30)
+    filters: SearchFilters | None = None
+
+class BatchQueryRequest(ResultOptions):
+    """Several queries (e.g. reformulations of one question) answered in one round trip."""
+    queries: list[Annotated[str, Field(min_length=3, max_length=512)]] = Field(..., min_length=1, max_length=32)
+    top_k: int = Field(3, ge=1, le=30)
+    filters: SearchFilters | None = None  # applied to every query
@@ -0,0 +1,298 @@
+import os
+import json
+import logging
+import math
+import asyncio
+import bisect
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Directory where every worker process writes a snapshot of its metrics, so that
+# /metrics can answer for all of them (serve_api.py sets it up). Unset: per-process metrics.
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_SYNC_SECONDS = float(os.getenv("METRICS_SYNC_SECONDS", "1"))
+
+# Latency buckets in seconds: sub-millisecond cache hits up to multi-second stalls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """
+    Base of the metric types: a name, a help text and one series per label
+    combination. Counters and gauges can take a `callback` instead of being
+    updated: a function returning {label values tuple: value}, called at scrape time.
+    """
+
+    kind = "untyped"
+    # How the series of several worker processes are combined: "sum", or
+    # "worker" to keep one series per process under a `worker` label
+    aggregate = "sum"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), callback=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _current(self) -> dict:
+        if self.callback is not None:
+            return self.callback()
+        with self._lock:
+            return dict(self._series)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric '{self.name}' expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self):
+        """(suffix, labels, value) triples of the current values."""
+        raise NotImplementedError
+
+    def render(self, samples=None) -> str:
+        """The metric in the text format, with `samples` instead of the current values if given."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        samples = self.samples() if samples is None else samples
+        lines += [f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}" for suffix, labels, value in samples]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def samples(self):
+        return [("_total", dict(zip(self.labelnames, key)), value) for key, value in self._current().items()]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), callback=None, aggregate: str = "sum"):
+        super().__init__(name, help, labelnames, callback)
+        self.aggregate = aggregate
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the enclosed block as in progress."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        return [("", dict(zip(self.labelnames, key)), value) for key, value in self._current().items()]
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, plus their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the enclosed block, in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            series = {key: ([*counts], total, count) for key, (counts, total, count) in self._series.items()}
+        samples = []
+        for key, (counts, total, count) in series.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                samples.append(("_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, count))
+        return samples
+
+
+class Registry:
+    """
+    The metrics of a process. With a `directory`, render() answers for every
+    process that writes its snapshot there: counters and histograms are summed
+    over all snapshots, including those of exited workers, so they never go
+    back; gauges only over the processes still running.
+    """
+
+    def __init__(self, directory: str | None = None):
+        self._metrics: dict[str, Metric] = {}
+        self.directory = directory
+        self._process = None  # (pid, start time) of the process writing the snapshots
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> dict:
+        """{metric name: [[suffix, label pairs, value], ...]} of this process."""
+        return {name: [[suffix, list(labels.items()), value] for suffix, labels, value in m.samples()]
+                for name, m in self._metrics.items()}
+
+    def write_snapshot(self):
+        """Replace this process' snapshot file in `directory` (atomically, readers never see half of it)."""
+        if not self.directory:
+            return
+        # Stamped by the process itself, not inherited through fork(): the start
+        # time tells a restarted worker from an exited one that had the same pid
+        if self._process is None or self._process[0] != os.getpid():
+            self._process = (os.getpid(), time.time_ns())
+        pid, started = self._process
+        path = Path(self.directory) / f"{pid}_{started}.json"
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def _read_snapshots(self):
+        """(pid, running, snapshot) of every snapshot file in `directory`."""
+        files = []
+        for path in Path(self.directory).glob("*.json"):
+            try:
+                pid, started = map(int, path.stem.split("_"))
+                files.append((pid, started, json.loads(path.read_text())))
+            except (ValueError, OSError):
+                continue  # not ours, or removed since the glob
+        latest = {}
+        for pid, started, _ in files:
+            latest[pid] = max(started, latest.get(pid, started))
+        return [(pid, started == latest[pid] and _running(pid), snapshot) for pid, started, snapshot in files]
+
+    def _merged_samples(self) -> dict:
+        merged = {name: {} for name in self._metrics}
+        for pid, running, snapshot in self._read_snapshots():
+            for name, samples in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.kind == "gauge" and not running):
+                    continue
+                for suffix, labels, value in samples:
+                    if metric.aggregate == "worker":
+                        labels = labels + [["worker", str(pid)]]
+                    key = (suffix, tuple(map(tuple, labels)))
+                    merged[name][key] = merged[name].get(key, 0) + value
+        return {name: [(suffix, dict(labels), value) for (suffix, labels), value in series.items()]
+                for name, series in merged.items()}
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        if not self.directory:
+            return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+        self.write_snapshot()
+        merged = self._merged_samples()
+        return "\n".join(m.render(merged[name]) for name, m in self._metrics.items()) + "\n"
+
+
+def _running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# -----------------------------------------------------------
+# The API's metrics. With METRICS_DIR set, a scrape of any worker
+# returns the totals of all workers sharing that directory.
+# -----------------------------------------------------------
+registry = Registry(METRICS_DIR)
+
+request_seconds = registry.register(Histogram(
+    "api_request_duration_seconds", "Time from request received to response sent.", ("route", "status")))
+requests_in_flight = registry.register(Gauge(
+    "api_requests_in_flight", "Requests being handled right now."))
+encode_seconds = registry.register(Histogram(
+    "search_encode_duration_seconds", "Time a search waited for its query embedding(s), queueing included."))
+qdrant_seconds = registry.register(Histogram(
+    "search_qdrant_duration_seconds", "Time of the vector search call.", ("operation",)))
+model_batch_size = registry.register(Histogram(
+    "embedding_batch_size", "Queries embedded per model call.", buckets=BATCH_SIZE_BUCKETS))
+model_batch_seconds = registry.register(Histogram(
+    "embedding_batch_duration_seconds", "Time of one model call."))
+event_loop_lag_seconds = registry.register(Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke up a sleeping task; high values mean blocked or overloaded workers."))
+
+
+def record_model_batch(size: int, seconds: float):
+    model_batch_size.observe(size)
+    model_batch_seconds.observe(seconds)
+
+
+async def watch_event_loop(interval: float = 0.25):
+    """Run forever, recording how much later than asked each sleep wakes up."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        event_loop_lag_seconds.observe(max(0.0, time.perf_counter() - started - interval))
+
+
+async def sync_snapshots(interval: float = METRICS_SYNC_SECONDS):
+    """Run forever, writing this worker's snapshot for the other workers' scrapes."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            registry.write_snapshot()
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write the metrics snapshot: {e}")
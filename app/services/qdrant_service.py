@@ -1,18 +1,266 @@
-from qdrant_client import QdrantClient
-from vectorstore.config import setup_qdrant
-from text_utils.embedding_generator import EmbeddingGenerator
-from pipeline import get_embedding_dimension
-
-embedding_size = get_embedding_dimension()
-qdrant, collection = setup_qdrant(embedding_size, create_if_missing=False)
-
-embedder = EmbeddingGenerator()
-
-async def search_vectors(query: str, top_k: int = 5):
-    vector = embedder.generate_single(query)
-    hits = qdrant.search(
-        collection_name=collection,
-        query_vector=vector,
-        limit=top_k
-    )
-    return [{"id": h.id, "score": h.score, "payload": h.payload} for h in hits]
\ No newline at end of file
+import os
+import time
+import asyncio
+import logging
+import numpy as np
+from qdrant_client import models
+from vectorstore.config import (
+    get_collection_name, get_search_params, make_async_qdrant_client, generation_collection, GENERATION_POINT_ID,
+)
+from text_utils.embedding_generator import EmbeddingBatcher
+from app.services.search_cache import LRUCache, TTLCache
+from app.services import metrics
+from app.models.query_models import SearchFilters
+from pipeline import get_embedder
+
+logger = logging.getLogger(__name__)
+
+# Nothing here loads the model or talks to Qdrant at import time: the model loads
+# in warmup() (FastAPI lifespan), on the first query, or in serve_api.py's parent
+# process before it forks workers; Qdrant is reached on first use
+collection = get_collection_name()
+embedder = get_embedder()  # same model and backend (EMBEDDING_BACKEND) as ingestion
+search_params = get_search_params()  # e.g. quantization rescoring for the collection's profile
+
+# The Qdrant client and the query batcher are created on first use, in the
+# process that serves requests: serve_api.py imports this module before forking
+# its workers, and neither a connection pool nor the batcher's thread survives a fork
+_qdrant = None
+_query_batcher = None
+
+def get_qdrant():
+    """This process's async client; searches run on the event loop."""
+    global _qdrant
+    if _qdrant is None:
+        _qdrant = make_async_qdrant_client()
+    return _qdrant
+
+def get_query_batcher() -> EmbeddingBatcher:
+    """
+    Queries arriving within a few milliseconds of each other are embedded in one
+    model call, on the batcher's thread instead of the event loop.
+    """
+    global _query_batcher
+    if _query_batcher is None:
+        _query_batcher = EmbeddingBatcher(
+            embedder,
+            batch_size=int(os.getenv("SEARCH_BATCH_SIZE", "32")),
+            max_wait=float(os.getenv("SEARCH_BATCH_WAIT_MS", "5")) / 1000,
+            on_batch=metrics.record_model_batch,
+        )
+    return _query_batcher
+
+def _forget_after_fork():
+    # A forked worker must not use its parent's client or (threadless) batcher
+    global _qdrant, _query_batcher
+    _qdrant, _query_batcher = None, None
+
+os.register_at_fork(after_in_child=_forget_after_fork)
+
+# Repeated queries skip the model (query text → vector) and, while the
+# collection is unchanged, Qdrant as well ((query, top_k, filters) → results)
+query_vectors = LRUCache(int(os.getenv("SEARCH_VECTOR_CACHE_SIZE", "10000")))
+search_results = TTLCache(
+    int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("SEARCH_RESULT_CACHE_TTL", "60")),
+)
+
+def _cache_counts(field: str) -> dict:
+    return {("query_vectors",): query_vectors.stats()[field], ("search_results",): search_results.stats()[field]}
+
+metrics.registry.register(metrics.Counter(
+    "search_cache_hits", "Cache lookups answered from the cache.", ("cache",), callback=lambda: _cache_counts("hits")))
+metrics.registry.register(metrics.Counter(
+    "search_cache_misses", "Cache lookups that missed.", ("cache",), callback=lambda: _cache_counts("misses")))
+metrics.registry.register(metrics.Gauge(
+    "search_cache_hit_ratio", "Hits / lookups since the worker started.", ("cache",), callback=lambda: _cache_counts("hit_rate"),
+    aggregate="worker"))
+
+# The ingest generation marker is read at most this often, so cache hits stay in-process
+GENERATION_CHECK_INTERVAL = float(os.getenv("SEARCH_CACHE_CHECK_SECONDS", "1"))
+_generation = None
+_next_generation_check = 0.0
+
+async def _drop_results_if_collection_changed():
+    """Clear the result cache when ingestion has written to the collection since the last check."""
+    global _generation, _next_generation_check
+    now = time.monotonic()
+    if now < _next_generation_check:
+        return
+    _next_generation_check = now + GENERATION_CHECK_INTERVAL
+
+    try:
+        points = await get_qdrant().retrieve(generation_collection(collection), ids=[GENERATION_POINT_ID])
+    except Exception:
+        return  # no marker (collection created before it existed): results expire by TTL only
+    generation = points[0].payload.get("generation") if points else None
+    if generation != _generation:
+        _generation = generation
+        search_results.clear()
+
+async def warmup():
+    """Load the model and run one batch, off the event loop."""
+    started = time.perf_counter()
+    await asyncio.to_thread(embedder.warmup)
+    logger.info(f"🔥 Embedding model ready in {time.perf_counter() - started:.1f}s")
+
+async def readiness() -> dict:
+    """Whether this worker can answer searches: model loaded and collection reachable."""
+    try:
+        qdrant_ok = await get_qdrant().collection_exists(collection)
+    except Exception:
+        qdrant_ok = False
+    return {"model": embedder.is_loaded, "qdrant": qdrant_ok}
+
+async def shutdown():
+    if _query_batcher is not None:
+        _query_batcher.close()
+    if _qdrant is not None:
+        await _qdrant.close()
+
+def cache_stats() -> dict:
+    return {"query_vectors": query_vectors.stats(), "search_results": search_results.stats()}
+
+def _own_copy(vector) -> np.ndarray:
+    """
+    The vector in its own memory. Batchers hand out rows of one array for the whole
+    model call, and a cached row would keep all of it alive.
+    """
+    return np.array(vector, dtype=np.float32, copy=True)
+
+async def embed_query(query: str):
+    vector = query_vectors.get(query)
+    if vector is None:
+        with metrics.encode_seconds.time():
+            vectors = await asyncio.wrap_future(get_query_batcher().submit([query]))
+        vector = _own_copy(vectors[0])
+        query_vectors.put(query, vector)
+    return vector
+
+def build_filter(filters: SearchFilters | None) -> models.Filter | None:
+    """Translate API filters into Qdrant conditions on the indexed payload fields."""
+    if filters is None:
+        return None
+
+    def normalize_domain(domain: str) -> str:
+        domain = domain.strip().lower()
+        return domain[4:] if domain.startswith("www.") else domain
+
+    must = []
+    for key, values in (
+        ("domain", [normalize_domain(d) for d in filters.domain or []]),
+        ("source", filters.source or []),
+        ("doc_id", filters.doc_id or []),
+        ("extension", [e.strip().lstrip(".").lower() for e in filters.extension or []]),
+    ):
+        if values:
+            must.append(models.FieldCondition(key=key, match=models.MatchAny(any=values)))
+
+    if filters.ingested_after or filters.ingested_before:
+        must.append(models.FieldCondition(
+            key="ingested_at",
+            range=models.Range(
+                gte=int(filters.ingested_after.timestamp()) if filters.ingested_after else None,
+                lt=int(filters.ingested_before.timestamp()) if filters.ingested_before else None,
+            ),
+        ))
+    return models.Filter(must=must) if must else None
+
+def _filter_key(filters: SearchFilters | None) -> str | None:
+    return filters.model_dump_json(exclude_none=True) if filters else None
+
+def payload_selector(fields: list[str] | None):
+    """Qdrant `with_payload` for the requested fields: everything (None), nothing ([]) or just those."""
+    if fields is None:
+        return True
+    if not fields:
+        return False
+    return models.PayloadSelectorInclude(include=fields)
+
+def snippet(text: str, max_chars: int) -> str:
+    """`text` cut to at most `max_chars` characters, at a word boundary when there is one."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars - 1]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > max_chars // 2 else cut).rstrip() + "…"
+
+async def search_vectors(query: str, top_k: int = 5, filters: SearchFilters | None = None,
+                         fields: list[str] | None = None, snippet_chars: int | None = None):
+    """
+    Top `top_k` chunks for `query`. `fields` limits the payload returned per match
+    (Qdrant sends only those), `snippet_chars` shortens the returned text.
+    """
+    await _drop_results_if_collection_changed()
+    key = (query, top_k, _filter_key(filters), tuple(fields) if fields is not None else None, snippet_chars)
+    results = search_results.get(key)
+    if results is not None:
+        return results
+
+    vector = await embed_query(query)
+    with metrics.qdrant_seconds.time(operation="query"):
+        response = await get_qdrant().query_points(
+            collection_name=collection,
+            query=vector.tolist(),
+            query_filter=build_filter(filters),
+            limit=top_k,
+            search_params=search_params,
+            with_payload=payload_selector(fields),
+            with_vectors=False,
+        )
+    results = _to_results(response.points, snippet_chars)
+    search_results.put(key, results)
+    return results
+
+async def search_vectors_batch(queries: list[str], top_k: int = 5, filters: SearchFilters | None = None,
+                               fields: list[str] | None = None, snippet_chars: int | None = None) -> list[list[dict]]:
+    """
+    Search several queries at once; returns one result list per query, in order.
+
+    Queries not answered from the caches are embedded in a single model call and
+    sent to Qdrant as a single batch request. `filters`, `fields` and
+    `snippet_chars` apply to every query.
+    """
+    await _drop_results_if_collection_changed()
+    options = (_filter_key(filters), tuple(fields) if fields is not None else None, snippet_chars)
+    results = [search_results.get((q, top_k, *options)) for q in queries]
+    todo = [i for i, r in enumerate(results) if r is None]
+    if not todo:
+        return results
+
+    vectors = {queries[i]: query_vectors.get(queries[i]) for i in todo}
+    to_embed = [q for q, v in vectors.items() if v is None]
+    if to_embed:
+        with metrics.encode_seconds.time():
+            embedded = await asyncio.wrap_future(get_query_batcher().submit(to_embed))
+        for query, vector in zip(to_embed, embedded):
+            vector = _own_copy(vector)
+            query_vectors.put(query, vector)
+            vectors[query] = vector
+
+    query_filter = build_filter(filters)
+    requests = [
+        models.QueryRequest(
+            query=vectors[queries[i]].tolist(),
+            filter=query_filter,
+            limit=top_k,
+            params=search_params,
+            with_payload=payload_selector(fields),
+            with_vector=False,
+        )
+        for i in todo
+    ]
+    with metrics.qdrant_seconds.time(operation="batch"):
+        responses = await get_qdrant().query_batch_points(collection_name=collection, requests=requests)
+    for i, response in zip(todo, responses):
+        results[i] = _to_results(response.points, snippet_chars)
+        search_results.put((queries[i], top_k, *options), results[i])
+    return results
+
+def _to_results(points, snippet_chars: int | None = None) -> list[dict]:
+    results = [{"id": h.id, "score": h.score, "payload": h.payload or {}} for h in points]
+    if snippet_chars:
+        for r in results:
+            if isinstance(r["payload"].get("text"), str):
+                r["payload"]["text"] = snippet(r["payload"]["text"], snippet_chars)
+    return results
@@ -0,0 +1,62 @@
+"""
+Micro-benchmark: clean_text() vs. the fused clean_text_fast().
+
+Run from the project root:
+    python -m benchmarks.bench_cleaning [--pages 2000] [--repeat 5]
+"""
+
+import argparse
+import random
+import time
+
+from text_utils.cleaning import clean_text, clean_text_fast
+
+def make_pdf_like_text(pages: int, seed: int = 42) -> str:
+    """Synthetic extracted-PDF text: hyphenated line breaks, TOC dot leaders, references, typographic quotes."""
+    rng = random.Random(seed)
+    words = ["informa", "tion", "retrieval", "vektorska", "baza", "podataka", "čćžšđ", "embedding", "model", "search"]
+    lines = []
+    for page in range(1, pages + 1):
+        lines.append(f"[PAGE {page}]")
+        lines.append(f"Chapter {page} " + "." * rng.randint(6, 40) + f" {page}")
+        for _ in range(40):
+            line = " ".join(rng.choice(words) for _ in range(rng.randint(6, 14)))
+            if rng.random() < 0.3:
+                line += " [" + str(rng.randint(1, 99)) + "]"
+            if rng.random() < 0.2:
+                line += " – “quoted” ‘text’"
+            if rng.random() < 0.25:
+                line += " hyphen-"
+            lines.append(line)
+        lines.append("")
+    return "\r\n".join(lines)
+
+def best_of(fn, text: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark clean_text vs clean_text_fast")
+    parser.add_argument("--pages", type=int, default=2000, help="Number of synthetic pages")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per function (best is reported)")
+    args = parser.parse_args()
+
+    text = make_pdf_like_text(args.pages)
+    mb = len(text.encode("utf-8")) / 1e6
+
+    assert clean_text(text) == clean_text_fast(text), "outputs differ"
+
+    slow = best_of(clean_text, text, args.repeat)
+    fast = best_of(clean_text_fast, text, args.repeat)
+
+    print(f"input: {args.pages} pages, {mb:.1f} MB")
+    print(f"clean_text      {slow * 1000:8.1f} ms  ({mb / slow:6.1f} MB/s)")
+    print(f"clean_text_fast {fast * 1000:8.1f} ms  ({mb / fast:6.1f} MB/s)")
+    print(f"speedup         {slow / fast:8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Parity check and benchmark: torch vs. ONNX Runtime (fp32 and int8) embedding backends.
+
+Run from the project root:
+    python -m benchmarks.bench_embedding_backends [--model sentence-transformers/all-MiniLM-L6-v2] [--texts 512]
+
+Vectors of each ONNX backend are compared row by row against the torch backend;
+the minimum and mean cosine similarity are reported next to the throughput.
+"""
+
+import argparse
+import random
+import time
+
+from text_utils.embedding_generator import EmbeddingGenerator
+from text_utils.onnx_backend import cosine_parity
+
+def make_texts(count: int, seed: int = 42) -> list[str]:
+    """Chunk-like texts of mixed length, from a few words up to a full model window."""
+    rng = random.Random(seed)
+    words = ["vector", "database", "search", "embedding", "informacija", "dokument", "query",
+             "model", "latency", "throughput", "stranica", "index", "quantization", "runtime"]
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(5, 300))) for _ in range(count)]
+
+def timed(generator: EmbeddingGenerator, texts: list[str], batch_size: int):
+    generator.generate(texts[:batch_size], batch_size=batch_size)  # warm-up
+    started = time.perf_counter()
+    vectors = generator.generate(texts, batch_size=batch_size)
+    return vectors, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends for parity and speed")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--onnx-dir", default=None, help="ONNX export directory (exported if missing)")
+    parser.add_argument("--texts", type=int, default=512, help="Number of synthetic chunks")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+    reference, base = timed(EmbeddingGenerator(args.model, backend="torch"), texts, args.batch_size)
+    print(f"{'torch':10} {base * 1000:9.1f} ms  ({len(texts) / base:7.1f} texts/s)")
+
+    for backend in ("onnx", "onnx-int8"):
+        generator = EmbeddingGenerator(args.model, backend=backend, onnx_dir=args.onnx_dir)
+        vectors, elapsed = timed(generator, texts, args.batch_size)
+        parity = cosine_parity(reference, vectors)
+        print(
+            f"{backend:10} {elapsed * 1000:9.1f} ms  ({len(texts) / elapsed:7.1f} texts/s)"
+            f"  speedup {base / elapsed:5.2f}x  cosine min {parity['min']:.5f} mean {parity['mean']:.5f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark: embedding throughput with 1, 2, 4, ... model replicas pinned to cores.
+
+Run from the project root:
+    python -m benchmarks.bench_embedding_replicas [--max-replicas 8] [--texts 2048] [--backend torch]
+
+Each replica count is fed the same chunks from several threads, like the
+ingestion embed stage. "in-process" is the single lock-guarded model using all cores.
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.bench_embedding_backends import make_texts
+from text_utils.embedding_generator import EmbeddingGenerator
+from text_utils.embedding_replicas import available_cores
+
+def throughput(generator: EmbeddingGenerator, texts: list[str], batch_size: int, callers: int) -> float:
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    generator.generate(batches[0], batch_size=batch_size)  # warm-up
+    started = time.perf_counter()
+    with ThreadPoolExecutor(callers) as pool:
+        list(pool.map(lambda batch: generator.generate(batch, batch_size=batch_size), batches))
+    return len(texts) / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding throughput vs. number of replicas")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--texts", type=int, default=2048)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-replicas", type=int, default=len(available_cores()))
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+    callers = max(4, args.max_replicas * 2)
+
+    base = throughput(EmbeddingGenerator(args.model, backend=args.backend), texts, args.batch_size, callers)
+    print(f"{'in-process':>11} {base:8.1f} texts/s")
+
+    replicas = 1
+    while replicas <= args.max_replicas:
+        generator = EmbeddingGenerator(args.model, backend=args.backend, replicas=replicas)
+        rate = throughput(generator, texts, args.batch_size, callers)
+        generator.close()
+        print(f"{replicas:>8} rep {rate:8.1f} texts/s  ({rate / base:5.2f}x)")
+        replicas *= 2
+
+if __name__ == "__main__":
+    main()
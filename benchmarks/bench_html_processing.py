@@ -0,0 +1,98 @@
+"""
+Benchmark: pages/sec of the crawler's HTML processing, BeautifulSoup vs. lxml.
+
+Run from the project root:
+    python -m benchmarks.bench_html_processing [--pages 200] [--mode smart] [--html-dir saved_pages/]
+
+  bs4   extract_html_string() + extract_links_from_html(): two html.parser parses
+  lxml  process_html(): one libxml2 parse returning the text and the links
+
+Pages are synthetic news articles (navigation, article body, tables, footer,
+scripts) unless --html-dir points at a directory of saved *.html files.
+The outputs of both paths are compared before timing.
+"""
+
+import argparse
+import random
+import time
+from pathlib import Path
+
+from crawler.html_processor import process_html
+from crawler.link_extractor import extract_links_from_html
+from extractors.html_extractor import extract_html_string
+
+BASE_URL = "https://www.index.hr/vijesti/clanak/1.aspx"
+DOMAIN = "index.hr"
+WORDS = ["vijesti", "sport", "Zagreb", "vlada", "utakmica", "gospodarstvo", "čitatelji", "objavljeno",
+         "izbori", "&amp;", "&nbsp;", "ministar", "građani", "prometna", "nesreća", "kuna", "euro"]
+
+def make_page(rng: random.Random) -> str:
+    def words(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    def link():
+        return f'<a href="/{rng.choice(["vijesti", "sport", "magazin"])}/clanak/{rng.randint(1, 10**6)}.aspx">{words(3)}</a>'
+
+    nav = "".join(f"<li>{link()}</li>" for _ in range(60))
+    body = []
+    for _ in range(rng.randint(10, 30)):
+        kind = rng.random()
+        if kind < 0.15:
+            body.append(f"<h2>{words(5)}</h2>")
+        elif kind < 0.25:
+            rows = "".join(f"<tr><td>{words(2)}</td><td>{rng.randint(1, 999)}</td><td>{link()}</td></tr>" for _ in range(8))
+            body.append(f"<table><tr><th>Naziv</th><th>Broj</th><th>Više</th></tr>{rows}</table>")
+        elif kind < 0.35:
+            body.append("<ul>" + "".join(f"<li>{words(8)} {link()}</li>" for _ in range(5)) + "</ul>")
+        else:
+            body.append(f"<p>{words(30)} {link()} <b>{words(4)}</b> {words(25)}</p>")
+    related = "".join(f'<div class="card"><img src="/i/{i}.jpg">{link()}<span>{words(6)}</span></div>' for i in range(40))
+    scripts = "".join(f"<script>window.ad{i} = {{slot: '{words(2)}', sizes: [[300, 250]]}};</script>" for i in range(10))
+    return (
+        f'<!DOCTYPE html><html lang="hr"><head><meta charset="utf-8"><title>{words(6)}</title>{scripts}'
+        f"<style>.card {{ display: flex }}</style></head><body>"
+        f"<header><nav><ul>{nav}</ul></nav></header>"
+        f"<main><article><h1>{words(8)}</h1>{''.join(body)}</article><section>{related}</section></main>"
+        f"<form><input name=\"q\"><button>Traži</button></form>"
+        f"<footer><p>© 2026 {link()} {words(10)}</p></footer></body></html>"
+    )
+
+def bs4_path(html: str, mode: str):
+    return extract_html_string(html, mode=mode), extract_links_from_html(BASE_URL, html, domain_limit=DOMAIN)
+
+def lxml_path(html: str, mode: str):
+    page = process_html(html, BASE_URL, mode=mode, domain_limit=DOMAIN)
+    return page.text, page.links
+
+def measure(process, pages: list[str], mode: str, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            process(html, mode)
+    return len(pages) * repeat / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML text + link extraction throughput: BeautifulSoup vs. lxml")
+    parser.add_argument("--pages", type=int, default=200, help="Synthetic pages to generate")
+    parser.add_argument("--html-dir", default=None, help="Use the *.html files in this directory instead")
+    parser.add_argument("--mode", choices=["naive", "smart"], default="smart")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.html_dir:
+        pages = [p.read_text(encoding="utf-8", errors="ignore") for p in sorted(Path(args.html_dir).glob("*.html"))]
+    else:
+        rng = random.Random(42)
+        pages = [make_page(rng) for _ in range(args.pages)]
+
+    same = sum(bs4_path(html, args.mode) == lxml_path(html, args.mode) for html in pages)
+    size = sum(len(html) for html in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, {size:.0f} KiB on average, mode={args.mode}: identical output for {same}/{len(pages)}")
+
+    bs4_rate = measure(bs4_path, pages, args.mode, args.repeat)
+    lxml_rate = measure(lxml_path, pages, args.mode, args.repeat)
+    print(f"bs4   {bs4_rate:8.1f} pages/s")
+    print(f"lxml  {lxml_rate:8.1f} pages/s  ({lxml_rate / bs4_rate:.1f}x)")
+
+if __name__ == "__main__":
+    main()
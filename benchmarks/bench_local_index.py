@@ -0,0 +1,68 @@
+"""
+Benchmark: recall and latency of the local index, IVF vs. exact search.
+
+Run from the project root:
+    python -m benchmarks.bench_local_index [--points 200000] [--dim 384] [--lists 256] [--dtype float16]
+
+Synthetic clustered vectors (as sentence embeddings are) are inserted into a
+fresh LocalIndex in a temporary directory. Exact search (every row scored) is
+the ground truth; IVF search is measured at several `nprobe` values, reporting
+recall@k against exact and p50/p99 latency per query.
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from vectorstore.local_index import LocalIndex
+
+def make_vectors(points: int, dim: int, clusters: int, seed: int = 42) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, points)
+    return (centers[labels] + 1.5 * rng.normal(size=(points, dim))).astype(np.float32)
+
+def timed_search(index, queries, k, **kwargs):
+    results, latencies = [], []
+    for q in queries:
+        started = time.perf_counter()
+        results.append({pid for pid, _, _ in index.search(q, limit=k, **kwargs)})
+        latencies.append((time.perf_counter() - started) * 1000)
+    return results, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+def main():
+    parser = argparse.ArgumentParser(description="Local index: IVF recall and latency vs. exact search")
+    parser.add_argument("--points", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--lists", type=int, default=256, help="IVF lists (k-means clusters)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.points, args.dim, clusters=args.lists * 2)
+    queries = vectors[np.random.default_rng(7).choice(args.points, args.queries, replace=False)]
+    queries = queries + 0.1 * np.random.default_rng(8).normal(size=queries.shape).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as path:
+        index = LocalIndex(path, dim=args.dim, dtype=args.dtype, ivf_lists=args.lists)
+        started = time.perf_counter()
+        for start in range(0, args.points, 10_000):
+            batch = vectors[start:start + 10_000]
+            index.upsert(list(range(start, start + len(batch))), batch, [{"n": i} for i in range(len(batch))])
+        print(f"indexed {args.points} x {args.dim} {args.dtype} vectors "
+              f"({args.lists} lists) in {time.perf_counter() - started:.1f}s")
+
+        truth, p50, p99 = timed_search(index, queries, args.top_k, exact=True)
+        print(f"{'exact':10} recall@{args.top_k} 1.000  p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+        for nprobe in args.nprobe:
+            found, p50, p99 = timed_search(index, queries, args.top_k, nprobe=nprobe)
+            recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+            print(f"{f'nprobe={nprobe}':10} recall@{args.top_k} {recall:.3f}  p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+        index.close()
+
+if __name__ == "__main__":
+    main()
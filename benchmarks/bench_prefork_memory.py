@@ -0,0 +1,92 @@
+"""
+Benchmark: memory of N API workers, pre-forked (serve_api.py) vs. uvicorn --workers.
+
+Run from the project root, with Qdrant reachable (or VECTOR_BACKEND=local):
+    python -m benchmarks.bench_prefork_memory [--workers 4] [--port 8010]
+
+Each server is started, given time until /health/ready answers and the workers
+have warmed up, and then measured. Memory is read from /proc (Linux only):
+  RSS  counts shared pages once per process, so it overstates the total
+  PSS  splits each shared page between the processes sharing it; the sum over
+       the server's processes is what it really costs the node
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+def process_tree(pid: int) -> list[int]:
+    pids = [pid]
+    for task in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                for child in f.read().split():
+                    pids += process_tree(int(child))
+        except FileNotFoundError:
+            pass
+    return pids
+
+def memory_kb(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key] = int(rest.split()[0])
+    return values
+
+def measure(command: list[str], url: str, workers: int, settle: float, timeout: float) -> dict:
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < 3 * workers:  # several workers must have answered, not just the first one
+            if server.poll() is not None:
+                raise RuntimeError(f"{' '.join(command[1:3])} exited with status {server.returncode}")
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{command[1]} did not become ready within {timeout:.0f}s")
+            try:
+                ready = ready + 1 if httpx.get(f"{url}/health/ready", timeout=2).status_code == 200 else 0
+            except httpx.HTTPError:
+                ready = 0
+            time.sleep(0.2)
+        time.sleep(settle)
+
+        pids = process_tree(server.pid)
+        usage = [memory_kb(pid) for pid in pids]
+        return {
+            "processes": len(pids),
+            "rss": sum(u["Rss"] for u in usage) / 1024,
+            "pss": sum(u["Pss"] for u in usage) / 1024,
+        }
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description="Total memory of N API workers: pre-fork vs. uvicorn --workers")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--settle", type=float, default=5.0, help="Seconds to wait after readiness before measuring")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}"
+    commands = {
+        "uvicorn": [sys.executable, "-m", "uvicorn", "main_api:app", "--port", str(args.port),
+                    "--workers", str(args.workers), "--log-level", "warning"],
+        "prefork": [sys.executable, "serve_api.py", "--port", str(args.port),
+                    "--workers", str(args.workers), "--log-level", "warning"],
+    }
+    for name, command in commands.items():
+        m = measure(command, url, args.workers, args.settle, args.timeout)
+        print(f"{name:8} {m['processes']} processes  RSS {m['rss']:8.0f} MiB  "
+              f"PSS {m['pss']:8.0f} MiB  ({m['pss'] / args.workers:6.0f} MiB per worker)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Load test: search latency percentiles against a running API at increasing concurrency.
+
+Start the API first (uvicorn main_api:app), then run from the project root:
+    python -m benchmarks.bench_search_load [--url http://127.0.0.1:8000/api/search] [--requests 400]
+
+For each concurrency level, that many clients send queries back to back until
+--requests queries have been answered. With a blocking search path p99 grows
+roughly linearly with concurrency; with the async, coalescing path it stays flat
+until the model itself is saturated.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+import numpy as np
+
+QUERIES = ["vector database", "kako radi pretraživanje", "embedding model latency", "quantization recall",
+           "najnovije vijesti", "document ingestion pipeline", "qdrant payload index", "sports results"]
+
+async def run_level(client: httpx.AsyncClient, url: str, concurrency: int, total: int) -> list[float]:
+    latencies: list[float] = []
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.post(url, json={"query": random.choice(QUERIES), "top_k": 5})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+async def main():
+    parser = argparse.ArgumentParser(description="Search latency under concurrent load")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/api/search")
+    parser.add_argument("--requests", type=int, default=400, help="Queries per concurrency level")
+    parser.add_argument("--levels", default="1,4,16,64", help="Comma-separated concurrency levels")
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=1000)) as client:
+        for level in (int(x) for x in args.levels.split(",")):
+            started = time.perf_counter()
+            latencies = np.array(await run_level(client, args.url, level, args.requests)) * 1000
+            elapsed = time.perf_counter() - started
+            print(
+                f"concurrency {level:4}: p50 {np.percentile(latencies, 50):7.1f} ms  "
+                f"p99 {np.percentile(latencies, 99):7.1f} ms  {len(latencies) / elapsed:7.1f} req/s"
+            )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""
+Benchmark: size and serialization time of a search response, full vs. lean.
+
+Run from the project root:
+    python -m benchmarks.bench_search_response [--top-k 30] [--snippet-chars 300]
+
+A response of `top_k` matches with payloads as ingestion writes them (a full
+500-word chunk text plus source metadata) is serialized three ways:
+  full     whole payload, FastAPI's default path (jsonable_encoder + JSONResponse)
+  orjson   whole payload, FastJSONResponse
+  lean     only `text` and `source`, text cut to a snippet, FastJSONResponse
+No server or Qdrant is needed; the payload selection itself happens in Qdrant.
+"""
+
+import argparse
+import random
+import time
+import uuid
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.api.responses import FastJSONResponse
+from app.services.qdrant_service import snippet
+
+WORDS = ["vector", "database", "search", "embedding", "informacija", "dokument", "query", "model",
+         "latency", "throughput", "stranica", "index", "quantization", "runtime", "pretraživanje"]
+
+def make_matches(top_k: int, seed: int = 42) -> list[dict]:
+    rng = random.Random(seed)
+    matches = []
+    for i in range(top_k):
+        doc_id = f"https://www.index.hr/vijesti/clanak/{rng.randint(10**6, 10**7)}"
+        matches.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "score": 0.9 - i * 0.01,
+            "payload": {
+                "text": " ".join(rng.choice(WORDS) for _ in range(500)),
+                "source": doc_id,
+                "original_name": "clanak.html",
+                "hash": f"{rng.getrandbits(256):064x}",
+                "doc_id": doc_id,
+                "num_chunks": rng.randint(1, 20),
+                "domain": "index.hr",
+                "extension": "html",
+                "ingested_at": 1760000000 + i,
+            },
+        })
+    return matches
+
+def lean(matches: list[dict], fields: list[str], snippet_chars: int) -> list[dict]:
+    projected = [{**m, "payload": {k: m["payload"][k] for k in fields}} for m in matches]
+    for m in projected:
+        m["payload"]["text"] = snippet(m["payload"]["text"], snippet_chars)
+    return projected
+
+def measure(render, content, repeat: int) -> tuple[int, float]:
+    body = render(content)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        render(content)
+    return len(body), (time.perf_counter() - started) / repeat * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Search response size and serialization time: full vs. lean")
+    parser.add_argument("--top-k", type=int, default=30)
+    parser.add_argument("--snippet-chars", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    matches = make_matches(args.top_k)
+    default = lambda content: JSONResponse(jsonable_encoder(content)).body
+    fast = lambda content: FastJSONResponse(content).body
+
+    runs = {
+        "full": measure(default, {"matches": matches}, args.repeat),
+        "orjson": measure(fast, {"matches": matches}, args.repeat),
+        "lean": measure(fast, {"matches": lean(matches, ["text", "source"], args.snippet_chars)}, args.repeat),
+    }
+    full_size, full_us = runs["full"]
+    print(f"top_k={args.top_k}, snippet_chars={args.snippet_chars}")
+    for name, (size, us) in runs.items():
+        print(f"{name:7} {size:8} bytes ({size / full_size:6.1%})  {us:8.1f} µs/response ({full_us / us:5.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: fixed-size vs. token-budget batching on a mixed-length corpus.
+
+Run from the project root:
+    python -m benchmarks.bench_token_batching [--model sentence-transformers/all-MiniLM-L6-v2] [--token-budget 8192]
+
+The corpus mixes one-line table rows, paragraphs and full 500-word windows, in
+document order. Padded tokens are counted for three plans:
+  fixed       batches of 32 in arrival order
+  fixed+sort  batches of 32 after sorting by length (what SentenceTransformer.encode does)
+  budget      length buckets sized by a total token budget (EmbeddingGenerator token_budget)
+and the wall-clock time of generate() is measured with and without the budget.
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from text_utils.chunking import get_tokenizer
+from text_utils.embedding_generator import EmbeddingGenerator
+from text_utils.token_batching import token_lengths, plan_token_batches, padded_tokens
+
+def make_mixed_corpus(documents: int, seed: int = 42) -> list[str]:
+    """Chunks as ingestion produces them: spreadsheets of short rows, prose, long PDF windows."""
+    rng = random.Random(seed)
+    words = ["vector", "database", "search", "embedding", "informacija", "dokument", "query",
+             "model", "latency", "throughput", "stranica", "index", "quantization", "runtime"]
+    chunks = []
+    for _ in range(documents):
+        kind = rng.random()
+        if kind < 0.4:  # spreadsheet: many one-line rows
+            chunks += [" | ".join(str(rng.randint(1, 9999)) for _ in range(rng.randint(2, 6))) for _ in range(rng.randint(10, 40))]
+        elif kind < 0.7:  # web page: paragraphs
+            chunks += [" ".join(rng.choice(words) for _ in range(rng.randint(20, 120))) for _ in range(rng.randint(2, 8))]
+        else:  # PDF: full 500-word windows
+            chunks += [" ".join(rng.choice(words) for _ in range(500)) for _ in range(rng.randint(1, 6))]
+    return chunks
+
+def main():
+    parser = argparse.ArgumentParser(description="Padded tokens and time: fixed vs. token-budget batching")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--documents", type=int, default=60)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--token-budget", type=int, default=8192)
+    args = parser.parse_args()
+
+    chunks = make_mixed_corpus(args.documents)
+    fixed_gen = EmbeddingGenerator(args.model)
+    lengths = token_lengths(get_tokenizer(args.model), chunks, fixed_gen.max_seq_length)
+    real = sum(lengths)
+
+    by_length = sorted(range(len(chunks)), key=lengths.__getitem__)
+    plans = {
+        "fixed": [list(range(i, min(i + args.batch_size, len(chunks)))) for i in range(0, len(chunks), args.batch_size)],
+        "fixed+sort": [by_length[i:i + args.batch_size] for i in range(0, len(chunks), args.batch_size)],
+        "budget": plan_token_batches(lengths, args.token_budget),
+    }
+
+    print(f"corpus: {len(chunks)} chunks, {real} real tokens")
+    for name, batches in plans.items():
+        total = padded_tokens(lengths, batches)
+        print(f"{name:11} {len(batches):5} batches  {total:9} tokens  ({(total - real) / total:6.1%} padding)")
+
+    budget_gen = EmbeddingGenerator(args.model, token_budget=args.token_budget)
+    timings = {}
+    for name, generator in (("fixed+sort", fixed_gen), ("budget", budget_gen)):
+        generator.generate(chunks[:64])  # warm-up
+        started = time.perf_counter()
+        vectors = generator.generate(chunks, batch_size=args.batch_size)
+        timings[name] = (time.perf_counter() - started, vectors)
+
+    (fixed_s, fixed_vecs), (budget_s, budget_vecs) = timings["fixed+sort"], timings["budget"]
+    assert np.allclose(fixed_vecs, budget_vecs, atol=1e-4), "token-budget batching changed the vectors"
+    print(f"generate(): fixed {fixed_s:.2f}s, budget {budget_s:.2f}s ({fixed_s / budget_s:.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+import time
+import asyncio
+import logging
+import contextlib
+from urllib.parse import urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+from crawler.sitemap_utils import COMMON_SITEMAP_PATHS, decode_sitemap, parse_sitemap
+
+logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)  # one INFO line per request drowns the crawl progress
+
+USER_AGENT = "CrawlerBot/1.0 (+https://example.com)"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# -----------------------------------------------------------
+# 🪣 Per-host rate limit
+# -----------------------------------------------------------
+class TokenBucket:
+    """
+    Lets `rate` requests per second through on average, and up to `burst` at
+    once after a quiet period. A rate of 0 means no limit. `clock` and `sleep`
+    measure and wait out the time (tests pass a fake pair).
+    """
+
+    def __init__(self, rate: float, burst: int = 1, clock=time.monotonic, sleep=asyncio.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:  # waiters are served in order
+            while True:
+                now = self.clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await self.sleep((1 - self._tokens) / self.rate)
+
+
+class _Host:
+    """What the crawler knows about one host: its robots.txt, rate limit and in-flight slots."""
+
+    def __init__(self, robots: RobotFileParser, bucket: TokenBucket, per_host: int):
+        self.robots = robots
+        self.bucket = bucket
+        self.slots = asyncio.Semaphore(per_host)
+
+
+# -----------------------------------------------------------
+# 🕸️ Concurrent, polite HTTP client
+# -----------------------------------------------------------
+class AsyncCrawler:
+    """
+    Fetches pages from many hosts concurrently while staying polite to each one.
+
+    - At most `concurrency` requests are in flight overall, `per_host` per host.
+    - Each host gets a token bucket of one request per `delay` seconds (bursts
+      of `burst`), slowed down to the host's robots.txt Crawl-delay or
+      Request-rate when that is stricter.
+    - URLs disallowed by robots.txt are skipped. `respect_robots=False` ignores
+      both robots.txt rules; its Sitemap entries are still used.
+    - 429 and 5xx responses and connection errors are retried `retries` times
+      with exponential backoff, or after the server's Retry-After.
+
+    Use as `async with AsyncCrawler(...) as crawler:`. `clock` and `sleep` are
+    what the rate limits and retry backoff measure and wait with.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 32,
+        per_host: int = 2,
+        delay: float = 1.0,
+        burst: int = 1,
+        respect_robots: bool = True,
+        timeout: float = 10.0,
+        retries: int = 3,
+        user_agent: str = USER_AGENT,
+        transport: httpx.AsyncBaseTransport | None = None,
+        clock=time.monotonic,
+        sleep=asyncio.sleep,
+    ):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.delay = delay
+        self.burst = burst
+        self.respect_robots = respect_robots
+        self.retries = retries
+        self.user_agent = user_agent
+        self.clock = clock
+        self.sleep = sleep
+
+        self._client = httpx.AsyncClient(
+            headers={"User-Agent": user_agent},
+            timeout=timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            transport=transport,
+        )
+        self._slots = asyncio.Semaphore(concurrency)
+        self._hosts: dict[str, asyncio.Task] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    # -------------------------------------------------------
+    # Hosts and robots.txt
+    # -------------------------------------------------------
+    async def _host(self, url: str) -> _Host:
+        """The host of `url`, reading its robots.txt on first use (once, even if many callers ask at once)."""
+        parsed = urlparse(url)
+        key = f"{parsed.scheme}://{parsed.netloc}"
+        if key not in self._hosts:
+            self._hosts[key] = asyncio.ensure_future(self._load_host(key))
+        return await self._hosts[key]
+
+    async def _load_host(self, root: str) -> _Host:
+        robots = RobotFileParser(urljoin(root, "/robots.txt"))
+        response = await self.request("GET", robots.url, polite=False)
+        text = ""
+        if response is not None and response.status_code < 400:
+            text = response.text
+            robots.parse(text.splitlines())
+        else:
+            robots.allow_all = True  # no (readable) robots.txt: nothing is disallowed
+
+        interval = self.delay
+        if self.respect_robots:
+            crawl_delay = _crawl_delay(text, self.user_agent)
+            request_rate = robots.request_rate(self.user_agent)
+            if crawl_delay:
+                interval = max(interval, float(crawl_delay))
+            if request_rate and request_rate.requests:
+                interval = max(interval, request_rate.seconds / request_rate.requests)
+            if interval > self.delay:
+                logger.info(f"🐢 {root}: robots.txt asks for {interval:.1f}s between requests")
+
+        bucket = TokenBucket(1 / interval if interval > 0 else 0, self.burst, self.clock, self.sleep)
+        return _Host(robots, bucket, self.per_host)
+
+    async def robots_sitemaps(self, base_url: str) -> list[str]:
+        """Sitemap URLs listed in the host's robots.txt."""
+        host = await self._host(base_url)
+        return host.robots.site_maps() or []
+
+    # -------------------------------------------------------
+    # Requests
+    # -------------------------------------------------------
+    async def request(self, method: str, url: str, polite: bool = True) -> httpx.Response | None:
+        """
+        Send one request with retries; None if it failed or robots.txt disallows it.
+        `polite=False` skips the host's rate limit and robots rules (used for
+        robots.txt itself and the one-off sitemap probes).
+        """
+        host = await self._host(url) if polite else None
+        if host is not None and self.respect_robots and not host.robots.can_fetch(self.user_agent, url):
+            logger.debug(f"robots.txt disallows {url}")
+            return None
+
+        response, error = None, None
+        for attempt in range(self.retries + 1):
+            if host is not None:
+                await host.bucket.acquire()
+            # Host slot first, so waiting for a busy host doesn't hold one of the global slots
+            async with (host.slots if host is not None else contextlib.nullcontext()), self._slots:
+                try:
+                    response, error = await self._client.request(method, url), None
+                except httpx.HTTPError as e:
+                    response, error = None, e
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                return response
+            if attempt < self.retries:
+                await self.sleep(_retry_after(response) or 0.5 * 2 ** attempt)
+
+        if response is None:
+            logger.warning(f"Failed to fetch {url}: {error}")
+        return response
+
+    async def fetch_html(self, url: str) -> str | None:
+        """The page's HTML, or None if it failed or isn't HTML."""
+        response = await self.request("GET", url)
+        if response is None or response.status_code >= 400:
+            if response is not None:
+                logger.warning(f"Failed to fetch {url}: HTTP {response.status_code}")
+            return None
+        if "html" not in response.headers.get("Content-Type", "").lower():
+            return None
+        return response.text
+
+    # -------------------------------------------------------
+    # Sitemaps
+    # -------------------------------------------------------
+    async def discover_sitemaps(self, base_url: str) -> list[str]:
+        """robots.txt sitemaps plus the common sitemap locations that exist, probed concurrently."""
+        parsed = urlparse(base_url)
+        root = f"{parsed.scheme}://{parsed.netloc}"
+
+        async def probe(path: str) -> str | None:
+            candidate = urljoin(root, path)
+            response = await self.request("HEAD", candidate, polite=False)
+            if response is not None and response.status_code == 200 and "xml" in response.headers.get("Content-Type", "").lower():
+                return candidate
+            return None
+
+        listed, *probed = await asyncio.gather(self.robots_sitemaps(base_url), *(probe(p) for p in COMMON_SITEMAP_PATHS))
+        return sorted(set(listed) | {p for p in probed if p})
+
+    async def collect_sitemap_urls(self, sitemap_urls: list[str]) -> set[str]:
+        """Page URLs of the sitemaps, following sitemap indexes; each level is fetched concurrently."""
+        visited, urls = set(), set()
+        level = set(sitemap_urls)
+        while level:
+            visited |= level
+            results = await asyncio.gather(*(self._fetch_sitemap(u) for u in level))
+            level = set()
+            for data in results:
+                urls |= data["urls"]
+                level |= data["sitemaps"]
+            level -= visited
+        return urls
+
+    async def _fetch_sitemap(self, url: str) -> dict:
+        response = await self.request("GET", url)
+        if response is None or response.status_code >= 400:
+            logger.error(f"⚠️ Failed to load sitemap from {url}")
+            return {"urls": set(), "sitemaps": set()}
+        # httpx already undid any Content-Encoding; .gz files are still gunzipped here
+        data = parse_sitemap(decode_sitemap(response.content, url), url)
+        logger.info(f"  {url} → {len(data['urls'])} URLs")
+        return data
+
+
+def _crawl_delay(robots_txt: str, user_agent: str) -> float | None:
+    """
+    Crawl-delay of the robots.txt group for `user_agent` (else the `*` group).
+    urllib.robotparser only understands whole seconds, so it is parsed here.
+    """
+    product = user_agent.split("/")[0].strip().lower()
+    delays, agents, in_rules = {}, [], False
+    for line in robots_txt.splitlines():
+        key, _, value = line.split("#")[0].partition(":")
+        key, value = key.strip().lower(), value.strip()
+        if key == "user-agent":
+            if in_rules:  # a new group starts
+                agents, in_rules = [], False
+            agents.append(value.lower())
+        elif key:
+            in_rules = True
+            if key == "crawl-delay":
+                try:
+                    delays.update((agent, float(value)) for agent in agents)
+                except ValueError:
+                    pass
+    matching = [d for agent, d in delays.items() if agent != "*" and agent in product]
+    return matching[0] if matching else delays.get("*")
+
+
+def _retry_after(response: httpx.Response | None) -> float | None:
+    if response is None:
+        return None
+    try:
+        return min(float(response.headers.get("Retry-After", "")), 60.0)
+    except ValueError:
+        return None
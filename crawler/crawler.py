@@ -1,57 +1,22 @@
-import time
+import asyncio
 import logging
 from pathlib import Path
 from urllib.parse import urlparse
 from typing import Optional, Iterable
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
-from requests.adapters import HTTPAdapter, Retry
-
-from crawler.sitemap_utils import discover_sitemaps, collect_all_sitemap_urls
-from crawler.link_extractor import extract_links_from_html
-from extractors.html_extractor import extract_html
+from crawler.async_crawler import AsyncCrawler
+from crawler.html_processor import process_html
+from extractors.html_extractor import extract_html_string
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 # -----------------------------------------------------------
-# 🕸️ Create a resilient requests session
-# -----------------------------------------------------------
-def make_session() -> requests.Session:
-    session = requests.Session()
-    retries = Retry(
-        total=3,
-        backoff_factor=0.5,
-        status_forcelist=[429, 500, 502, 503, 504],
-    )
-    adapter = HTTPAdapter(max_retries=retries)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    session.headers.update({"User-Agent": "CrawlerBot/1.0 (+https://example.com)"})
-    return session
-
-
-# -----------------------------------------------------------
-# 🌐 Fetch a single page safely
-# -----------------------------------------------------------
-def fetch_html(url: str, session: Optional[requests.Session] = None, timeout: int = 10) -> Optional[str]:
-    session = session or make_session()
-    try:
-        resp = session.get(url, timeout=timeout)
-        resp.raise_for_status()
-        if "html" not in resp.headers.get("Content-Type", "").lower():
-            return None
-        return resp.text
-    except Exception as e:
-        logger.warning(f"Failed to fetch {url}: {e}")
-        return None
-
-
-# -----------------------------------------------------------
-# 🧩 Crawl one domain
+# 🧩 Crawl domains
 # -----------------------------------------------------------
-def crawl_domain(base_url: str, output_dir: str = "data", limit: Optional[int] = None, delay: float = 1.0) -> None:
+def crawl_domain(base_url: str, output_dir: str = "data", limit: Optional[int] = None, delay: float = 1.0, **options) -> None:
     """
     Crawl a domain using sitemap discovery, fetch pages, and extract text.
 
@@ -59,74 +24,93 @@ def crawl_domain(base_url: str, output_dir: str = "data", limit: Optional[int] =
         base_url: e.g. "https://www.index.hr"
         output_dir: where to save text files
         limit: optional number of pages to limit crawling
-        delay: seconds to wait between requests
+        delay: minimum seconds between requests to the same host
+        **options: further AsyncCrawler settings (concurrency, per_host, burst, respect_robots)
     """
-    session = make_session()
+    crawl_domains([base_url], output_dir=output_dir, limit=limit, delay=delay, **options)
+
+
+def crawl_domains(
+    base_urls: Iterable[str],
+    output_dir: str = "data",
+    limit: Optional[int] = None,
+    delay: float = 1.0,
+    concurrency: int = 32,
+    per_host: int = 2,
+    burst: int = 1,
+    respect_robots: bool = True,
+) -> None:
+    """
+    Crawl several domains at once. Requests are spread over all hosts (at most
+    `concurrency` in flight) while each host is paced by its own rate limit;
+    see AsyncCrawler. `limit` applies per domain.
+    """
+    options = {"concurrency": concurrency, "per_host": per_host, "delay": delay, "burst": burst, "respect_robots": respect_robots}
+    asyncio.run(_crawl_domains(list(base_urls), output_dir, limit, options))
+
+
+async def _crawl_domains(base_urls: list[str], output_dir: str, limit: Optional[int], options: dict) -> None:
     Path(output_dir).mkdir(parents=True, exist_ok=True)
+    # Text extraction is CPU-bound: one thread keeps it off the event loop, more would only contend for the GIL
+    extractor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="html-extract")
+    try:
+        async with AsyncCrawler(**options) as crawler:
+            await asyncio.gather(*(_crawl_one(crawler, url, output_dir, limit, extractor) for url in base_urls))
+    finally:
+        extractor.shutdown(wait=True)
 
+
+async def _crawl_one(crawler: AsyncCrawler, base_url: str, output_dir: str, limit: Optional[int], extractor) -> None:
     parsed = urlparse(base_url)
     domain = parsed.netloc.replace("www.", "")
 
     logger.info(f"🌍 Discovering sitemaps for {domain} ...")
-    sitemap_urls = discover_sitemaps(base_url)
+    sitemap_urls = await crawler.discover_sitemaps(base_url)
     if not sitemap_urls:
         logger.warning(f"No sitemaps found for {domain}.")
         return
 
     logger.info(f"Found {len(sitemap_urls)} sitemap(s). Collecting page URLs...")
-    all_urls = set()
-    for sitemap_url in sitemap_urls:
-        urls = collect_all_sitemap_urls(sitemap_url)
-        logger.info(f"  {sitemap_url} → {len(urls)} URLs")
-        all_urls |= urls
-
+    all_urls = await crawler.collect_sitemap_urls(sitemap_urls)
     if not all_urls:
         logger.warning(f"No page URLs found in sitemaps for {domain}.")
         return
 
     logger.info(f"Total unique URLs: {len(all_urls)}")
+    pages = list(enumerate(sorted(all_urls)))
+    if limit:
+        pages = pages[:limit]
 
-    for i, url in enumerate(sorted(all_urls)):
-        if limit and i >= limit:
-            break
+    loop = asyncio.get_running_loop()
+    queue = iter(pages)
 
-        html = fetch_html(url, session=session)
-        if not html:
-            continue
+    async def worker():
+        # Enough workers to keep the host's slots busy; the crawler paces them
+        for i, url in queue:
+            html = await crawler.fetch_html(url)
+            if not html:
+                continue
+            out_path = Path(output_dir) / f"{domain}_{i:04d}.txt"
+            await loop.run_in_executor(extractor, _save_page, url, html, domain, out_path)
+            logger.info(f"[{i+1}/{len(all_urls)}] Saved {out_path.name}")
 
-        # Save extracted readable text
-        temp_path = Path(output_dir) / f"{domain}_{i:04d}.txt"
-        try:
-            text = extract_html_from_string(html)
-        except Exception:
-            # fallback to path-based extraction if saved locally
-            temp_html = temp_path.with_suffix(".html")
-            temp_html.write_text(html, encoding="utf-8", errors="ignore")
-            text = extract_html(str(temp_html))
-            temp_html.unlink(missing_ok=True)
+    await asyncio.gather(*(worker() for _ in range(crawler.per_host * crawler.burst)))
 
-        temp_path.write_text(text, encoding="utf-8")
-        logger.info(f"[{i+1}/{len(all_urls)}] Saved {temp_path.name}")
 
-        # Optional: extract additional links for exploration
-        internal_links = extract_links_from_html(url, html, domain_limit=domain)
-        logger.debug(f"Found {len(internal_links)} internal links")
+def _save_page(url: str, html: str, domain: str, out_path: Path) -> None:
+    # One parse gives the readable text and the links
+    page = process_html(html, url, mode="smart", domain_limit=domain)
+    out_path.write_text(page.text, encoding="utf-8")
+
+    # Optional: additional links for exploration
+    logger.debug(f"Found {len(page.links)} internal links")
 
-        time.sleep(delay)  # be polite
-        
 
 # -----------------------------------------------------------
 # Helper: Extract from raw HTML string (for convenience)
 # -----------------------------------------------------------
-from bs4 import BeautifulSoup
-from io import StringIO
-
 def extract_html_from_string(html: str, mode: str = "smart") -> str:
     """
     Like extract_html(), but accepts raw HTML string directly.
     """
-    tmp_path = Path("_temp_extract.html")
-    tmp_path.write_text(html, encoding="utf-8", errors="ignore")
-    text = extract_html(str(tmp_path), mode=mode)
-    tmp_path.unlink(missing_ok=True)
-    return text
+    return extract_html_string(html, mode=mode)
@@ -0,0 +1,134 @@
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from lxml import etree
+
+from crawler.link_extractor import normalize_link
+
+# Same tag sets as extractors/html_extractor.py
+NOISE_TAGS = ("script", "style", "noscript", "iframe", "footer", "nav", "header", "form")
+SMART_NOISE_TAGS = NOISE_TAGS + ("meta",)
+HEADINGS = ("h1", "h2", "h3", "h4")
+BLOCKS = HEADINGS + ("p", "li", "table")
+
+_PARSER = etree.HTMLParser(encoding="utf-8")
+
+
+@dataclass
+class ParsedPage:
+    """Readable text and outgoing links of an HTML page."""
+    text: str
+    links: set[str] = field(default_factory=set)
+
+
+def process_html(html: str, base_url: str = "", mode: str = "smart", domain_limit: Optional[str] = None) -> ParsedPage:
+    """
+    Parse a page once with lxml and return both its text and its links.
+
+    The text is what extractors.html_extractor.extract_html_string() returns in
+    the same `mode` ("naive" or "smart"); the links are what
+    crawler.link_extractor.extract_links_from_html() returns. Both are produced
+    from a single libxml2 parse instead of two BeautifulSoup ones.
+
+    The parsers repair broken markup differently (e.g. an unclosed <li> is
+    closed by lxml but swallows the following items with html.parser), so on
+    such pages the smart-mode text can differ from the BeautifulSoup path.
+    """
+    root = _parse(html)
+    if root is None:
+        return ParsedPage("")
+
+    # Links first: the noise (navigation, footers) is dropped from the text, not from the link set
+    links = set()
+    for a in root.iter("a"):
+        href = a.get("href")
+        if href is not None:
+            normalized = normalize_link(base_url, href, domain_limit)
+            if normalized:
+                links.add(normalized)
+
+    if mode == "smart":
+        _clear(root, SMART_NOISE_TAGS)
+        return ParsedPage(_smart_text(root), links)
+    _clear(root, NOISE_TAGS)
+    return ParsedPage(_naive_text(root), links)
+
+
+def _parse(html: str):
+    html = html.replace("\r\n", "\n").replace("\r", "\n")
+    # Bytes, because lxml refuses str input that starts with an <?xml encoding=...?> declaration
+    return etree.fromstring(html.encode("utf-8", errors="ignore"), _PARSER) if html.strip() else None
+
+
+def _clear(root, tags: tuple):
+    """
+    Empty the noise elements but keep them (and their tails) in place: removing
+    them would merge the text around them into one string, which
+    BeautifulSoup's decompose() does not.
+    """
+    for element in list(root.iter(*tags)):
+        element.clear(keep_tail=True)
+
+
+def _join(strings: Iterable[str]) -> str:
+    """Like BeautifulSoup's get_text(" ", strip=True)."""
+    return " ".join(s for s in map(str.strip, strings) if s)
+
+
+# ---------------------------------------------------------------------
+# 🧩 Naive mode
+# ---------------------------------------------------------------------
+def _naive_text(root) -> str:
+    text = _join(root.itertext())
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------
+# 🧠 Smart mode
+# ---------------------------------------------------------------------
+def _smart_text(root) -> str:
+    lines = []
+    for element in root.iter(*BLOCKS):
+        if element.tag == "table":
+            # The BeautifulSoup path rewrites links block by block, so a table
+            # only shows link URLs when a heading, paragraph or list item around it came first
+            with_urls = next(element.iterancestors(*BLOCKS[:-1]), None) is not None
+            rows = []
+            for tr in element.iter("tr"):
+                cells = [_element_text(cell, with_urls) for cell in tr.iter("td", "th")]
+                if cells:
+                    rows.append(" | ".join(cells))
+            table_text = "\n".join(rows)
+            if table_text:
+                lines.append(table_text)
+            continue
+
+        text = _element_text(element, with_urls=True)
+        if not text:
+            continue
+        lines.append(text.upper() if element.tag in HEADINGS else text)
+
+    text = "\n".join(line.strip() for line in lines if line.strip())
+    return text.strip()
+
+
+def _element_text(element, with_urls: bool) -> str:
+    """The element's text; with `with_urls`, links read "text (URL: href)"."""
+    if with_urls and any(a.get("href") is not None for a in element.iter("a")):
+        return _join(_strings_with_urls(element))
+    return _join(element.itertext())
+
+
+def _strings_with_urls(element):
+    if element.text:
+        yield element.text
+    for child in element:
+        if not isinstance(child.tag, str):
+            pass  # comments and processing instructions have no visible text, only their tails do
+        elif child.tag == "a" and child.get("href") is not None:
+            yield f"{_join(child.itertext())} (URL: {child.get('href').strip()})"
+        else:
+            yield from _strings_with_urls(child)
+        if child.tail:
+            yield child.tail
@@ -18,17 +18,27 @@ def extract_links_from_html(base_url: str, html: str, domain_limit: str | None =
     urls = set()
 
     for a in soup.find_all("a", href=True):
-        href = a["href"].strip()
-        if not href or href.startswith(("#", "javascript:", "mailto:", "tel:")):
-            continue
+        normalized = normalize_link(base_url, a["href"], domain_limit)
+        if normalized:
+            urls.add(normalized)
 
-        absolute = urljoin(base_url, href)
-        parsed = urlparse(absolute)
-        normalized = parsed._replace(fragment="").geturl()
+    return urls
+
+
+def normalize_link(base_url: str, href: str, domain_limit: str | None = None) -> str | None:
+    """
+    The absolute URL of an href without its #fragment, or None for in-page,
+    javascript:/mailto:/tel: links and links outside `domain_limit`.
+    """
+    href = href.strip()
+    if not href or href.startswith(("#", "javascript:", "mailto:", "tel:")):
+        return None
 
-        if domain_limit and parsed.netloc and not parsed.netloc.endswith(domain_limit):
-            continue
+    absolute = urljoin(base_url, href)
+    parsed = urlparse(absolute)
+    normalized = parsed._replace(fragment="").geturl()
 
-        urls.add(normalized)
+    if domain_limit and parsed.netloc and not parsed.netloc.endswith(domain_limit):
+        return None
 
-    return urls
+    return normalized
@@ -1,12 +1,21 @@
 from pathlib import Path
-from typing import List, Set, Dict
-from urllib.parse import urljoin, urlparse
+from typing import Set, Dict
+from urllib.parse import urlparse
 from xml.etree import ElementTree as ET
 import logging, gzip, requests
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Where sites put their sitemap when robots.txt doesn't say
+COMMON_SITEMAP_PATHS = [
+    "/sitemap.xml",
+    "/sitemap_index.xml",
+    "/sitemap-index.xml",
+    "/sitemap/sitemap.xml",
+    "/sitemaps/sitemap-index.xml"
+]
+
 def extract_urls_from_sitemap(source: str, timeout: int = 15) -> Dict[str, Set[str]]:
     """
     Extract URLs from a sitemap.xml or sitemap index.
@@ -25,23 +34,7 @@ def extract_urls_from_sitemap(source: str, timeout: int = 15) -> Dict[str, Set[s
         if is_url:
             resp = requests.get(source, timeout=timeout, headers={"User-Agent": "SitemapExtractor/1.0"})
             resp.raise_for_status()
-            content = resp.content
-
-            # Detect gzip
-            is_gzipped = (
-                resp.headers.get("Content-Encoding") == "gzip"
-                or content[:2] == b"\x1f\x8b"
-                or source.endswith(".gz")
-            )
-
-            if is_gzipped:
-                try:
-                    xml_content = gzip.decompress(content).decode("utf-8", errors="ignore")
-                except Exception:
-                    # fallback in case gzip header is wrong
-                    xml_content = content.decode("utf-8", errors="ignore")
-            else:
-                xml_content = content.decode("utf-8", errors="ignore")
+            xml_content = decode_sitemap(resp.content, source, resp.headers.get("Content-Encoding"))
 
         # --- Local sitemap ---
         else:
@@ -56,7 +49,28 @@ def extract_urls_from_sitemap(source: str, timeout: int = 15) -> Dict[str, Set[s
         logger.error(f"⚠️ Failed to load sitemap from {source}: {e}")
         return {"urls": set(), "sitemaps": set()}
 
-    # --- Parse XML ---
+    return parse_sitemap(xml_content, source)
+
+
+def decode_sitemap(content: bytes, source: str, content_encoding: str | None = None) -> str:
+    """Sitemap bytes as text, gunzipped if the response or file is gzip-compressed."""
+    is_gzipped = (
+        content_encoding == "gzip"
+        or content[:2] == b"\x1f\x8b"
+        or source.endswith(".gz")
+    )
+
+    if is_gzipped:
+        try:
+            return gzip.decompress(content).decode("utf-8", errors="ignore")
+        except Exception:
+            # fallback in case gzip header is wrong
+            return content.decode("utf-8", errors="ignore")
+    return content.decode("utf-8", errors="ignore")
+
+
+def parse_sitemap(xml_content: str, source: str) -> Dict[str, Set[str]]:
+    """Page URLs ("urls") and nested sitemaps ("sitemaps") listed in sitemap XML."""
     try:
         root = ET.fromstring(xml_content)
     except ET.ParseError as e:
@@ -75,75 +89,3 @@ def extract_urls_from_sitemap(source: str, timeout: int = 15) -> Dict[str, Set[s
             sitemaps.add(loc.text.strip())
 
     return {"urls": urls, "sitemaps": sitemaps}
-
-
-def collect_all_sitemap_urls(root_url: str, visited=None) -> set[str]:
-    """
-    Recursively collects all page URLs from a given sitemap (URL or file path).
-
-    - Parses the sitemap via extract_urls_from_sitemap()
-    - Recursively follows <sitemapindex> entries
-    - Avoids revisiting already processed sitemaps
-    """
-    if visited is None:
-        visited = set()
-    if root_url in visited:
-        return set()
-
-    visited.add(root_url)
-    logger.debug(f"added {root_url} to visited")
-
-    data = extract_urls_from_sitemap(root_url)
-    all_urls = set(data["urls"])
-
-    for sm_url in data["sitemaps"]:
-        all_urls |= collect_all_sitemap_urls(sm_url, visited)
-
-    return all_urls
-
-
-def discover_sitemaps(base_url: str, timeout: int = 10) -> List[str]:
-    """
-    Attempt to discover sitemap URLs for a given website.
-    
-    Checks:
-      1. robots.txt for 'Sitemap:' entries
-      2. Common default sitemap file paths
-    """
-    discovered = set()
-    parsed = urlparse(base_url)
-    root = f"{parsed.scheme}://{parsed.netloc}"
-
-    # 1️⃣ Look for robots.txt entries
-    robots_url = urljoin(root, "/robots.txt")
-    try:
-        resp = requests.get(robots_url, timeout=timeout, headers={"User-Agent": "SitemapDiscoverer/1.0"})
-        if resp.status_code == 200:
-            for line in resp.text.splitlines():
-                if line.strip().lower().startswith("sitemap:"):
-                    sitemap_url = line.split(":", 1)[1].strip()
-                    if not sitemap_url.startswith("http"):
-                        sitemap_url = urljoin(root, sitemap_url)
-                    discovered.add(sitemap_url)
-    except Exception:
-        pass
-
-    # 2️⃣ Try common sitemap URL patterns
-    common_paths = [
-        "/sitemap.xml",
-        "/sitemap_index.xml",
-        "/sitemap-index.xml",
-        "/sitemap/sitemap.xml",
-        "/sitemaps/sitemap-index.xml"
-    ]
-
-    for path in common_paths:
-        candidate = urljoin(root, path)
-        try:
-            resp = requests.head(candidate, timeout=timeout, allow_redirects=True)
-            if resp.status_code == 200 and "xml" in resp.headers.get("Content-Type", "").lower():
-                discovered.add(candidate)
-        except Exception:
-            continue
-
-    return sorted(discovered)
@@ -1,24 +1,115 @@
+import os
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from uuid import uuid5, NAMESPACE_URL
-from qdrant_client.models import PointStruct
+
+import numpy as np
+from qdrant_client.models import PointStruct, PointIdsList, Batch
+
+from vectorstore.config import generation_collection, GENERATION_POINT_ID
 
 logger = logging.getLogger(__name__)
 
+# The API polls the generation marker this often, so bumping it more often only costs upserts
+GENERATION_BUMP_INTERVAL = float(os.getenv("SEARCH_CACHE_CHECK_SECONDS", "1"))
+
+def chunk_point_id(doc_id: str, index: int) -> str:
+    """Deterministic point id of the index-th chunk of a document."""
+    return str(uuid5(NAMESPACE_URL, f"{doc_id}_{index}")) # must be UUID or unsigned int
+
+def _chunk_payload(chunk: str, metadata: dict, chunk_metadata: list[dict] | None, index: int) -> dict:
+    payload = {"text": chunk, **metadata}
+    if chunk_metadata:
+        payload.update(chunk_metadata[index])
+    return payload
+
+class UploadError(RuntimeError):
+    """Buffered batches failed to upload; `doc_ids` are the documents they contained."""
+
+    def __init__(self, message: str, doc_ids: set[str]):
+        super().__init__(message)
+        self.doc_ids = doc_ids
+
 class VectorDBStore:
-    """Handles saving chunks and embeddings into a Qdrant collection."""
+    """
+    Handles saving chunks and embeddings into a Qdrant collection.
+
+    Writes bump the collection's ingest generation marker (see vectorstore.config),
+    which tells the API that cached search results are stale. The marker is
+    bumped at most once per `generation_interval` seconds, not per document;
+    flush() (or close()) after the last write publishes any change still
+    pending.
+    """
 
-    def __init__(self, client, collection_name: str):
+    def __init__(self, client, collection_name: str, generation_interval: float = GENERATION_BUMP_INTERVAL):
         self.client = client
         self.collection = collection_name
+        self.generation_interval = generation_interval
+        self._track_generation = True
+        self._generation_lock = threading.Lock()
+        self._generation_dirty = False
+        self._last_bump = float("-inf")
+
+    def mark_changed(self, client=None):
+        """Record a write; bumps the generation now unless it was bumped less than `generation_interval` ago."""
+        with self._generation_lock:
+            now = time.monotonic()
+            if now - self._last_bump < self.generation_interval:
+                self._generation_dirty = True
+                return
+            self._generation_dirty, self._last_bump = False, now
+        self._publish_generation(client)
+
+    def flush(self):
+        """Publish a generation change that rate limiting held back."""
+        if self._generation_dirty:
+            self.bump_generation()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
 
-    def save(self, chunks, embeddings, metadata: dict):
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def bump_generation(self, client=None):
+        """Record that the collection changed. Never fails a write; without a marker collection it is a no-op."""
+        with self._generation_lock:
+            self._generation_dirty, self._last_bump = False, time.monotonic()
+        self._publish_generation(client)
+
+    def _publish_generation(self, client=None):
+        if not self._track_generation:
+            return
+        try:
+            (client or self.client).upsert(
+                collection_name=generation_collection(self.collection),
+                points=[PointStruct(id=GENERATION_POINT_ID, vector=[1.0], payload={"generation": time.time_ns()})],
+                wait=False,
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Not tracking ingest generation of '{self.collection}': {e}")
+            self._track_generation = False
+
+    def save(self, chunks, embeddings, metadata: dict, chunk_metadata: list[dict] | None = None, on_stored=None):
+        """
+        Upsert one document. `metadata` goes into every point's payload;
+        `chunk_metadata`, if given, holds extra payload per chunk (e.g. page numbers).
+        `on_stored()`, if given, is called once Qdrant has accepted the points.
+        """
+        # One bulk conversion instead of letting pydantic convert every numpy row
+        vectors = np.asarray(embeddings, dtype=np.float32).tolist()
         points = [
             PointStruct(
-                id=str(uuid5(NAMESPACE_URL, f"{metadata['doc_id']}_{i}")), # must be UUID or unsigned int
-                vector=emb,
-                payload={"text": chunk, **metadata},
+                id=chunk_point_id(metadata['doc_id'], i),
+                vector=vec,
+                payload=_chunk_payload(chunk, metadata, chunk_metadata, i),
             )
-            for i, (chunk, emb) in enumerate(zip(chunks, embeddings))
+            for i, (chunk, vec) in enumerate(zip(chunks, vectors))
         ]
 
         try:
@@ -27,3 +118,194 @@ class VectorDBStore:
         except Exception as e:
             logger.error(f"❌ Failed to upload vectors to Qdrant: {e}", exc_info=True)
             raise
+        self.mark_changed()
+        if on_stored is not None:
+            on_stored()
+
+    def delete_chunks(self, doc_id: str, start: int, stop: int):
+        """
+        Delete the points of chunks start..stop-1 of a document, e.g. the trailing
+        chunks left over after a re-ingested document got shorter.
+        """
+        if stop <= start:
+            return
+        ids = [chunk_point_id(doc_id, i) for i in range(start, stop)]
+        try:
+            self.client.delete(collection_name=self.collection, points_selector=PointIdsList(points=ids))
+            logger.info(f"🧹 Deleted {len(ids)} stale vectors of '{doc_id}' from '{self.collection}'")
+        except Exception as e:
+            logger.error(f"❌ Failed to delete stale vectors from Qdrant: {e}", exc_info=True)
+            raise
+        self.mark_changed()
+
+
+class BufferedVectorDBStore(VectorDBStore):
+    """
+    VectorDBStore that buffers points across documents and upserts them in bulk.
+
+    save() only appends to an in-memory buffer. The buffer is sent as one batch
+    when it reaches `max_points` points or `max_bytes` of vector + text data, or
+    when its oldest point has waited `max_delay` seconds. Up to `parallel`
+    batches are in flight at once; with a `client_factory` each upload thread
+    opens its own client (and connection) instead of sharing `client`.
+
+    With `wait=False` Qdrant acknowledges a batch before indexing it. Uploads
+    run in the background, so save() never raises for them: flush() and close()
+    raise an UploadError naming the documents of the batches that failed, and
+    all of them are kept in `failed_doc_ids`. A document's `on_stored` callback runs
+    only once its batch has been acknowledged, so a process that dies with points
+    still buffered has not recorded those documents as stored. Call close()
+    before exiting, otherwise buffered points are lost.
+    """
+
+    def __init__(
+        self,
+        client,
+        collection_name: str,
+        max_points: int = 2048,
+        max_bytes: int = 16 * 1024 * 1024,
+        max_delay: float = 2.0,
+        parallel: int = 4,
+        wait: bool = False,
+        client_factory=None,
+        generation_interval: float = GENERATION_BUMP_INTERVAL,
+    ):
+        super().__init__(client, collection_name, generation_interval)
+        self.max_points = max_points
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.wait = wait
+        self.client_factory = client_factory
+        self.failed_doc_ids: set[str] = set()
+
+        self._ids, self._vectors, self._payloads, self._callbacks = [], [], [], []
+        self._bytes = 0
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._errors: list[tuple[Exception, set[str]]] = []
+        self._local = threading.local()
+
+        # Bounds the number of batches queued or in flight, so a slow Qdrant
+        # makes save() block instead of growing memory without limit
+        self._slots = threading.BoundedSemaphore(parallel * 2)
+        self._executor = ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="qdrant-upsert")
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._flush_on_timeout, name="qdrant-flush-timer", daemon=True)
+        self._timer.start()
+
+    def save(self, chunks, embeddings, metadata: dict, chunk_metadata: list[dict] | None = None, on_stored=None):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        size = vectors.nbytes + sum(len(chunk) for chunk in chunks)
+
+        with self._lock:
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._ids.extend(chunk_point_id(metadata["doc_id"], i) for i in range(len(chunks)))
+            self._vectors.extend(vectors.tolist())
+            self._payloads.extend(_chunk_payload(chunk, metadata, chunk_metadata, i) for i, chunk in enumerate(chunks))
+            self._bytes += size
+            if on_stored is not None:
+                self._callbacks.append(on_stored)
+            batch = self._take() if len(self._ids) >= self.max_points or self._bytes >= self.max_bytes else None
+
+        if batch:
+            self._submit(batch)
+
+    def flush(self):
+        """Send everything buffered and block until all in-flight batches are done."""
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._submit(batch)
+
+        with self._pending_lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.exception()  # waits; errors are collected by the callback
+        super().flush()
+        self._raise_errors()
+
+    def close(self):
+        """Flush remaining points and release the upload threads."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        # A timer round already under way may still submit a batch; the final
+        # flush must see it, or its upload error would never be raised
+        self._timer.join()
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def _take(self):
+        """Detach the current buffer. Caller must hold self._lock."""
+        if not self._ids:
+            return None
+        batch = (self._ids, self._vectors, self._payloads, self._callbacks)
+        self._ids, self._vectors, self._payloads, self._callbacks = [], [], [], []
+        self._bytes = 0
+        self._oldest = None
+        return batch
+
+    def _submit(self, batch):
+        self._slots.acquire()
+        future = self._executor.submit(self._upsert, *batch)
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future):
+        with self._pending_lock:
+            self._pending.discard(future)
+        self._slots.release()
+
+    def _client(self):
+        if self.client_factory is None:
+            return self.client
+        if not hasattr(self._local, "client"):
+            self._local.client = self.client_factory()
+        return self._local.client
+
+    def _upsert(self, ids, vectors, payloads, callbacks):
+        try:
+            self._client().upsert(
+                collection_name=self.collection,
+                points=Batch(ids=ids, vectors=vectors, payloads=payloads),
+                wait=self.wait,
+            )
+            logger.info(f"✅ Uploaded batch of {len(ids)} vectors to Qdrant collection '{self.collection}'")
+            self.mark_changed(self._client())
+        except Exception as e:
+            logger.error(f"❌ Failed to upload batch of {len(ids)} vectors to Qdrant: {e}", exc_info=True)
+            doc_ids = {p["doc_id"] for p in payloads}
+            with self._lock:
+                self._errors.append((e, doc_ids))
+                self.failed_doc_ids.update(doc_ids)
+            return
+        for on_stored in callbacks:
+            try:
+                on_stored()
+            except Exception as e:
+                logger.error(f"❌ Callback for a stored document failed: {e}", exc_info=True)
+
+    def _raise_errors(self):
+        with self._lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            doc_ids = set().union(*(ids for _, ids in errors))
+            raise UploadError(
+                f"{len(errors)} buffered Qdrant upload(s) of {len(doc_ids)} documents failed, first error: {errors[0][0]}",
+                doc_ids,
+            )
+
+    def _flush_on_timeout(self):
+        while not self._closed.wait(self.max_delay / 2):
+            with self._lock:
+                expired = self._oldest is not None and time.monotonic() - self._oldest >= self.max_delay
+                batch = self._take() if expired else None
+            if batch:
+                self._submit(batch)
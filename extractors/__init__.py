@@ -1,9 +1,12 @@
 from pathlib import Path
+from typing import Iterator
 
-from .pdf_extractor import extract_pdf
+from .segments import Segment
+from .sources import FileSource, source_name
+from .pdf_extractor import extract_pdf, iter_pdf_pages
 from .word_extractor import extract_word
-from .xlsx_extractor import extract_xlsx
-from .pptx_extractor import extract_pptx
+from .xlsx_extractor import extract_xlsx, iter_xlsx_sheets
+from .pptx_extractor import extract_pptx, iter_pptx_slides
 from .text_extractor import extract_txt
 from .csv_extractor import extract_table
 from .html_extractor import extract_html
@@ -39,14 +42,24 @@ EXTRACTORS = {
 
 }
 
+# Formats with natural units that can be streamed one page/slide/sheet at a time
+SEGMENT_EXTRACTORS = {
+    ".pdf": iter_pdf_pages,
+    ".pptx": iter_pptx_slides,
+    ".ppt": iter_pptx_slides,
+    ".xlsx": iter_xlsx_sheets,
+    ".xls": iter_xlsx_sheets,
+}
+
 
-def extract_file(file_path: str) -> str:
+def extract_file(file_path: FileSource) -> str:
     """
     Unified extractor — detects file extension and delegates
     to the appropriate extractor function.
 
     Args:
-        file_path (str): Local file path.
+        file_path: Local file path, or a binary stream (e.g. io.BytesIO)
+            whose `.name` carries the file name.
 
     Returns:
         str: Extracted plain text suitable for further processing.
@@ -54,7 +67,7 @@ def extract_file(file_path: str) -> str:
     Raises:
         ValueError: If no extractor is available for this file type.
     """
-    ext = Path(file_path).suffix.lower()
+    ext = Path(source_name(file_path)).suffix.lower()
     extractor = EXTRACTORS.get(ext)
 
     if not extractor:
@@ -64,3 +77,22 @@ def extract_file(file_path: str) -> str:
     if ext == ".tsv":
         return extractor(file_path)  # lambda handles delimiter
     return extractor(file_path)
+
+
+def extract_file_segments(file_path: FileSource) -> Iterator[Segment]:
+    """
+    Streaming counterpart of extract_file().
+
+    Yields the document as Segments — pages for PDF, slides for PowerPoint,
+    sheets for Excel — so large documents never exist as one big string.
+    Other formats are yielded as a single "document" segment.
+
+    Raises:
+        ValueError: If no extractor is available for this file type.
+    """
+    ext = Path(source_name(file_path)).suffix.lower()
+    iter_segments = SEGMENT_EXTRACTORS.get(ext)
+    if iter_segments:
+        yield from iter_segments(file_path)
+    else:
+        yield Segment(extract_file(file_path))
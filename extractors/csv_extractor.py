@@ -1,25 +1,29 @@
+import io
 import csv
-from charset_normalizer import from_path
+from charset_normalizer import from_bytes
 
-def detect_encoding(file_path):
+from .sources import FileSource, read_bytes
+
+def detect_encoding(data: bytes):
     """
-    Detects the encoding of a file using charset-normalizer.
+    Detects the encoding of raw file content using charset-normalizer.
     Returns the encoding name or 'utf-8' as a safe fallback.
     """
-    result = from_path(file_path).best()
+    result = from_bytes(data).best()
     return result.encoding if result else 'utf-8'
 
-def extract_table(file_path, delimiter=','):
+def extract_table(file_path: FileSource, delimiter=','):
     """
-    Extracts text from CSV/TSV files.
+    Extracts text from CSV/TSV files (path or binary stream).
     - Detects encoding
     - Joins cells with space, rows with newline
     - 'delimiter' can be ',' (CSV) or '\\t' (TSV)
     """
-    encoding = detect_encoding(file_path)
+    data = read_bytes(file_path)
+    encoding = detect_encoding(data)
     text_lines = []
 
-    with open(file_path, newline='', encoding=encoding) as f:
+    with io.StringIO(data.decode(encoding), newline='') as f:
         reader = csv.reader(f, delimiter=delimiter)
         for row in reader:
             text_lines.append(" ".join(row))
@@ -1,26 +1,33 @@
 from bs4 import BeautifulSoup
-from pathlib import Path
 from typing import List
 
-def extract_html(file_path: str, mode: str = "naive") -> str:
+from .sources import FileSource, read_bytes
+
+def extract_html(file_path: FileSource, mode: str = "naive") -> str:
     """
-    Extract readable text from an HTML file.
+    Extract readable text from an HTML file (path or binary stream).
 
     Modes:
         - "naive": Basic HTML text extraction (flattened).
         - "smart": Preserves headings, tables, and hyperlinks, but still returns plain text.
     """
+    html = read_bytes(file_path).decode("utf-8", errors="ignore")
+    return extract_html_string(html, mode=mode)
+
+
+def extract_html_string(html: str, mode: str = "naive") -> str:
+    """Like extract_html(), but takes the HTML itself, e.g. a page fetched by the crawler."""
+    html = html.replace("\r\n", "\n").replace("\r", "\n")  # as HTML parsing (and reading files as text) does
     if mode == "smart":
-        return _extract_html_smart(file_path)
-    return _extract_html_naive(file_path)
+        return _extract_html_smart(html)
+    return _extract_html_naive(html)
 
 
 # ---------------------------------------------------------------------
 # 🧩 Naive mode — quick and flat
 # ---------------------------------------------------------------------
-def _extract_html_naive(file_path: str) -> str:
+def _extract_html_naive(html: str) -> str:
     """Extract plain readable text from HTML. Removes scripts/styles and flattens structure."""
-    html = Path(file_path).read_text(encoding="utf-8", errors="ignore")
     soup = BeautifulSoup(html, "html.parser")
 
     for tag in soup(["script", "style", "noscript", "iframe", "footer", "nav", "header", "form"]):
@@ -34,14 +41,13 @@ def _extract_html_naive(file_path: str) -> str:
 # ---------------------------------------------------------------------
 # 🧠 Smart mode — semantically aware but still plain text
 # ---------------------------------------------------------------------
-def _extract_html_smart(file_path: str) -> str:
+def _extract_html_smart(html: str) -> str:
     """
     Extract semantically structured text from HTML for RAG / LLM use.
 
     - Keeps headings, paragraphs, lists, tables, and hyperlinks.
     - Returns a single string for compatibility with other extractors.
     """
-    html = Path(file_path).read_text(encoding="utf-8", errors="ignore")
     soup = BeautifulSoup(html, "html.parser")
 
     # Remove noise
@@ -1,9 +1,19 @@
+from typing import Iterator
+
 import fitz  # PyMuPDF
 
-def extract_pdf(file_path):
-    text = ""
-    doc = fitz.open(file_path)
-    for page_num, page in enumerate(doc, start=1):
-        page_text = page.get_text()
-        text += f"\n[PAGE {page_num}]\n" + page_text
-    return text
\ No newline at end of file
+from .segments import Segment
+from .sources import FileSource, is_stream, read_bytes
+
+def iter_pdf_pages(file_path: FileSource) -> Iterator[Segment]:
+    """Yield the text of a PDF (path or binary stream) one page at a time."""
+    if is_stream(file_path):
+        doc = fitz.open(stream=read_bytes(file_path), filetype="pdf")
+    else:
+        doc = fitz.open(file_path)
+    with doc:
+        for page_num, page in enumerate(doc, start=1):
+            yield Segment(page.get_text(), kind="page", number=page_num)
+
+def extract_pdf(file_path: FileSource):
+    return "".join(f"\n[PAGE {seg.number}]\n{seg.text}" for seg in iter_pdf_pages(file_path))
@@ -1,12 +1,16 @@
-from pptx import Presentation
+from typing import Iterator
 
-def extract_pptx(file_path):
-    prs = Presentation(file_path)
-    text = ""
+from .segments import Segment
+from .sources import FileSource, rewind
+
+def iter_pptx_slides(file_path: FileSource) -> Iterator[Segment]:
+    """Yield the text of a presentation (path or binary stream) one slide at a time."""
+    from pptx import Presentation  # imported on use, so importing the extractors stays fast
+
+    prs = Presentation(rewind(file_path))
     for slide_num, slide in enumerate(prs.slides, start=1):
-        text += f"\n[SLIDE {slide_num}]\n"
-        for shape in slide.shapes:
-            if hasattr(shape, "text"):
-                text += shape.text + "\n"
-    return text
-    
\ No newline at end of file
+        text = "".join(shape.text + "\n" for shape in slide.shapes if hasattr(shape, "text"))
+        yield Segment(text, kind="slide", number=slide_num)
+
+def extract_pptx(file_path: FileSource):
+    return "".join(f"\n[SLIDE {seg.number}]\n{seg.text}" for seg in iter_pptx_slides(file_path))
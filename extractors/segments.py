@@ -0,0 +1,16 @@
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class Segment:
+    """
+    A positional piece of a document yielded by the streaming extractors.
+
+    `kind` is "page", "slide" or "sheet" for formats that have natural units,
+    and "document" for formats that are extracted in one piece.
+    """
+    text: str
+    kind: str = "document"
+    number: Optional[int] = None  # 1-based page / slide / sheet number
+    label: Optional[str] = None   # e.g. the sheet name
@@ -0,0 +1,34 @@
+import os
+from typing import BinaryIO, Union
+
+# What the extractors accept: a path, or a binary stream such as the io.BytesIO
+# that fetchers.fetch_file() returns for downloads held in memory. Streams carry
+# their file name in `.name`, which decides the extractor.
+FileSource = Union[str, os.PathLike, BinaryIO]
+
+
+def is_stream(source: FileSource) -> bool:
+    return hasattr(source, "read")
+
+
+def source_name(source: FileSource) -> str:
+    """The file name (or path) of a source, used for extension detection and logging."""
+    if is_stream(source):
+        return str(getattr(source, "name", "") or "")
+    return os.fspath(source)
+
+
+def read_bytes(source: FileSource) -> bytes:
+    """The whole content of a path or stream; streams are read from the start."""
+    if is_stream(source):
+        source.seek(0)
+        return source.read()
+    with open(source, "rb") as f:
+        return f.read()
+
+
+def rewind(source: FileSource) -> FileSource:
+    """Streams positioned at their start, so a source can be parsed more than once; paths as they are."""
+    if is_stream(source):
+        source.seek(0)
+    return source
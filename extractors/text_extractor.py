@@ -1,8 +1,13 @@
-def extract_txt(file_path):
+import io
+
+from .sources import FileSource, read_bytes
+
+def extract_txt(file_path: FileSource):
     """
-    Extracts all text from a plain .txt file.
+    Extracts all text from a plain .txt file (path or binary stream).
     Returns the text as a single string.
     """
-    with open(file_path, 'r', encoding='utf-8') as file:
+    # TextIOWrapper translates newlines the same way open(..., "r") does
+    with io.TextIOWrapper(io.BytesIO(read_bytes(file_path)), encoding='utf-8') as file:
         text = file.read()
-    return text
\ No newline at end of file
+    return text
@@ -1,6 +1,8 @@
 from docx import Document
 
-def extract_word(file_path):
-    doc = Document(file_path)
+from .sources import FileSource, rewind
+
+def extract_word(file_path: FileSource):
+    doc = Document(rewind(file_path))  # python-docx reads paths and binary streams alike
     text = "\n".join([p.text for p in doc.paragraphs])
-    return text
\ No newline at end of file
+    return text
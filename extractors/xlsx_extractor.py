@@ -1,10 +1,17 @@
-import pandas as pd
-
-def extract_xlsx(file_path):
-    df_dict = pd.read_excel(file_path, sheet_name=None)  # all sheets
-    text = ""
-    for sheet_name, df in df_dict.items():
-        text += f"\n[SHEET {sheet_name}]\n"
-        sheet_text = " ".join(df.astype(str).fillna("").values.flatten())
-        text += sheet_text
-    return text
\ No newline at end of file
+from typing import Iterator
+
+from .segments import Segment
+from .sources import FileSource, rewind
+
+def iter_xlsx_sheets(file_path: FileSource) -> Iterator[Segment]:
+    """Yield the text of a workbook (path or binary stream) one sheet at a time, parsing each sheet only when needed."""
+    import pandas as pd  # imported on use, so importing the extractors stays fast
+
+    with pd.ExcelFile(rewind(file_path)) as xls:
+        for sheet_num, sheet_name in enumerate(xls.sheet_names, start=1):
+            df = xls.parse(sheet_name)
+            sheet_text = " ".join(df.astype(str).fillna("").values.flatten())
+            yield Segment(sheet_text, kind="sheet", number=sheet_num, label=str(sheet_name))
+
+def extract_xlsx(file_path: FileSource):
+    return "".join(f"\n[SHEET {seg.label}]\n{seg.text}" for seg in iter_xlsx_sheets(file_path))
@@ -1,10 +1,8 @@
-import tempfile
-import shutil
-from pathlib import Path
 from urllib.parse import urlparse
 
-from .local_fetcher import fetch_local_file
-from .http_fetcher import fetch_http_file
+from .download import Download, MEMORY_LIMIT_BYTES
+from .local_fetcher import fetch_local_file, probe_local_file
+from .http_fetcher import fetch_http_file, probe_http_file
 from .ftp_fetcher import fetch_ftp_file
 
 FETCHERS = {
@@ -15,43 +13,60 @@ FETCHERS = {
     "ftp": fetch_ftp_file
 }
 
+PROBES = {
+    "": probe_local_file,
+    "file": probe_local_file,
+    "http": probe_http_file,
+    "https": probe_http_file,
+}
+
 
-def fetch_file(source: str, keep: bool = False):
+def fetch_file(source: str, keep: bool = False, max_in_memory: int = MEMORY_LIMIT_BYTES):
     """
-    Unified fetcher — detects the protocol and downloads or copies the file.
+    Unified fetcher — detects the protocol and downloads or locates the file.
+
+    Remote files of at most `max_in_memory` bytes (FETCH_MEMORY_LIMIT_MB) are
+    returned as an io.BytesIO whose `.name` is the file name, so nothing is
+    written to disk; the extractors take either. Larger ones go to a temp file.
 
     Args:
         source (str): Local or remote path/URL.
-        keep (bool): If True, downloaded temp files are kept for inspection.
+        keep (bool): If True, downloads are always written to temp files and kept for inspection.
+        max_in_memory (int): Size limit in bytes for in-memory downloads.
 
     Returns:
-        tuple[Path, Callable]: (local_path, cleanup_callback)
-            - local_path: Path to the fetched local file
+        tuple[Path | io.BytesIO, Callable]: (file, cleanup_callback)
+            - file: Path to the local file, or the in-memory download
             - cleanup_callback(): safely deletes temp files when called
     """
     parsed = urlparse(source)
     scheme = parsed.scheme.lower()
 
-    # --- Local file: no tempdir involved ---
+    # --- Local file: nothing to download ---
     if scheme in ("", "file"):
         path = fetch_local_file(source)
         return path, (lambda: None)  # no cleanup needed
 
-    # --- Remote file: create controlled tempdir ---
-    tmpdir = Path(tempfile.mkdtemp(prefix="rag_fetch_"))
-    try:
-        if scheme not in FETCHERS:
-            raise ValueError(f"Unsupported protocol: {scheme}")
+    if scheme not in FETCHERS:
+        raise ValueError(f"Unsupported protocol: {scheme}")
 
-        fetcher = FETCHERS[scheme]
-        local_path = fetcher(source, tmpdir)
+    fetcher = FETCHERS[scheme]
+    download: Download = fetcher(source, 0 if keep else max_in_memory)
+    return download.result(), (lambda: None) if keep else download.cleanup
 
-        def cleanup():
-            if not keep and tmpdir.exists():
-                shutil.rmtree(tmpdir, ignore_errors=True)
 
-        return local_path, cleanup
+def probe_source(source: str) -> dict:
+    """
+    Cheaply fingerprint a source without fetching it.
 
+    Returns size/mtime for local files and ETag/Last-Modified for HTTP(S),
+    or an empty dict if the protocol has no probe or probing fails.
+    """
+    scheme = urlparse(source).scheme.lower()
+    probe = PROBES.get(scheme)
+    if not probe:
+        return {}
+    try:
+        return probe(source)
     except Exception:
-        shutil.rmtree(tmpdir, ignore_errors=True)
-        raise
\ No newline at end of file
+        return {}
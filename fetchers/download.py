@@ -0,0 +1,55 @@
+import io
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+# Downloads up to this size are handed to the extractors as in-memory buffers;
+# larger ones are written to a temp file.
+MEMORY_LIMIT_BYTES = int(float(os.getenv("FETCH_MEMORY_LIMIT_MB", "32")) * 1024 * 1024)
+
+
+class Download:
+    """
+    Receives a remote file in chunks. It stays in memory while it is at most
+    `max_in_memory` bytes (as an io.BytesIO named after the file) and is spilled
+    to a file in its own temp directory as soon as it grows beyond that.
+    A known `size` above the limit goes to disk right away.
+    """
+
+    def __init__(self, filename: str, max_in_memory: int = MEMORY_LIMIT_BYTES, size: Optional[int] = None):
+        self.filename = filename
+        self.max_in_memory = max_in_memory
+        self.tmpdir: Optional[Path] = None
+        self._buffer = io.BytesIO()
+        self._buffer.name = filename
+        self._file = None
+        if size is not None and size > max_in_memory:
+            self._spill()
+
+    def _spill(self):
+        self.tmpdir = Path(tempfile.mkdtemp(prefix="rag_fetch_"))
+        self._file = open(self.tmpdir / self.filename, "wb")
+        self._file.write(self._buffer.getbuffer())
+        self._buffer = None
+
+    def write(self, chunk: bytes):
+        if self._file is None and self._buffer.tell() + len(chunk) > self.max_in_memory:
+            self._spill()
+        (self._file or self._buffer).write(chunk)
+
+    def result(self) -> Path | io.BytesIO:
+        """The downloaded file: its Path if it was spilled to disk, otherwise the rewound buffer."""
+        if self._file is not None:
+            self._file.close()
+            return self.tmpdir / self.filename
+        self._buffer.seek(0)
+        return self._buffer
+
+    def cleanup(self):
+        if self._file is not None:
+            self._file.close()
+        if self.tmpdir is not None:
+            shutil.rmtree(self.tmpdir, ignore_errors=True)
+        self._buffer = None
@@ -1,22 +1,32 @@
 from urllib.parse import urlparse
 from pathlib import Path
 
+from .download import Download, MEMORY_LIMIT_BYTES
+
 try:
     from ftplib import FTP
 except ImportError:
     FTP = None
 
-def fetch_ftp_file(url: str, tmpdir: Path) -> Path:
-    """Download a file from an FTP server."""
+def fetch_ftp_file(url: str, max_in_memory: int = MEMORY_LIMIT_BYTES) -> Download:
+    """Download a file from an FTP server, in memory up to `max_in_memory` bytes (see Download)."""
     if not FTP:
         raise RuntimeError("ftplib not available for FTP support.")
     parsed = urlparse(url)
     host = parsed.hostname
     user = parsed.username or "anonymous"
     passwd = parsed.password or ""
-    dest = tmpdir / Path(parsed.path).name
     with FTP(host) as ftp:
         ftp.login(user, passwd)
-        with open(dest, "wb") as f:
-            ftp.retrbinary(f"RETR " + parsed.path, f.write)
-    return dest
+        try:
+            ftp.voidcmd("TYPE I")  # SIZE needs binary mode on most servers
+            size = ftp.size(parsed.path)
+        except Exception:
+            size = None
+        download = Download(Path(parsed.path).name, max_in_memory, size)
+        try:
+            ftp.retrbinary(f"RETR " + parsed.path, download.write)
+        except Exception:
+            download.cleanup()
+            raise
+    return download
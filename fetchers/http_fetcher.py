@@ -4,14 +4,27 @@ import requests
 from pathlib import Path
 from urllib.parse import urlparse
 
-def fetch_http_file(url: str, tmpdir: Path) -> Path:
+from .download import Download, MEMORY_LIMIT_BYTES
+
+def fetch_http_file(url: str, max_in_memory: int = MEMORY_LIMIT_BYTES) -> Download:
     """
-    Download a file via HTTP/HTTPS into tmpdir.
+    Download a file via HTTP/HTTPS, in memory up to `max_in_memory` bytes (see Download).
     Uses Content-Disposition and Content-Type to determine extension.
     """
-    response = requests.get(url, timeout=30)
-    response.raise_for_status()
+    with requests.get(url, timeout=30, stream=True) as response:
+        response.raise_for_status()
+        length = response.headers.get("Content-Length")
+        download = Download(_filename(url, response), max_in_memory, int(length) if length and length.isdigit() else None)
+        try:
+            for chunk in response.iter_content(chunk_size=1 << 16):
+                download.write(chunk)
+        except Exception:
+            download.cleanup()
+            raise
+    return download
 
+
+def _filename(url: str, response: requests.Response) -> str:
     # Try filename from Content-Disposition header
     cd = response.headers.get("Content-Disposition", "")
     filename_match = re.search(r'filename="([^"]+)"', cd)
@@ -27,7 +40,19 @@ def fetch_http_file(url: str, tmpdir: Path) -> Path:
         ext = mimetypes.guess_extension(mime.split(";")[0].strip()) if mime else None
         if ext:
             filename += ext
+    return filename
+
 
-    dest = tmpdir / filename
-    dest.write_bytes(response.content)
-    return dest
+def probe_http_file(url: str) -> dict:
+    """
+    Return the cache validators of a remote file (ETag, Last-Modified, size)
+    using a HEAD request, without downloading the body.
+    """
+    response = requests.head(url, timeout=10, allow_redirects=True)
+    response.raise_for_status()
+    length = response.headers.get("Content-Length")
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "size": int(length) if length and length.isdigit() else None,
+    }
@@ -7,3 +7,9 @@ def fetch_local_file(path: str) -> Path:
     if not abs_path.exists():
         raise FileNotFoundError(f"Local file not found: {abs_path}")
     return abs_path
+
+
+def probe_local_file(path: str) -> dict:
+    """Return size and mtime of a local file, used to detect changes between runs."""
+    st = Path(os.path.abspath(path)).stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
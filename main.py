@@ -1,16 +1,15 @@
-from db_store import VectorDBStore
-from pipeline import process_document, get_embedding_dimension
-from fetchers import fetch_file
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from db_store import BufferedVectorDBStore
+from pipeline import get_embedding_dimension, get_embedder, get_chunking_config
+from manifest import IngestManifest
+from text_utils.embedding_generator import EmbeddingBatcher
+from staged_pipeline import StagedPipeline
 from extractors.html_extractor import collect_urls
-from vectorstore.config import setup_qdrant
+from vectorstore.config import setup_qdrant, make_qdrant_client
 import os, logging, requests
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-embedding_size = get_embedding_dimension()
-
 def _should_include_file(path, extensions):
     """
     Helper to check if file should be included based on extension filter.
@@ -61,26 +60,6 @@ def collect_urls_from(base_url, domain=None, user_agent="MyCrawler/1.0"):
     response.raise_for_status()
     return collect_urls(base_url, response.text, domain_limit=domain)
 
-def process_any_document(source: str, keep_temp: bool = False, store: VectorDBStore | None = None):
-    """
-    Fetch (local or remote) and process a document, then upload it to VectorDB.
-    """
-    local_path, cleanup = fetch_file(source, keep=keep_temp)
-    try:
-        result = process_document(
-            str(local_path),
-            source=source,
-            skip_if_duplicate=False,
-            store=store,
-        )
-        logger.info(f"Processed '{source}' → status='{result.status}', doc_id={result.doc_id}")
-        return result
-    except Exception as e:
-        logger.error(f"❌ Failed to process {source}: {e}")
-        return {"source": source, "status": "exception", "error": str(e)}
-    finally:
-        cleanup()
-
 def calculate_max_workers(len_of_sources):
     """
         Count CPU threads (or fallback to 4)
@@ -91,14 +70,18 @@ def calculate_max_workers(len_of_sources):
         fallback to max_workers = len_of_sources
     """
     cpu_threads = os.cpu_count() or 4
-    max_workers = min(cpu_threads - 2, len_of_sources)
+    max_workers = max(1, min(cpu_threads - 2, len_of_sources))
     logger.info(f"🚀 Calculated parallel processing with {max_workers} workers (CPU has {cpu_threads} threads)")
+    return max_workers
 
 if __name__ == "__main__":
 
     # --- DB setup ---
+    embedding_size = get_embedding_dimension()
     qdrant, collection = setup_qdrant(embedding_size)
-    store = VectorDBStore(qdrant, collection)
+    # Points are buffered across documents and upserted in parallel bulk batches
+    store = BufferedVectorDBStore(qdrant, collection, parallel=4, wait=False, client_factory=make_qdrant_client)
+    manifest = IngestManifest(os.getenv("INGEST_MANIFEST_PATH", "ingest_manifest.db"))
 
     # --- Source setup ---
     local_files = collect_local_files("/home/nikola/rag_temp", recursive=True)
@@ -107,16 +90,55 @@ if __name__ == "__main__":
     sources = urls | set(local_files)
     logger.info(f"📄 Found {len(sources)} sources to process")
 
-    # --- Parallel processing ---
+    # --- Staged processing ---
+    # Fetching is I/O bound and extraction CPU bound, so they are sized separately.
+    # Extraction runs in worker processes to get around the GIL.
+    # Embed workers only submit to the shared batcher, which runs a single model.
     max_workers = calculate_max_workers(len(sources))
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(process_any_document, src, False, store) for src in sources]
-        for future in as_completed(futures):
-            try:
-                result = future.result()
-                logger.info(f"✅ Completed: {result.source if hasattr(result, 'source') else 'Unknown'}")
-            except Exception as e:
-                logger.error(f"❌ Thread failed: {e}")
+    # All workers share one batcher, so short pages are embedded together in full batches.
+    # With model replicas each flush is split across them, so it is sized to fill every replica.
+    embedder = get_embedder()
+    batcher = EmbeddingBatcher(embedder, batch_size=64 * max(1, embedder.replicas), max_wait=0.05)
+
+    with batcher:
+        engine = StagedPipeline(
+            store=store,
+            fetchers=16,
+            extractors=max_workers,
+            extract_processes=max_workers,
+            embedders=4,
+            upserters=2,
+            batcher=batcher,
+            manifest=manifest,
+            chunking=get_chunking_config(),
+        )
+        results = engine.run(sources)
+
+    # Drain the write buffer. Documents are recorded in the manifest only once their
+    # batch is acknowledged, so those in failed batches are re-ingested next run
+    try:
+        store.close()
+    except Exception as e:
+        logger.error(f"❌ Final Qdrant flush failed: {e}")
+    if store.failed_doc_ids:
+        logger.warning(f"⚠️ {len(store.failed_doc_ids)} documents were not stored and will be retried next run")
+        for r in results:
+            if r.doc_id in store.failed_doc_ids:
+                r.status = "failed"
+                r.error = "upload_failed: its buffered batch was rejected"
+    manifest.close()
+
+    skipped = sum(1 for r in results if r.status == "skipped")
+    logger.info(f"⏭️ Skipped {skipped} unchanged sources")
+
+    cache = embedder.cache
+    if cache is not None:
+        logger.info(f"🗃️ Embedding cache: {cache.stats()}")
+    embedder.close()
+
+    failed = [r for r in results if r.status not in ("success", "skipped")]
+    for r in failed:
+        logger.error(f"❌ Failed: {r.source} ({r.error})")
 
     logger.info("🏁 All documents processed.")
\ No newline at end of file
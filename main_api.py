@@ -1,10 +1,71 @@
-from fastapi import FastAPI
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api.routes import router
+from app.services import qdrant_service, metrics
 
-app = FastAPI(title="Vector Pipeline API")
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the model before taking traffic; with API_WARMUP=0 it loads on the first query
+    if os.getenv("API_WARMUP", "1") == "1":
+        try:
+            await qdrant_service.warmup()
+        except Exception as e:
+            logger.error(f"❌ Model warmup failed, worker stays unready: {e}", exc_info=True)
+    background = [asyncio.create_task(metrics.watch_event_loop())]
+    if metrics.registry.directory:
+        background.append(asyncio.create_task(metrics.sync_snapshots()))
+    yield
+    for task in background:
+        task.cancel()
+    if metrics.registry.directory:
+        metrics.registry.write_snapshot()  # keep the final counts of this worker
+    await qdrant_service.shutdown()
+
+app = FastAPI(title="Vector Pipeline API", lifespan=lifespan)
 
 app.include_router(router, prefix="/api")
 
+def _route_label(request: Request) -> str:
+    """The matched route's path template, never the raw path, so the number of series stays bounded."""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    with metrics.requests_in_flight.track():
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.request_seconds.observe(time.perf_counter() - started, route=_route_label(request), status=str(status))
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Metrics in the Prometheus text format: of all workers with METRICS_DIR, of this one otherwise."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/")
 def root():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/health/live")
+def liveness():
+    """The process is up and serving HTTP; says nothing about the model or Qdrant."""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def readiness():
+    """200 once the model is loaded and the collection is reachable, 503 otherwise."""
+    checks = await qdrant_service.readiness()
+    ready = all(checks.values())
+    return JSONResponse({"status": "ready" if ready else "unready", **checks}, status_code=200 if ready else 503)
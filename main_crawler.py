@@ -3,19 +3,32 @@ main_crawler.py — Entry point for website crawling and HTML text extraction.
 """
 
 import argparse
-from crawler.crawler import crawl_domain
+from crawler.crawler import crawl_domains
 
 def main():
 
     parser = argparse.ArgumentParser(description="Crawl websites and extract readable text.")
-    parser.add_argument("url", help="Base URL to crawl, e.g. https://www.index.hr")
+    parser.add_argument("urls", nargs="+", metavar="url", help="Base URL(s) to crawl, e.g. https://www.index.hr")
     parser.add_argument("--limit", type=int, default=10, help="Max number of pages to crawl per domain")
-    parser.add_argument("--delay", type=float, default=1.0, help="Delay between requests (seconds)")
+    parser.add_argument("--delay", type=float, default=1.0, help="Min seconds between requests to the same host")
+    parser.add_argument("--concurrency", type=int, default=32, help="Max requests in flight across all hosts")
+    parser.add_argument("--per-host", type=int, default=2, help="Max requests in flight per host")
+    parser.add_argument("--burst", type=int, default=1, help="Requests a host may get at once after being idle")
+    parser.add_argument("--ignore-robots", action="store_true", help="Ignore robots.txt Disallow and Crawl-delay rules")
     parser.add_argument("--output", default="output/crawler-data", help="Output directory for extracted text")
     
     args = parser.parse_args()
 
-    crawl_domain(args.url, output_dir=args.output, limit=args.limit, delay=args.delay)
+    crawl_domains(
+        args.urls,
+        output_dir=args.output,
+        limit=args.limit,
+        delay=args.delay,
+        concurrency=args.concurrency,
+        per_host=args.per_host,
+        burst=args.burst,
+        respect_robots=not args.ignore_robots,
+    )
 
 if __name__ == "__main__":
     main()
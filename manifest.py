@@ -0,0 +1,94 @@
+import time
+import sqlite3
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Fingerprint fields that can prove a source is unchanged on their own
+_VALIDATORS = ("mtime_ns", "etag", "last_modified")
+
+
+class IngestManifest:
+    """
+    Persistent record of ingested sources, stored in a local SQLite file.
+
+    For every source it keeps the fingerprint seen at fetch time (size/mtime for
+    files, ETag/Last-Modified for URLs), the content hash of the cleaned text and
+    the number of chunks uploaded. Re-runs use it to skip unchanged sources before
+    extraction, and to delete stale trailing points when a document shrinks.
+    """
+
+    def __init__(self, path: str = "ingest_manifest.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sources (
+                    source        TEXT PRIMARY KEY,
+                    size          INTEGER,
+                    mtime_ns      INTEGER,
+                    etag          TEXT,
+                    last_modified TEXT,
+                    hash          TEXT,
+                    num_chunks    INTEGER,
+                    doc_id        TEXT,
+                    updated_at    REAL
+                )
+                """
+            )
+
+    def get(self, source: str) -> Optional[dict]:
+        """Return the stored entry for a source, or None if it was never ingested."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM sources WHERE source = ?", (source,)).fetchone()
+        return dict(row) if row else None
+
+    def is_unchanged(self, source: str, fingerprint: dict) -> bool:
+        """
+        True if the source was ingested before and its fingerprint still matches.
+
+        Only fields present in `fingerprint` are compared, and at least one real
+        validator (mtime, ETag or Last-Modified) is required; a URL that sends
+        neither is always treated as changed.
+        """
+        known = {k: v for k, v in (fingerprint or {}).items() if v is not None}
+        if not any(k in known for k in _VALIDATORS):
+            return False
+
+        entry = self.get(source)
+        if entry is None:
+            return False
+        return all(entry.get(k) == v for k, v in known.items())
+
+    def record(self, source: str, fingerprint: dict | None, doc_hash: str, num_chunks: int, doc_id: str):
+        """Store (or replace) the entry for a successfully ingested source."""
+        fingerprint = fingerprint or {}
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO sources
+                    (source, size, mtime_ns, etag, last_modified, hash, num_chunks, doc_id, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    source,
+                    fingerprint.get("size"),
+                    fingerprint.get("mtime_ns"),
+                    fingerprint.get("etag"),
+                    fingerprint.get("last_modified"),
+                    doc_hash,
+                    num_chunks,
+                    doc_id,
+                    time.time(),
+                ),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
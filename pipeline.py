@@ -1,22 +1,72 @@
 import os
+import time
 import hashlib
 import logging
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
 from typing import Optional
+from urllib.parse import urlparse
 from text_utils.embedding_generator import EmbeddingGenerator
-from extractors import extract_file
-from text_utils.cleaning import clean_text
-from text_utils.chunking import chunk_text
+from text_utils.embedding_cache import EmbeddingCache
+from extractors import extract_file_segments
+from extractors.sources import FileSource, source_name
+from text_utils.cleaning import clean_text_fast
+from text_utils.chunking import ChunkingConfig, chunk_stream
 from text_utils.doc_id_generator import make_sanitized_doc_id
 
 logger = logging.getLogger(__name__)
 
-embedder = EmbeddingGenerator()
+# Created on first use, so extraction worker processes importing this module never load the model
+embedder: EmbeddingGenerator | None = None
+_embedder_lock = threading.Lock()
+
+def get_embedder() -> EmbeddingGenerator:
+    """
+    Return the shared EmbeddingGenerator, creating it on first call.
+
+    Set EMBEDDING_CACHE_PATH to reuse embeddings of unchanged chunks across runs,
+    EMBEDDING_BACKEND to "onnx" or "onnx-int8" to run the model in ONNX Runtime,
+    EMBEDDING_REPLICAS to run that many model copies in processes pinned to cores,
+    and EMBEDDING_TOKEN_BUDGET to batch chunks by padded tokens instead of count.
+    """
+    global embedder
+    with _embedder_lock:
+        if embedder is None:
+            cache_path = os.getenv("EMBEDDING_CACHE_PATH")
+            cache = None
+            if cache_path:
+                max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "1000000"))
+                cache = EmbeddingCache(cache_path, max_entries=max_entries)
+            embedder = EmbeddingGenerator(
+                cache=cache,
+                backend=os.getenv("EMBEDDING_BACKEND", "torch"),
+                onnx_dir=os.getenv("EMBEDDING_ONNX_DIR"),
+                replicas=int(os.getenv("EMBEDDING_REPLICAS", "0")),
+                token_budget=int(os.getenv("EMBEDDING_TOKEN_BUDGET", "0")) or None,
+            )
+    return embedder
+
+def get_chunking_config(strategy: str | None = None) -> ChunkingConfig:
+    """
+    Chunking settings from CHUNK_STRATEGY: "words" (default) or "tokens", which
+    packs chunks to the embedding model's max sequence length.
+    """
+    strategy = strategy or os.getenv("CHUNK_STRATEGY", "words")
+    if strategy == "tokens":
+        return get_embedder().token_chunking_config()
+    return ChunkingConfig()
+
+def source_domain(source: str) -> str | None:
+    """Host of a URL source without a leading 'www.', lowercased; None for local files."""
+    parsed = urlparse(source)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return None
+    host = parsed.hostname.lower()
+    return host[4:] if host.startswith("www.") else host
 
 def get_embedding_dimension() -> int:
-    """Expose embedding vector size for DB setup."""
-    sample_vector = embedder.generate(["dimension_check"])[0]
-    return len(sample_vector)
+    """Expose embedding vector size for DB setup, read from the model config without loading the model."""
+    return get_embedder().dimension
     
 @dataclass
 class ProcessResult:
@@ -29,76 +79,216 @@ class ProcessResult:
     error: Optional[str] = None
 
 
-def process_document(
-    local_path: str,
-    source: str | None = None,
-    skip_if_duplicate: bool = True,
-    store=None
-) -> ProcessResult:
+@dataclass
+class PreparedDocument:
+    """A document after extraction, cleaning and chunking, ready for embedding."""
+    result: ProcessResult
+    chunks: list[str] = field(default_factory=list)
+    chunk_pages: Optional[list[tuple[int, int]]] = None  # (first, last) page/slide/sheet per chunk
+    fingerprint: Optional[dict] = None  # from fetchers.probe_source(), recorded in the manifest
+
+
+def prepare_document(local_path: FileSource, source: str | None = None, chunking: ChunkingConfig | None = None) -> PreparedDocument:
     """
-    Extract, clean, chunk, embed, and upload text from a given document to Qdrant.
+    Extract, clean, hash and chunk a document. Touches neither the model nor the DB.
+    `local_path` is a path or an in-memory download from fetchers.fetch_file().
+    `chunking` defaults to 500-word chunks with 50 words of overlap.
+
+    This is the CPU-bound part of process_document(). It is a plain module-level
+    function with picklable input and output, so it can run in a ProcessPoolExecutor.
+    On failure `prepared.result.error` is set and `prepared.chunks` is empty.
     """
 
-    result = ProcessResult(path=local_path, source=source or local_path, status="failed")
+    path = source_name(local_path)  # a download held in memory is named after its file
+    result = ProcessResult(path=path, source=source or path, status="failed")
+    prepared = PreparedDocument(result=result)
+
+    # Steps 1-4 run as a stream: each page/slide/sheet is extracted, cleaned,
+    # hashed and chunked before the next one is read, so a huge PDF never
+    # exists as one big string (plus cleaned and split copies of it).
+    hasher = hashlib.sha256()
+    seen = {"raw": False, "clean": False}
+
+    def cleaned_segments():
+        # Step 1: Extract
+        for segment in extract_file_segments(local_path):
+            if not segment.text:
+                continue
+            seen["raw"] = True
+
+            # Step 2: Clean
+            text = clean_text_fast(segment.text)
+            if not text:
+                continue
 
-    # Step 1: Extract
+            # Step 3: Hash for deduplication
+            if seen["clean"]:
+                hasher.update(b"\n")
+            seen["clean"] = True
+            hasher.update(text.encode("utf-8"))
+
+            yield text, segment.number
+
+    # Step 4: Chunk
+    chunks, pages = [], []
     try:
-        text = extract_file(local_path)
+        for chunk, first_page, last_page in chunk_stream(cleaned_segments(), chunking or ChunkingConfig()):
+            chunks.append(chunk)
+            pages.append((first_page, last_page))
     except Exception as e:
-        logger.error(f"Extraction failed for {local_path}: {e}", exc_info=True)
+        logger.error(f"Extraction failed for {path}: {e}", exc_info=True)
         result.error = str(e)
-        return result
+        return prepared
 
-    if not text:
-        logger.warning(f"No text extracted from {local_path}")
+    if not seen["raw"]:
+        logger.warning(f"No text extracted from {path}")
         result.error = "empty_extraction"
-        return result
+        return prepared
 
-    # Step 2: Clean
-    text = clean_text(text)
-    if not text.strip():
+    if not seen["clean"]:
         result.error = "empty_after_cleaning"
-        return result
+        return prepared
 
-    # Step 3: Hash for deduplication
-    doc_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
-    result.hash = doc_hash
+    result.hash = hasher.hexdigest()
 
-    # Step 4: Chunk
-    chunks = chunk_text(text, chunk_size=500, overlap=50)
     if not chunks:
         result.error = "no_chunks"
-        return result
+        return prepared
+
+    prepared.chunks = chunks
+    if pages[0][0] is not None:
+        prepared.chunk_pages = pages
+    return prepared
+
+
+def skip_if_unchanged(prepared: PreparedDocument, manifest) -> bool:
+    """
+    Content-level dedup: if the manifest already holds this source with the same
+    text hash, mark the result as skipped (refreshing its fingerprint) and return True.
+
+    This catches sources whose fingerprint changed but whose text did not, e.g.
+    URLs without ETag/Last-Modified or files that were merely touched.
+    """
+    result = prepared.result
+    entry = manifest.get(result.source) if manifest else None
+    if not entry or entry["hash"] != result.hash:
+        return False
+
+    manifest.record(result.source, prepared.fingerprint, result.hash, entry["num_chunks"], entry["doc_id"])
+    result.status = "skipped"
+    result.doc_id = entry["doc_id"]
+    result.num_chunks = entry["num_chunks"]
+    logger.info(f"⏭️ Skipped {result.path}: content unchanged since last ingestion")
+    return True
 
-    # Step 5: Embeddings
+
+def embed_document(prepared: PreparedDocument, batcher=None):
+    """
+    Step 5: embed the chunks of a prepared document.
+
+    Returns the embeddings, or None with `prepared.result.error` set on failure.
+    """
     try:
-        embeddings = embedder.generate(chunks)
+        return (batcher or get_embedder()).generate(prepared.chunks)
     except Exception as e:
-        logger.error(f"Embedding failed for {local_path}: {e}", exc_info=True)
-        result.error = str(e)
-        return result
+        logger.error(f"Embedding failed for {prepared.result.path}: {e}", exc_info=True)
+        prepared.result.error = str(e)
+        return None
+
+
+def upload_document(prepared: PreparedDocument, embeddings, store=None, manifest=None) -> ProcessResult:
+    """
+    Step 6: upload chunks and embeddings to the vector DB and finalize the result.
 
-    # Step 6: Upload directly to vector DB
-    doc_id = make_sanitized_doc_id(source or local_path)
+    With a `manifest`, points of a previous, longer version of the document
+    (`doc_id_{i}` beyond the new chunk count) are deleted and the source is
+    recorded once the store has accepted its points.
+    """
+    result = prepared.result
+    chunks = prepared.chunks
+
+    doc_id = make_sanitized_doc_id(result.source)
+    original_name = os.path.basename(result.path)
     metadata = {
-        "source": source or local_path,
-        "original_name": os.path.basename(local_path),
-        "hash": doc_hash,
+        "source": result.source,
+        "original_name": original_name,
+        "hash": result.hash,
         "num_chunks": len(chunks),
         "doc_id": doc_id,
+        # Indexed filter fields for the search API
+        "domain": source_domain(result.source),
+        "extension": os.path.splitext(original_name)[1].lstrip(".").lower() or None,
+        "ingested_at": int(time.time()),
     }
 
+    chunk_metadata = None
+    if prepared.chunk_pages:
+        chunk_metadata = [{"page_start": first, "page_end": last} for first, last in prepared.chunk_pages]
+
+    # Stale trailing points go first: their ids never overlap the new ones, and if
+    # the delete fails the source is not recorded, so the next run retries it
+    previous = manifest.get(result.source) if manifest else None
+    if store and previous and previous["num_chunks"] > len(chunks):
+        try:
+            store.delete_chunks(doc_id, len(chunks), previous["num_chunks"])
+        except Exception as e:
+            result.error = f"stale_delete_failed: {e}"
+            return result
+
+    record = None
+    if manifest:
+        def record():
+            manifest.record(result.source, prepared.fingerprint, result.hash, len(chunks), doc_id)
+
     if store:
         try:
-            store.save(chunks, embeddings, metadata)
+            # A buffering store calls `record` only once the points are acknowledged
+            store.save(chunks, embeddings, metadata, chunk_metadata, on_stored=record)
         except Exception as e:
-            logger.error(f"Qdrant upload failed for {local_path}: {e}", exc_info=True)
+            logger.error(f"Qdrant upload failed for {result.path}: {e}", exc_info=True)
             result.error = f"upload_failed: {e}"
             return result
+    elif record is not None:
+        record()
 
     # Step 7: Done
     result.status = "success"
     result.doc_id = doc_id
     result.num_chunks = len(chunks)
-    logger.info(f"✅ Processed and uploaded {local_path} → {len(chunks)} chunks, doc_id={doc_id}")
+    logger.info(f"✅ Processed and uploaded {result.path} → {len(chunks)} chunks, doc_id={doc_id}")
     return result
+
+
+def process_document(
+    local_path: FileSource,
+    source: str | None = None,
+    skip_if_duplicate: bool = True,
+    store=None,
+    batcher=None,
+    manifest=None,
+    fingerprint: dict | None = None,
+    chunking: ChunkingConfig | None = None
+) -> ProcessResult:
+    """
+    Extract, clean, chunk, embed, and upload text from a given document to Qdrant.
+
+    If `batcher` (an EmbeddingBatcher) is given, chunks are embedded together with
+    those of other concurrently processed documents instead of in a batch of their own.
+
+    If a `manifest` (IngestManifest) is given, the source is recorded in it with
+    `fingerprint`, and with `skip_if_duplicate` a document whose cleaned text hash
+    matches the recorded one is not re-embedded.
+    """
+    prepared = prepare_document(local_path, source, chunking)
+    prepared.fingerprint = fingerprint
+    if prepared.result.error:
+        return prepared.result
+
+    if skip_if_duplicate and skip_if_unchanged(prepared, manifest):
+        return prepared.result
+
+    embeddings = embed_document(prepared, batcher)
+    if embeddings is None:
+        return prepared.result
+
+    return upload_document(prepared, embeddings, store, manifest)
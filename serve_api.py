@@ -0,0 +1,153 @@
+"""
+serve_api.py — Pre-fork server for the search API.
+
+The parent process imports the app and loads the embedding model once, then
+forks the workers, so all of them share one copy of the weights
+(copy-on-write). Objects alive at fork time are moved out of the GC's reach
+with gc.freeze(), so garbage collections in the workers don't write to (and
+thereby duplicate) the shared pages. Each worker creates its own Qdrant
+client and query batcher after the fork and warms the model up (API_WARMUP).
+The workers share a METRICS_DIR (a temp directory unless set), so /metrics
+reports the totals of all of them whichever worker answers.
+
+    python serve_api.py --workers 8 --port 8000
+
+The parent only supervises: workers that die are replaced, SIGTERM/SIGINT
+stop them all.
+"""
+
+import argparse
+import gc
+import logging
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from pathlib import Path
+
+import uvicorn
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """The listening socket, opened once in the parent and inherited by every worker."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(app, sock: socket.socket, threads: int, log_level: str):
+    """Body of a forked worker: serve `app` on the inherited socket until told to stop."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    # Split the cores between workers instead of letting each use all of them
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level, lifespan="on"))
+    server.run(sockets=[sock])
+
+def spawn_worker(app, sock: socket.socket, threads: int, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            run_worker(app, sock, threads, log_level)
+            code = 0
+        except KeyboardInterrupt:
+            code = 0
+        except Exception as e:
+            logger.error(f"❌ Worker {os.getpid()} crashed: {e}", exc_info=True)
+        finally:
+            os._exit(code)  # never return into the parent's supervisor loop
+    logger.info(f"👷 Started worker {pid}")
+    return pid
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Serve the search API from pre-forked workers sharing one model copy.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Model threads per worker (default: CPU cores / workers, at least 1)")
+    parser.add_argument("--backlog", type=int, default=2048, help="Listen backlog of the shared socket")
+    parser.add_argument("--log-level", default="info")
+
+    args = parser.parse_args()
+
+    if int(os.getenv("EMBEDDING_REPLICAS", "0")) > 0:
+        parser.error("EMBEDDING_REPLICAS can't be combined with pre-forked workers; unset it")
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+
+    # Before importing the app, which reads it. Snapshots of an earlier run would add to the counts.
+    own_metrics_dir = not os.getenv("METRICS_DIR")
+    if own_metrics_dir:
+        os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="rag_metrics_")
+    metrics_dir = Path(os.environ["METRICS_DIR"])
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    for stale in metrics_dir.glob("*.json"):
+        stale.unlink()
+
+    from main_api import app
+    from app.services import qdrant_service
+
+    embedder = qdrant_service.embedder
+    if embedder.backend == "torch":
+        # Load the weights only: inference starts thread pools that don't survive a fork,
+        # so the first batch runs in each worker (API_WARMUP)
+        started = time.perf_counter()
+        embedder.model
+        logger.info(f"📦 Loaded embedding model in the parent in {time.perf_counter() - started:.1f}s")
+    else:
+        logger.warning(f"⚠️ {embedder.backend} sessions can't be shared across a fork; each worker loads its own model")
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    logger.info(f"🌐 Listening on {args.host}:{args.port} with {args.workers} workers, {threads} thread(s) each")
+
+    gc.collect()
+    gc.freeze()
+
+    workers = {spawn_worker(app, sock, threads, args.log_level) for _ in range(args.workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if not stopping:
+            logger.warning(f"⚠️ Worker {pid} exited (status {status}), starting a new one")
+            time.sleep(1)  # don't spin if workers crash on startup
+            workers.add(spawn_worker(app, sock, threads, args.log_level))
+
+    sock.close()
+    if own_metrics_dir:
+        shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
+    logger.info("👋 All workers stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Optional
+
+from fetchers import fetch_file, probe_source
+from fetchers.download import MEMORY_LIMIT_BYTES
+from extractors.sources import source_name
+from pipeline import ProcessResult, PreparedDocument, prepare_document, skip_if_unchanged, embed_document, upload_document
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()  # end-of-stream marker passed between stages
+
+
+class _Stage:
+    """
+    A pool of worker threads reading from `inbox` and writing to `outbox`.
+
+    `handler(item)` returns the item for the next stage, or None if the item was
+    finished (or failed) here. If it raises, `on_error(item, exc)` is called so
+    the item is still accounted for. Puts into a full `outbox` block, which is
+    what propagates backpressure up the pipeline.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        handler: Callable,
+        inbox: queue.Queue,
+        outbox: Optional[queue.Queue],
+        on_error: Optional[Callable] = None,
+    ):
+        self.name = name
+        self.workers = max(1, workers)
+        self.handler = handler
+        self.on_error = on_error
+        self.inbox = inbox
+        self.outbox = outbox
+        self.next_stage: Optional["_Stage"] = None
+
+        self.busy_seconds = 0.0
+        self.processed = 0
+        self._alive = self.workers
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+
+    def _work(self):
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                break
+
+            started = time.perf_counter()
+            try:
+                out = self.handler(item)
+            except Exception as e:
+                logger.error(f"❌ Stage '{self.name}' crashed on an item: {e}", exc_info=True)
+                out = None
+                if self.on_error is not None:
+                    try:
+                        self.on_error(item, e)
+                    except Exception:
+                        logger.error(f"❌ Stage '{self.name}' could not record the failed item", exc_info=True)
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                self.busy_seconds += elapsed
+                self.processed += 1
+
+            if out is not None and self.outbox is not None:
+                self.outbox.put(out)
+
+        # The last worker to finish tells every worker of the next stage to stop
+        with self._lock:
+            self._alive -= 1
+            last = self._alive == 0
+        if last and self.next_stage is not None:
+            for _ in range(self.next_stage.workers):
+                self.outbox.put(_DONE)
+
+
+class StagedPipeline:
+    """
+    Ingestion engine that runs fetch → extract → embed → upsert as separate stages.
+
+    Each stage has its own thread pool and the stages are connected by bounded
+    queues, so network I/O, parsing, inference and DB writes overlap instead of
+    running back to back in one worker. When a downstream stage falls behind its
+    inbox fills up and upstream workers block, which keeps memory flat.
+
+    Stage sizes are independent, e.g. many fetchers, a few extractors, one
+    embedder and a couple of upserters. Throughput is then bounded by the
+    slowest stage rather than by the sum of all of them.
+
+    With `extract_processes > 0` the extract stage hands prepare_document()
+    (extract + clean + hash + chunk) to a ProcessPoolExecutor, so parsing scales
+    with cores instead of contending on the GIL. Workers send back only the
+    chunk lists; the model and the Qdrant client stay in this process. Downloads
+    are then written to temp files instead of being held in memory
+    (FETCH_MEMORY_LIMIT_MB): a worker reads a file itself, while an in-memory
+    download would be pickled whole through the pool's pipe.
+
+    With a `manifest` (IngestManifest), the fetch stage skips sources whose
+    fingerprint is unchanged before downloading them, the extract stage skips
+    documents whose cleaned text hash is unchanged, and the upsert stage
+    records each document and deletes its stale trailing points.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        fetchers: int = 16,
+        extractors: int = 4,
+        embedders: int = 1,
+        upserters: int = 2,
+        queue_size: int = 32,
+        batcher=None,
+        keep_temp: bool = False,
+        extract_processes: int = 0,
+        manifest=None,
+        chunking=None,
+    ):
+        self.store = store
+        self.manifest = manifest
+        self.chunking = chunking
+        self.batcher = batcher
+        self.keep_temp = keep_temp
+        self.queue_size = queue_size
+        self.extract_processes = extract_processes
+        self.sizes = {
+            "fetch": fetchers,
+            # one thread per process keeps every worker process busy
+            "extract": max(extractors, extract_processes),
+            "embed": embedders,
+            "upsert": upserters,
+        }
+
+        self._results: list[ProcessResult] = []
+        self._results_lock = threading.Lock()
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    # -----------------------------------------------------------
+    # Stage handlers
+    # -----------------------------------------------------------
+    def _fetch(self, source: str):
+        fingerprint = None
+        if self.manifest:
+            fingerprint = probe_source(source)
+            if self.manifest.is_unchanged(source, fingerprint):
+                logger.info(f"⏭️ Skipped '{source}': unchanged since last ingestion")
+                self._finish(ProcessResult(path=source, source=source, status="skipped"))
+                return None
+
+        try:
+            # A process pool is handed paths, not pickled in-memory downloads
+            max_in_memory = 0 if self.extract_processes > 0 else MEMORY_LIMIT_BYTES
+            local_path, cleanup = fetch_file(source, keep=self.keep_temp, max_in_memory=max_in_memory)
+        except Exception as e:
+            logger.error(f"❌ Failed to fetch {source}: {e}")
+            self._finish(ProcessResult(path=source, source=source, status="failed", error=str(e)))
+            return None
+        return source, fingerprint, local_path, cleanup
+
+    def _extract(self, item):
+        source, fingerprint, local_path, cleanup = item
+        try:
+            if self._process_pool is not None:
+                prepared = self._process_pool.submit(prepare_document, local_path, source, self.chunking).result()
+            else:
+                prepared = prepare_document(local_path, source=source, chunking=self.chunking)
+        except Exception as e:
+            # e.g. a worker process died (BrokenProcessPool) while parsing this file
+            logger.error(f"❌ Extraction worker failed for {source}: {e}")
+            self._finish(ProcessResult(path=source_name(local_path), source=source, status="failed", error=str(e)))
+            return None
+        finally:
+            # Temp downloads are no longer needed once the chunks are in memory
+            cleanup()
+
+        prepared.fingerprint = fingerprint
+        if prepared.result.error or skip_if_unchanged(prepared, self.manifest):
+            self._finish(prepared.result)
+            return None
+        return prepared
+
+    def _embed(self, prepared):
+        embeddings = embed_document(prepared, self.batcher)
+        if embeddings is None:
+            self._finish(prepared.result)
+            return None
+        return prepared, embeddings
+
+    def _upsert(self, item):
+        prepared, embeddings = item
+        self._finish(upload_document(prepared, embeddings, self.store, self.manifest))
+        return None
+
+    def _fail(self, item, error: Exception):
+        """Record a failed result for an item whose stage handler raised, whatever stage it was in."""
+        if isinstance(item, str):  # fetch: the source itself
+            result = ProcessResult(path=item, source=item, status="failed")
+        elif isinstance(item, PreparedDocument):  # embed
+            result = item.result
+        elif isinstance(item[0], PreparedDocument):  # upsert: (prepared, embeddings)
+            result = item[0].result
+        else:  # extract: (source, fingerprint, local_path, cleanup)
+            source, _, local_path, cleanup = item
+            cleanup()
+            result = ProcessResult(path=source_name(local_path), source=source, status="failed")
+        result.status = "failed"
+        result.error = str(error)
+        self._finish(result)
+
+    def _finish(self, result: ProcessResult):
+        with self._results_lock:
+            self._results.append(result)
+
+    # -----------------------------------------------------------
+    # Orchestration
+    # -----------------------------------------------------------
+    def run(self, sources: Iterable[str]) -> list[ProcessResult]:
+        """
+        Push all sources through the pipeline and block until every one of them
+        has either been uploaded or failed. Returns one ProcessResult per source.
+        """
+        self._results = []
+
+        handlers = [
+            ("fetch", self._fetch),
+            ("extract", self._extract),
+            ("embed", self._embed),
+            ("upsert", self._upsert),
+        ]
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in handlers]
+
+        stages = []
+        for i, (name, handler) in enumerate(handlers):
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+            stages.append(_Stage(name, self.sizes[name], handler, queues[i], outbox, on_error=self._fail))
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next_stage = next_stage
+
+        logger.info(
+            "🚀 Starting staged pipeline: "
+            + ", ".join(f"{s.name}={s.workers}" for s in stages)
+            + f" (queue_size={self.queue_size})"
+        )
+
+        if self.extract_processes > 0:
+            # spawn, not fork: this process already runs threads and holds the model
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.extract_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"🧵 Extraction runs in {self.extract_processes} worker processes")
+
+        started = time.perf_counter()
+        try:
+            for stage in stages:
+                stage.start()
+
+            # Feeding blocks as soon as the fetchers fall behind
+            for source in sources:
+                queues[0].put(source)
+            for _ in range(stages[0].workers):
+                queues[0].put(_DONE)
+
+            for stage in stages:
+                stage.join()
+        finally:
+            if self._process_pool is not None:
+                self._process_pool.shutdown()
+                self._process_pool = None
+        elapsed = time.perf_counter() - started
+
+        ok = sum(1 for r in self._results if r.status in ("success", "skipped"))
+        rate = len(self._results) / elapsed if elapsed > 0 else 0.0
+        logger.info(f"🏁 Staged pipeline finished: {ok}/{len(self._results)} succeeded in {elapsed:.1f}s ({rate:.2f} docs/s)")
+        for stage in stages:
+            # Busy time per worker shows which stage is the bottleneck
+            logger.info(f"  stage '{stage.name}': {stage.processed} items, {stage.busy_seconds / stage.workers:.1f}s busy per worker")
+
+        return list(self._results)
@@ -3,9 +3,43 @@ import pytest
 from etl_pipeline.extractors.pdf_extractor import extract_pdf
 from etl_pipeline.extractors.word_extractor import extract_word
 from etl_pipeline.extractors.pptx_extractor import extract_pptx
-from etl_pipeline.text_utils.cleaning import clean_text
-from etl_pipeline.text_utils.chunking import chunk_text
-from etl_pipeline.text_utils.embedding_generator import EmbeddingGenerator
+import random
+import asyncio
+import numpy as np
+from etl_pipeline.text_utils.cleaning import clean_text, clean_text_fast
+from etl_pipeline.text_utils.chunking import chunk_text, chunk_segments, chunk_text_by_tokens
+from etl_pipeline.extractors import extract_file, extract_file_segments
+from etl_pipeline.fetchers.download import Download
+from etl_pipeline.text_utils.embedding_generator import EmbeddingGenerator, EmbeddingBatcher
+from etl_pipeline.text_utils.embedding_cache import EmbeddingCache
+from etl_pipeline.text_utils.onnx_backend import cosine_parity
+from etl_pipeline.text_utils.embedding_replicas import plan_core_groups
+from etl_pipeline.text_utils.token_batching import plan_token_batches, padded_tokens
+from etl_pipeline.staged_pipeline import StagedPipeline
+from etl_pipeline.manifest import IngestManifest
+from etl_pipeline.db_store import VectorDBStore, BufferedVectorDBStore, UploadError
+from etl_pipeline.vectorstore.config import (
+    PROFILES, PAYLOAD_INDEXES, get_profile, ensure_generation_marker, generation_collection, GENERATION_POINT_ID,
+)
+from etl_pipeline.vectorstore.local_index import LocalIndexClient, LocalIndex
+from etl_pipeline.app.services import search_cache
+from etl_pipeline.app.services.search_cache import LRUCache, TTLCache
+from etl_pipeline.app.services.metrics import Registry, Histogram, Counter, Gauge
+from etl_pipeline.app.models.query_models import BatchQueryRequest, SearchFilters
+from etl_pipeline.app.services.qdrant_service import build_filter, payload_selector, snippet, _to_results
+from etl_pipeline.pipeline import source_domain
+from etl_pipeline.crawler.async_crawler import AsyncCrawler
+from etl_pipeline.crawler.html_processor import process_html
+from etl_pipeline.crawler.link_extractor import extract_links_from_html
+from etl_pipeline.extractors.html_extractor import extract_html_string
+from pydantic import ValidationError
+from qdrant_client import QdrantClient, models
+import httpx
+import time
+import io
+import sys
+import json
+import subprocess
 
 SAMPLES_DIR = os.path.join(os.path.dirname(__file__), "samples")
 
@@ -44,9 +78,648 @@ def test_clean_and_chunk():
     assert all(isinstance(c, str) for c in chunks)
     assert len(chunks) > 0
 
+@pytest.mark.parametrize("raw", [
+    "informa-\ntion and vekto-\r\n  rska baza",
+    "ab-\ncd-\nef",                               # right word of a join can't start the next one
+    "Contents ........ 12 \n\n Intro ...... 3 ...... 4",
+    "See [1] and [23].\tDone\x0c",
+    "\u00ADhy\u200Bphen – “quoted” ‘text’ — x−y",
+    "",
+])
+def test_clean_text_fast_matches_clean_text(raw):
+    assert clean_text_fast(raw) == clean_text(raw)
+
+def test_clean_text_fast_matches_clean_text_fuzz():
+    rng = random.Random(0)
+    alphabet = list("ab čž_12 .[]") + ["-", "\u2010", "\n", "\r\n", "\t", "......", "[7]", "\u00AD",
+                                       "–", "“", "’", "\x01", "\x1c", "\xa0", "-\n ", "word"]
+    for _ in range(20000):
+        raw = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        assert clean_text_fast(raw) == clean_text(raw), repr(raw)
+
+def test_chunk_segments_matches_chunk_text():
+    segments = [("one two three four", 1), ("", 2), ("five six seven", 3), ("eight", 4)]
+    streamed = list(chunk_segments(segments, chunk_size=3, overlap=1))
+
+    assert [c for c, _, _ in streamed] == chunk_text("one two three four five six seven eight", 3, 1)
+    assert [(first, last) for _, first, last in streamed] == [(1, 1), (1, 3), (3, 3), (3, 4)]
+
+def test_chunk_text_by_tokens_fits_model():
+    tokenizer = embedder.model.tokenizer
+    max_tokens = embedder.token_chunking_config().max_tokens
+    text = " ".join(f"Sentence number {i} talks about embeddings." for i in range(300))
+
+    chunks = chunk_text_by_tokens(text, tokenizer, max_tokens=max_tokens, overlap_tokens=16)
+
+    assert len(chunks) > 1
+    assert all(len(tokenizer.tokenize(c)) <= max_tokens for c in chunks)
+    assert all(c.endswith(".") for c in chunks)  # snapped to sentence ends
+    assert chunks[-1].endswith("Sentence number 299 talks about embeddings.")
+
+@pytest.mark.parametrize("backend,min_cosine", [("onnx", 0.999), ("onnx-int8", 0.98)])
+def test_onnx_backend_parity(tmp_path, backend, min_cosine):
+    pytest.importorskip("onnxruntime")
+    texts = ["Vector search over documents.", "Kratki tekst.", "embedding " * 400]
+
+    onnx_embedder = EmbeddingGenerator(backend=backend, onnx_dir=str(tmp_path / "onnx"))
+    parity = cosine_parity(embedder.generate(texts), onnx_embedder.generate(texts))
+
+    assert parity["count"] == len(texts)
+    assert parity["min"] >= min_cosine
+
+def test_embedding_dimension_without_inference():
+    lazy = EmbeddingGenerator(replicas=3)  # a model key nothing has loaded yet
+    assert lazy.dimension == len(embedder.generate_single("dimension check"))
+    assert not lazy.is_loaded
+
+def test_plan_core_groups():
+    assert plan_core_groups(4, list(range(32))) == [list(range(i, i + 8)) for i in range(0, 32, 8)]
+    assert plan_core_groups(3, [0, 1]) == [[0], [1], [0]]  # more replicas than cores share them
+
+def test_embedding_replicas_match_single_model():
+    texts = [f"Chunk {i} about vector search." for i in range(20)]
+    replicated = EmbeddingGenerator(replicas=2)
+    try:
+        vectors = replicated.generate(texts)
+    finally:
+        replicated.close()
+    assert np.allclose(vectors, embedder.generate(texts), atol=1e-5)
+
+def test_plan_token_batches_respects_budget():
+    lengths = [300, 5, 8, 120, 6, 256, 7, 9, 64]
+    batches = plan_token_batches(lengths, token_budget=512)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    assert all(len(b) * max(lengths[i] for i in b) <= 512 for b in batches)
+    assert padded_tokens(lengths, batches) < padded_tokens(lengths, [list(range(len(lengths)))])
+
+def test_token_budget_generate_keeps_order():
+    texts = ["short", " ".join(["long chunk text"] * 150), "a | b | c", "medium sized chunk " * 10]
+    budgeted = EmbeddingGenerator(token_budget=256)
+    assert np.allclose(budgeted.generate(texts), embedder.generate(texts), atol=1e-5)
+
+def test_batcher_coalesces_concurrent_async_queries(monkeypatch):
+    calls = []
+    original = embedder.generate
+    monkeypatch.setattr(embedder, "generate", lambda texts, batch_size=32: calls.append(len(texts)) or original(texts, batch_size))
+    queries = [f"query number {i}" for i in range(8)]
+
+    async def search_all(batcher):
+        return await asyncio.gather(*(asyncio.wrap_future(batcher.submit([q])) for q in queries))
+
+    with EmbeddingBatcher(embedder, batch_size=32, max_wait=0.05) as batcher:
+        results = asyncio.run(search_all(batcher))
+
+    assert calls == [len(queries)]
+    assert np.allclose(np.concatenate(results), original(queries), atol=1e-5)
+
+def test_extract_pdf_segments(tmp_path):
+    import fitz
+
+    file_path = tmp_path / "two_pages.pdf"
+    with fitz.open() as doc:
+        for text in ("Hello first page", "Hello second page"):
+            doc.new_page().insert_text((72, 72), text)
+        doc.save(file_path)
+
+    segments = list(extract_file_segments(str(file_path)))
+    assert [(s.kind, s.number) for s in segments] == [("page", 1), ("page", 2)]
+    assert [s.text.strip() for s in segments] == ["Hello first page", "Hello second page"]
+
+# ---------- In-memory extraction ----------
+def test_extractors_read_streams_like_files(tmp_path):
+    files = {
+        "page.html": "<html><body><h1>Naslov</h1>\r\n<p>Prvi <a href='/a'>link</a></p><script>x()</script></body></html>",
+        "notes.txt": "line one\r\nline two\n",
+        "table.csv": "ime,grad\nAna,Zagreb\nIvo,Split\n",
+    }
+    for name, content in files.items():
+        path = tmp_path / name
+        path.write_bytes(content.encode("utf-8"))
+        stream = io.BytesIO(content.encode("utf-8"))
+        stream.name = name
+        assert extract_file(stream) == extract_file(str(path))
+
+def test_download_spills_to_disk_above_limit():
+    small = Download("a.txt", max_in_memory=10)
+    small.write(b"12345")
+    assert isinstance(small.result(), io.BytesIO) and small.result().name == "a.txt"
+
+    large = Download("b.txt", max_in_memory=10)
+    large.write(b"123456")
+    large.write(b"789012")
+    path = large.result()
+    assert path.read_bytes() == b"123456789012"
+    large.cleanup()
+    assert not path.exists()
+
 # ---------- Embedding ----------
 def test_embedding_generation():
     chunks = ["Hello world", "This is a test"]
     embeddings = embedder.generate(chunks)
     assert embeddings.shape[0] == len(chunks)
-    assert embeddings.shape[1] > 0
\ No newline at end of file
+    assert embeddings.shape[1] > 0
+
+def test_embedding_batcher_matches_direct_generation():
+    docs = [["Hello world", "This is a test"], ["Another document"], ["Third", "one", "here"]]
+    with EmbeddingBatcher(embedder, batch_size=4, max_wait=0.01) as batcher:
+        futures = [batcher.submit(chunks) for chunks in docs]
+        batched = [f.result() for f in futures]
+
+    for chunks, embeddings in zip(docs, batched):
+        assert embeddings.shape[0] == len(chunks)
+        direct = embedder.generate(chunks)
+        assert abs(embeddings - direct).max() < 1e-4
+
+def test_embedding_cache_serves_repeated_chunks(tmp_path):
+    cached = EmbeddingGenerator(device="cpu", cache=EmbeddingCache(str(tmp_path / "cache.db")))
+    chunks = ["Hello world", "This is a test"]
+
+    first = cached.generate(chunks)
+    second = cached.generate(chunks)
+
+    assert cached.cache.stats()["hits"] == 2
+    assert abs(first - second).max() == 0
+    assert abs(first - embedder.generate(chunks)).max() < 1e-4
+
+# ---------- Staged pipeline ----------
+@pytest.mark.parametrize("extract_processes", [0, 2])
+def test_staged_pipeline_reports_every_source(tmp_path, extract_processes):
+    sources = []
+    for i in range(5):
+        path = tmp_path / f"doc_{i}.txt"
+        path.write_text(f"Document number {i}. " * 50, encoding="utf-8")
+        sources.append(str(path))
+    sources.append(str(tmp_path / "missing.txt"))
+
+    pipeline = StagedPipeline(fetchers=2, extractors=2, queue_size=2, extract_processes=extract_processes)
+    results = pipeline.run(sources)
+
+    assert len(results) == len(sources)
+    assert sum(r.status == "success" for r in results) == 5
+
+def test_staged_pipeline_records_items_whose_handler_raised(tmp_path, monkeypatch):
+    from etl_pipeline import staged_pipeline
+
+    sources = []
+    for i in range(3):
+        path = tmp_path / f"doc_{i}.txt"
+        path.write_text(f"Document number {i}. " * 50, encoding="utf-8")
+        sources.append(str(path))
+
+    def embed_or_crash(prepared, batcher=None):
+        if prepared.result.source == sources[1]:
+            raise RuntimeError("model crashed")
+        return embedder.generate(prepared.chunks)
+
+    monkeypatch.setattr(staged_pipeline, "embed_document", embed_or_crash)
+    results = StagedPipeline(fetchers=1, extractors=1).run(sources)
+
+    assert sorted(r.source for r in results) == sorted(sources)
+    failed = [r for r in results if r.status == "failed"]
+    assert [(r.source, r.error) for r in failed] == [(sources[1], "model crashed")]
+
+def test_staged_pipeline_spills_downloads_for_extraction_processes(monkeypatch):
+    from etl_pipeline import staged_pipeline
+    limits = []
+    monkeypatch.setattr(staged_pipeline, "fetch_file", lambda source, keep, max_in_memory: limits.append(max_in_memory) or (source, None))
+    for processes in (0, 2):
+        StagedPipeline(extract_processes=processes)._fetch("https://x.hr/a.pdf")
+    # in memory for extraction in threads; to disk when a worker process reads it
+    assert limits == [staged_pipeline.MEMORY_LIMIT_BYTES, 0]
+
+# ---------- Manifest ----------
+def test_manifest_detects_unchanged_sources(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.db"))
+    manifest.record("a.pdf", {"size": 10, "mtime_ns": 1}, "abc", 3, "a_pdf")
+
+    assert manifest.is_unchanged("a.pdf", {"size": 10, "mtime_ns": 1})
+    assert not manifest.is_unchanged("a.pdf", {"size": 10, "mtime_ns": 2})
+    assert not manifest.is_unchanged("b.pdf", {"size": 10, "mtime_ns": 1})
+    # a URL without ETag/Last-Modified can never be proven unchanged
+    manifest.record("https://x.hr/a", {"etag": None, "last_modified": None}, "abc", 1, "x")
+    assert not manifest.is_unchanged("https://x.hr/a", {"etag": None, "last_modified": None})
+    assert manifest.get("a.pdf")["num_chunks"] == 3
+
+# ---------- Crawler ----------
+def test_async_crawler_paces_each_host_by_robots_crawl_delay():
+    # A clock that only moves when the rate limiter sleeps, so the pacing is exact on a busy machine too
+    now = [1000.0]
+
+    async def fake_sleep(seconds):
+        now[0] += seconds
+        await asyncio.sleep(0)
+
+    requested = []
+
+    def handler(request):
+        requested.append((request.url.host, request.url.path, now[0]))
+        if request.url.path == "/robots.txt":
+            if request.url.host == "slow.hr":
+                return httpx.Response(200, text="User-agent: *\nCrawl-delay: 0.2\nDisallow: /private\nSitemap: https://slow.hr/sitemap.xml")
+            return httpx.Response(404)
+        return httpx.Response(200, headers={"Content-Type": "text/html"}, text=f"<p>{request.url.path}</p>")
+
+    async def crawl():
+        async with AsyncCrawler(delay=0, per_host=4, transport=httpx.MockTransport(handler),
+                                clock=lambda: now[0], sleep=fake_sleep) as crawler:
+            pages = [f"https://{host}/page{i}" for host in ("slow.hr", "fast.hr") for i in range(3)]
+            html = await asyncio.gather(*(crawler.fetch_html(url) for url in pages + ["https://slow.hr/private/x"]))
+            return html, await crawler.robots_sitemaps("https://slow.hr/")
+
+    html, sitemaps = asyncio.run(crawl())
+    assert html[:6] == [f"<p>/page{i}</p>" for i in range(3)] * 2
+    assert html[6] is None  # disallowed by robots.txt, never requested
+    assert sitemaps == ["https://slow.hr/sitemap.xml"]
+
+    def page_times(host):
+        return [t for h, path, t in requested if h == host and path.startswith("/page")]
+
+    slow = page_times("slow.hr")
+    assert [round(b - a, 6) for a, b in zip(slow, slow[1:])] == [0.2, 0.2]
+    fast = page_times("fast.hr")
+    assert fast[-1] == fast[0] and fast[-1] < slow[-1]
+    assert not any(path.startswith("/private") for _, path, _ in requested)
+
+HTML_PAGES = [
+    "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Vijesti &amp; sport</title><script>x = '<p>no</p>'</script></head>"
+    "<body><header><nav><a href='/'>Home</a><a href='/sport#top'>Sport</a></nav></header><h1>Glavni  naslov</h1>"
+    "<p>Tekst s <a href='https://www.index.hr/a'>poveznicom</a> i <b>bold</b>&nbsp;tekstom.</p><!-- comment -->"
+    "<footer><p>© <a href='https://other.com/x'>partner</a></p></footer></body></html>",
+    "<ul><li>Jedan <a href='/a'>A</a></li><li>Dva<ul><li>Dva.jedan <a href=' /b#c '>B</a></li></ul></li></ul>",
+    "<table><tr><th>Ime</th><th>Grad</th></tr><tr><td>Ana <a href='/ana'>profil</a></td><td>Zagreb</td></tr><tr></tr></table>",
+    "<ul><li>Lista<table><tr><td><a href='/in-li'>u listi</a></td></tr></table></li></ul>",  # links in a table inside a list item get URLs
+    "<p>a<script>x()</script>b<br>c\r\nd <a href=''>prazan</a><a href='/x'></a> <a href='mailto:x@y.hr'>mail</a></p>"
+    "<form><a href='/form'>f</a></form><noscript><a href='/ns'>ns</a></noscript><h4>kraj</h4><h5>h5</h5>",
+    "<?xml version='1.0' encoding='utf-8'?><html><body><p>xml declaration</p></body></html>",
+    "",
+]
+
+@pytest.mark.parametrize("html", HTML_PAGES)
+@pytest.mark.parametrize("mode", ["naive", "smart"])
+def test_html_processor_matches_beautifulsoup(html, mode):
+    page = process_html(html, "https://www.index.hr/vijesti/", mode=mode, domain_limit="index.hr")
+    assert page.text == extract_html_string(html, mode=mode)
+    assert page.links == extract_links_from_html("https://www.index.hr/vijesti/", html, domain_limit="index.hr")
+
+def test_html_processor_matches_beautifulsoup_fuzz():
+    # Well-formed pages only: the parsers repair broken markup differently
+    rng = random.Random(0)
+    words = ["ana", "&amp;", "&nbsp;", "&lt;x&gt;", "žuto", " ", "\n", "\t", "ß", "<!--c-->", "<br>", "<a>x</a>"]
+    hrefs = ["/a", " /b#c ", "", "#top", "https://x.com/y", "mailto:x"]
+
+    def inline(depth, in_link=False):
+        text = words if not in_link else words[:-1]  # no links inside links
+        out = rng.choice(text)
+        for _ in range(rng.randint(0, 3)):
+            if not in_link and rng.random() < 0.3:
+                out += f'<a href="{rng.choice(hrefs)}">{inline(depth + 1, True)}</a>'
+            elif depth < 3 and rng.random() < 0.3:
+                out += f"<b>{inline(depth + 1, in_link)}</b>"
+            out += rng.choice(text)
+        return out
+
+    def block(depth):
+        kind = rng.randrange(7) if depth < 3 else 0
+        if kind == 0:
+            return f"<p>{inline(0)}</p>"
+        if kind == 1:
+            n = rng.randint(1, 5)
+            return f"<h{n}>{inline(0)}</h{n}>"
+        if kind == 2:
+            return "<ul>" + "".join(f"<li>{inline(0)}{block(depth + 1)}</li>" for _ in range(rng.randint(1, 3))) + "</ul>"
+        if kind == 3:
+            cells = lambda: "".join(f"<{tag}>{inline(0)}</{tag}>" for tag in rng.choices(["td", "th"], k=rng.randint(0, 3)))
+            return "<table>" + "".join(f"<tr>{cells()}</tr>" for _ in range(rng.randint(0, 3))) + "</table>"
+        if kind == 4:
+            tag = rng.choice(["nav", "footer", "header", "noscript"])
+            return f"<{tag}>{block(depth + 1)}</{tag}>"
+        if kind == 5:
+            return f"<script>if (a < b) {{ x = '<p>' }}</script>{inline(0)}"
+        return f"<div>{inline(0)}{block(depth + 1)}{block(depth + 1)}</div>"
+
+    for _ in range(300):
+        html = "<html><head><title>t</title></head><body>" + "".join(block(0) for _ in range(rng.randint(1, 5))) + "</body></html>"
+        for mode in ("naive", "smart"):
+            page = process_html(html, "https://x.com/", mode=mode)
+            assert page.text == extract_html_string(html, mode=mode), html
+            assert page.links == extract_links_from_html("https://x.com/", html), html
+
+# ---------- Vector store ----------
+def test_buffered_store_flushes_on_close():
+    client = QdrantClient(":memory:")
+    client.create_collection("docs", vectors_config={"size": 4, "distance": "Cosine"})
+    store = BufferedVectorDBStore(client, "docs", max_points=5, max_delay=60, parallel=2, wait=True)
+
+    stored = []
+    for i in range(4):
+        store.save(["a", "b", "c"], [[1.0, 0.0, 0.0, float(i)]] * 3, {"doc_id": f"doc_{i}"},
+                   on_stored=lambda i=i: stored.append(i))
+    assert 3 not in stored  # still buffered: not reported as stored yet
+    store.close()
+
+    assert client.count("docs").count == 12
+    assert sorted(stored) == [0, 1, 2, 3]
+
+def test_buffered_store_skips_callbacks_of_failed_batches():
+    client = QdrantClient(":memory:")  # no collection, so every upload fails
+    store = BufferedVectorDBStore(client, "missing", max_points=100, parallel=1, wait=True)
+    stored = []
+    store.save(["a"], [[1.0, 0.0, 0.0, 0.0]], {"doc_id": "doc_1"}, on_stored=lambda: stored.append(1))
+
+    with pytest.raises(RuntimeError):
+        store.close()
+    assert stored == [] and store.failed_doc_ids == {"doc_1"}
+
+def test_buffered_store_fails_only_the_documents_of_a_failed_batch():
+    client = QdrantClient(":memory:")
+    client.create_collection("docs", vectors_config={"size": 4, "distance": "Cosine"})
+    original_upsert = client.upsert
+
+    def upsert(collection_name, points, **kw):
+        if "doc_bad" in (p["doc_id"] for p in points.payloads):
+            raise RuntimeError("rejected")
+        return original_upsert(collection_name, points=points, **kw)
+
+    client.upsert = upsert
+    store = BufferedVectorDBStore(client, "docs", max_points=1, max_delay=60, parallel=1, wait=True)
+    stored = []
+    store.save(["a"], [[1.0, 0.0, 0.0, 0.0]], {"doc_id": "doc_bad"}, on_stored=lambda: stored.append("doc_bad"))
+    deadline = time.monotonic() + 10
+    while not store.failed_doc_ids and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    # an earlier failed batch does not fail the next document
+    store.save(["b"], [[0.0, 1.0, 0.0, 0.0]], {"doc_id": "doc_ok"}, on_stored=lambda: stored.append("doc_ok"))
+    with pytest.raises(UploadError) as failed:
+        store.close()
+    assert failed.value.doc_ids == {"doc_bad"} and stored == ["doc_ok"]
+
+def test_store_bumps_ingest_generation():
+    client = QdrantClient(":memory:")
+    client.create_collection("docs", vectors_config={"size": 4, "distance": "Cosine"})
+    ensure_generation_marker(client, "docs")
+    store = VectorDBStore(client, "docs", generation_interval=60)
+    upserts = []
+    original_upsert = client.upsert
+    client.upsert = lambda collection_name, **kw: upserts.append(collection_name) or original_upsert(collection_name, **kw)
+
+    def generation():
+        return client.retrieve(generation_collection("docs"), ids=[GENERATION_POINT_ID])[0].payload["generation"]
+
+    store.save(["a"], [[1.0, 0.0, 0.0, 0.0]], {"doc_id": "doc_1"})
+    first = generation()
+    store.save(["b"], [[0.0, 1.0, 0.0, 0.0]], {"doc_id": "doc_2"})
+    store.delete_chunks("doc_1", 0, 1)
+    assert generation() == first  # rate limited: no bump per document
+    assert upserts.count(generation_collection("docs")) == 1
+
+    store.close()  # publishes the held-back change
+    assert generation() > first
+
+def test_search_caches_evict_and_expire(monkeypatch):
+    lru = LRUCache(max_entries=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    lru.get("a")
+    lru.put("c", 3)  # evicts "b", the least recently used
+    assert lru.get("b") is None and lru.get("a") == 1
+    assert lru.stats()["hits"] == 2 and lru.stats()["misses"] == 1
+
+    now = [100.0]
+    monkeypatch.setattr(search_cache.time, "monotonic", lambda: now[0])
+    ttl = TTLCache(max_entries=10, ttl=5)
+    ttl.put(("query", 5), ["result"])
+    assert ttl.get(("query", 5)) == ["result"]
+    now[0] += 6
+    assert ttl.get(("query", 5)) is None
+
+def test_metrics_render_prometheus_text():
+    registry = Registry()
+    latency = registry.register(Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0)))
+    registry.register(Counter("hits", "Hits.", ("cache",), callback=lambda: {("vectors",): 3}))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, route="/api/search")
+
+    text = registry.render()
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{route="/api/search",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/api/search",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="/api/search",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/api/search"} 3' in text
+    assert 'hits_total{cache="vectors"} 3' in text
+    with pytest.raises(ValueError):
+        latency.observe(1.0)  # missing label
+
+def test_metrics_merge_worker_snapshots(tmp_path):
+    def worker():
+        registry = Registry(str(tmp_path))
+        latency = registry.register(Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0)))
+        in_flight = registry.register(Gauge("in_flight", "In flight."))
+        ratio = registry.register(Gauge("hit_ratio", "Ratio.", aggregate="worker"))
+        return registry, latency, in_flight, ratio
+
+    this, latency, in_flight, ratio = worker()
+    other, other_latency, other_in_flight, other_ratio = worker()
+    latency.observe(0.05, route="/api/search")
+    in_flight.set(2)
+    ratio.set(0.5)
+    other_latency.observe(0.5, route="/api/search")
+    other_in_flight.set(3)
+    other_ratio.set(0.25)
+
+    # The same snapshot from a running worker (our parent) and from one that has exited
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    for pid in (os.getppid(), exited.pid):
+        (tmp_path / f"{pid}_1.json").write_text(json.dumps(other.snapshot()))
+
+    text = this.render()
+    assert 'latency_seconds_bucket{route="/api/search",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/api/search",le="1"} 3' in text
+    assert 'latency_seconds_count{route="/api/search"} 3' in text
+    assert "\nin_flight 5\n" in text  # gauges of exited workers are left out
+    assert f'hit_ratio{{worker="{os.getpid()}"}} 0.5' in text
+    assert f'hit_ratio{{worker="{os.getppid()}"}} 0.25' in text
+    assert f'worker="{exited.pid}"' not in text
+
+def test_metrics_snapshots_of_forked_and_reused_pids_stay_apart(tmp_path):
+    registry = Registry(str(tmp_path))
+    requests = registry.register(Counter("requests", "Requests."))
+    # An exited worker that had our pid, as after a respawn
+    (tmp_path / f"{os.getpid()}_1.json").write_text(json.dumps({"requests": [["_total", [], 10]]}))
+    registry.write_snapshot()  # written before the fork, like a parent that imported the app
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            requests.inc(2)
+            registry.write_snapshot()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    requests.inc()
+
+    stamps = sorted(p.stem for p in tmp_path.glob("*.json"))
+    assert len(stamps) == 3 and len({s.split("_")[1] for s in stamps}) == 3
+    assert "requests_total 13" in registry.render()  # 10 + 2 (child) + 1 (us)
+
+def test_batch_query_request_validation():
+    request = BatchQueryRequest(queries=["first query", "second query"], top_k=5)
+    assert request.queries == ["first query", "second query"]
+    for bad in ({"queries": []}, {"queries": ["ok query", "x"]}, {"queries": ["q"] * 33}):
+        with pytest.raises(ValidationError):
+            BatchQueryRequest(**bad)
+
+def test_search_filters_use_indexed_payload_fields():
+    filters = SearchFilters(domain=["www.Index.hr"], extension=[".PDF"], ingested_after="2025-01-01T00:00:00Z")
+    conditions = {c.key: c for c in build_filter(filters).must}
+
+    assert set(conditions) <= set(PAYLOAD_INDEXES)
+    assert conditions["domain"].match.any == ["index.hr"]
+    assert conditions["extension"].match.any == ["pdf"]
+    assert conditions["ingested_at"].range.gte == 1735689600
+    assert build_filter(None) is None and build_filter(SearchFilters()) is None
+    assert source_domain("https://www.index.hr/vijesti") == "index.hr" and source_domain("/tmp/a.pdf") is None
+
+def test_local_index_matches_qdrant(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(60, 8)).astype(np.float32)
+    clients = {"qdrant": QdrantClient(":memory:"), "local": LocalIndexClient(str(tmp_path))}
+    for client in clients.values():
+        client.create_collection("docs", vectors_config=models.VectorParams(size=8, distance="Cosine"))
+        if client is clients["local"]:
+            client.create_payload_index("docs", "doc_id", field_schema="keyword")
+        store = VectorDBStore(client, "docs")
+        for d in range(3):
+            store.save([f"chunk {i}" for i in range(20)], vectors[d * 20:(d + 1) * 20], {"doc_id": f"doc_{d}"})
+        store.delete_chunks("doc_0", 10, 20)
+
+    query_filter = models.Filter(must=[models.FieldCondition(key="doc_id", match=models.MatchAny(any=["doc_0", "doc_2"]))])
+    for f in (None, query_filter):
+        expected, got = (
+            client.query_points("docs", query=vectors[5].tolist(), query_filter=f, limit=5).points
+            for client in clients.values()
+        )
+        assert [p.id for p in got] == [p.id for p in expected]
+        assert np.allclose([p.score for p in got], [p.score for p in expected], atol=1e-5)
+        assert got[0].payload == expected[0].payload
+    assert clients["local"].count("docs").count == 50
+
+def test_local_index_upsert_keeps_last_copy_of_repeated_ids(tmp_path):
+    batch = models.Batch(
+        ids=[1, 1, 2],
+        vectors=[[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0]],
+        payloads=[{"v": "first"}, {"v": "second"}, {"v": "other"}],
+    )
+    clients = {"qdrant": QdrantClient(":memory:"), "local": LocalIndexClient(str(tmp_path))}
+    for client in clients.values():
+        client.create_collection("docs", vectors_config=models.VectorParams(size=4, distance="Cosine"))
+        client.upsert("docs", points=batch)
+
+    expected, got = (c.query_points("docs", query=[0.0, 1.0, 0.0, 0.0], limit=3).points for c in clients.values())
+    assert clients["local"].count("docs").count == clients["qdrant"].count("docs").count == 2
+    assert [(p.id, p.payload) for p in got] == [(p.id, p.payload) for p in expected]
+    assert got[0].payload == {"v": "second"}
+
+def test_local_index_rejects_unsupported_filters(tmp_path):
+    client = LocalIndexClient(str(tmp_path))
+    client.create_collection("docs", vectors_config=models.VectorParams(size=4, distance="Cosine"))
+    client.create_payload_index("docs", "doc_id", field_schema="keyword")
+    client.upsert("docs", points=[models.PointStruct(id=1, vector=[1.0, 0.0, 0.0, 0.0], payload={"doc_id": "a"})])
+
+    doc_a = models.FieldCondition(key="doc_id", match=models.MatchValue(value="a"))
+    for unsupported in (
+        models.Filter(should=[doc_a]),
+        models.Filter(must=[models.HasIdCondition(has_id=[1])]),
+        models.Filter(must=[models.FieldCondition(key="doc_id", match=models.MatchText(text="a"))]),
+        models.Filter(must=[models.FieldCondition(key="text", match=models.MatchValue(value="a"))]),  # not indexed
+    ):
+        with pytest.raises(ValueError):
+            client.query_points("docs", query=[1.0, 0.0, 0.0, 0.0], query_filter=unsupported)
+    assert len(client.query_points("docs", query=[1.0, 0.0, 0.0, 0.0], query_filter=models.Filter(must=[doc_a])).points) == 1
+
+def test_search_batch_embeds_and_queries_once_in_order(monkeypatch):
+    from concurrent.futures import Future
+    from qdrant_client import AsyncQdrantClient
+    from etl_pipeline.app.services import qdrant_service
+
+    axes = {"alpha": [1.0, 0.0, 0.0, 0.0], "beta": [0.0, 1.0, 0.0, 0.0], "gamma": [0.0, 0.0, 1.0, 0.0]}
+    calls = {"encode": 0, "batch": 0}
+
+    class Batcher:
+        def submit(self, texts):
+            calls["encode"] += 1
+            future = Future()
+            future.set_result(np.array([axes[t] for t in texts], dtype=np.float32))
+            return future
+
+    async def run():
+        client = AsyncQdrantClient(location=":memory:")
+        await client.create_collection("docs", vectors_config=models.VectorParams(size=4, distance="Cosine"))
+        await client.upsert("docs", points=[
+            models.PointStruct(id=i, vector=vector, payload={"text": name}) for i, (name, vector) in enumerate(axes.items())
+        ])
+        query_batch_points = client.query_batch_points
+
+        async def counted(*args, **kwargs):
+            calls["batch"] += 1
+            return await query_batch_points(*args, **kwargs)
+
+        client.query_batch_points = counted
+        monkeypatch.setattr(qdrant_service, "_qdrant", client)
+        monkeypatch.setattr(qdrant_service, "_query_batcher", Batcher())
+        monkeypatch.setattr(qdrant_service, "collection", "docs")
+        monkeypatch.setattr(qdrant_service, "search_params", None)
+        qdrant_service.query_vectors.clear()
+        qdrant_service.search_results.clear()
+
+        first = await qdrant_service.search_vectors_batch(["gamma", "alpha", "beta"], top_k=1)
+        # a repeated batch is answered from the caches, without the model or Qdrant
+        second = await qdrant_service.search_vectors_batch(["beta", "gamma"], top_k=1)
+        await client.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert [r[0]["payload"]["text"] for r in first] == ["gamma", "alpha", "beta"]
+    assert [r[0]["payload"]["text"] for r in second] == ["beta", "gamma"]
+    assert calls == {"encode": 1, "batch": 1}
+    # cached vectors don't keep the model's whole output array alive
+    assert all(qdrant_service.query_vectors.get(q).base is None for q in axes)
+
+def test_lean_search_results(tmp_path):
+    assert payload_selector(None) is True and payload_selector([]) is False
+    assert payload_selector(["text"]).include == ["text"]
+
+    text = "word " * 200
+    cut = snippet(text, 50)
+    assert len(cut) <= 50 and cut.endswith("…") and text.startswith(cut[:-1])
+    assert snippet("short text", 50) == "short text"
+
+    client = LocalIndexClient(str(tmp_path))
+    client.create_collection("docs", vectors_config=models.VectorParams(size=4, distance="Cosine"))
+    VectorDBStore(client, "docs").save([text], [[1.0, 0.0, 0.0, 0.0]], {"doc_id": "doc_1", "source": "a.pdf"})
+    points = client.query_points("docs", query=[1.0, 0.0, 0.0, 0.0], with_payload=payload_selector(["text"])).points
+    results = _to_results(points, snippet_chars=50)
+    assert set(results[0]["payload"]) == {"text"} and results[0]["payload"]["text"] == cut
+
+def test_local_index_ivf_recall(tmp_path):
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(16, 16))
+    vectors = (centers[rng.integers(0, 16, 4000)] + 0.3 * rng.normal(size=(4000, 16))).astype(np.float32)
+    index = LocalIndex(str(tmp_path), dim=16, ivf_lists=16, nprobe=4)
+    index.upsert(list(range(4000)), vectors, [None] * 4000)
+    assert index.meta["trained"]
+
+    hits = 0
+    for q in vectors[:50]:
+        exact = {pid for pid, _, _ in index.search(q, limit=10, exact=True)}
+        hits += len(exact & {pid for pid, _, _ in index.search(q, limit=10)})
+    assert hits / 500 >= 0.9
+
+def test_qdrant_profiles():
+    assert get_profile("quantized-int8")["quantization"] is not None
+    assert get_profile("disk-large")["vectors"]["on_disk"] is True
+    assert all(set(p) == set(PROFILES["default"]) for p in PROFILES.values())
+    with pytest.raises(ValueError):
+        get_profile("no-such-profile")
@@ -1,3 +1,36 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
+
+# End of a sentence: terminal punctuation, optional closing quotes/brackets, then whitespace
+SENTENCE_END = re.compile(r'[.!?…]["\'”’»)\]]*\s+')
+
+@dataclass(frozen=True)
+class ChunkingConfig:
+    """
+    How prepare_document() splits text into chunks. Picklable, so it can be
+    passed to extraction worker processes.
+
+    - "words": chunk_size words with overlap words of overlap (chunk_text)
+    - "tokens": packed to max_tokens model tokens (chunk_text_by_tokens)
+    """
+    strategy: str = "words"
+    chunk_size: int = 500
+    overlap: int = 50
+    model_name: str | None = None
+    max_tokens: int = 254          # excluding the model's special tokens
+    overlap_tokens: int = 32
+
+@lru_cache(maxsize=4)
+def get_tokenizer(model_name: str):
+    """Load (once per process) the fast tokenizer of an embedding model, without the model itself."""
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(model_name, use_fast=True)
+
 def chunk_text(text, chunk_size=500, overlap=50):
     """
     Splits text into chunks of roughly chunk_size tokens (words here), with optional overlap.
@@ -7,4 +40,133 @@ def chunk_text(text, chunk_size=500, overlap=50):
     for i in range(0, len(words), chunk_size - overlap):
         chunk = " ".join(words[i:i+chunk_size])
         chunks.append(chunk)
-    return chunks
\ No newline at end of file
+    return chunks
+
+def chunk_segments(segments, chunk_size=500, overlap=50):
+    """
+    Streaming counterpart of chunk_text() for (text, page) pairs.
+
+    Produces exactly the chunks chunk_text() would produce for the joined text,
+    but holds only one chunk's worth of words at a time. Yields
+    (chunk, first_page, last_page) tuples; pages are None for unpaged input.
+    """
+    step = chunk_size - overlap
+    words = deque()
+    pages = deque()
+
+    def emit():
+        chunk = " ".join(islice(words, chunk_size))
+        last = pages[min(chunk_size, len(pages)) - 1]
+        result = (chunk, pages[0], last)
+        for _ in range(min(step, len(words))):
+            words.popleft()
+            pages.popleft()
+        return result
+
+    for text, page in segments:
+        for word in text.split():
+            words.append(word)
+            pages.append(page)
+            if len(words) >= chunk_size:
+                yield emit()
+
+    while words:
+        yield emit()
+
+
+def _token_spans(text, tokenizer, max_tokens, overlap_tokens=0, min_fill=0.5):
+    """
+    Character spans of token-packed chunks of text.
+
+    Tokenizes once with the fast tokenizer's offset mapping. Each chunk gets
+    up to max_tokens tokens and is pulled back to the last sentence start in
+    the window, unless that would leave it less than min_fill full.
+    """
+    encoding = tokenizer(
+        text,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+        verbose=False,  # no "sequence longer than model max length" warning
+    )
+    offsets = encoding["offset_mapping"]
+    n = len(offsets)
+    if n == 0:
+        return []
+
+    token_starts = [start for start, _ in offsets]
+    # Token index at which each sentence starts
+    boundaries = sorted({bisect_left(token_starts, m.end()) for m in SENTENCE_END.finditer(text)})
+
+    spans = []
+    start = 0
+    while start < n:
+        end = min(start + max_tokens, n)
+        if end < n:
+            i = bisect_right(boundaries, end) - 1
+            if i >= 0 and boundaries[i] > start + int(max_tokens * min_fill):
+                end = boundaries[i]
+
+        spans.append((offsets[start][0], offsets[end - 1][1]))
+        if end >= n:
+            break
+        start = max(end - overlap_tokens, start + 1)
+        # don't start the overlap in the middle of a word (e.g. on a "##piece" token)
+        while start < end and offsets[start][0] == offsets[start - 1][1]:
+            start += 1
+
+    return spans
+
+def chunk_text_by_tokens(text, tokenizer, max_tokens=254, overlap_tokens=32):
+    """
+    Splits text into chunks of at most max_tokens model tokens, snapped to
+    sentence boundaries where possible.
+
+    Unlike chunk_text(), nothing is cut off by the model's truncation: pass
+    max_tokens = max_seq_length minus the special tokens the model adds.
+    Chunks are slices of the original text, so words are never re-joined.
+    """
+    return [text[a:b] for a, b in _token_spans(text, tokenizer, max_tokens, overlap_tokens)]
+
+def chunk_segments_by_tokens(segments, tokenizer, max_tokens=254, overlap_tokens=32):
+    """
+    Streaming counterpart of chunk_text_by_tokens() for (text, page) pairs.
+
+    Chunks may span segments: the last, partially filled chunk of a segment is
+    carried over and packed together with the next one. Yields
+    (chunk, first_page, last_page) tuples.
+    """
+    carry, carry_first, carry_last = "", None, None
+
+    for text, page in segments:
+        if carry:
+            combined = f"{carry} {text}"
+            boundary = len(carry)  # chars before this are carried from earlier segments
+        else:
+            combined, boundary = text, 0
+            carry_first = carry_last = page
+
+        spans = _token_spans(combined, tokenizer, max_tokens, overlap_tokens)
+        if not spans:
+            continue
+
+        for a, b in spans[:-1]:
+            first = carry_first if a < boundary else page
+            last = carry_last if b <= boundary else page
+            yield combined[a:b], first, last
+
+        a, b = spans[-1]
+        carry = combined[a:b]
+        carry_first = carry_first if a < boundary else page
+        carry_last = page
+
+    if carry:
+        yield carry, carry_first, carry_last
+
+def chunk_stream(segments, config: ChunkingConfig):
+    """Chunk (text, page) pairs according to a ChunkingConfig, yielding (chunk, first_page, last_page)."""
+    if config.strategy == "tokens":
+        tokenizer = get_tokenizer(config.model_name)
+        return chunk_segments_by_tokens(segments, tokenizer, config.max_tokens, config.overlap_tokens)
+    return chunk_segments(segments, config.chunk_size, config.overlap)
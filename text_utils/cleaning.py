@@ -77,3 +77,90 @@ def clean_text(text):
 
     return text.strip()
 
+
+# -----------------------------------------------------------
+# Fused cleaner: same output as clean_text(), several times faster
+#
+# Where the time went in clean_text(): the balanced word-break regex starts a
+# \w{2,} match attempt at every word character of the document, and the small
+# character-class substitutions each scan the whole text in the regex engine.
+#
+# clean_text_fast() instead
+#   - finds hyphen + newline first and decides about the join around each hit,
+#   - replaces single characters with str.replace, guarded by `in`, which runs
+#     at memchr speed and is skipped entirely when the character is absent,
+#   - keeps the remaining regexes precompiled and anchored on a literal
+#     (".", " ", "["), so the engine can skip ahead instead of trying every
+#     position.
+#
+# Merging everything into one str.translate table or one alternation regex was
+# measured as well and is slower: translate has no fast path for non-ASCII
+# (e.g. Croatian) text, and alternations lose the literal-prefix search.
+# -----------------------------------------------------------
+
+_INVISIBLE_CHARS = '\u00AD\u200B\u200C\u200D\u2060\uFEFF'
+_CHAR_MAP = (('–', '-'), ('—', '-'), ('−', '-'), ('“', '"'), ('”', '"'), ('‘', "'"), ('’', "'"))
+
+_HYPHEN_BREAK = re.compile(rf'{HYPHENS}\n\s*', flags=re.UNICODE)
+_WORD_RUN = re.compile(r'\w*', flags=re.UNICODE)
+_CONTROL = re.compile(r'[\x00-\x1F]+')
+_DOT_LEADER = re.compile(r'\.{6,}\s*\d*\s*')
+_MULTI_SPACE = re.compile(r' {2,}')   # tabs are gone by then; single spaces need no rewrite
+_REFERENCE = re.compile(r'\[\d+\]')
+
+def _is_word(ch):
+    # same definition as \w in a unicode regex
+    return ch.isalnum() or ch == '_'
+
+def _fix_word_breaks_balanced(text):
+    """
+    fix_word_breaks(text, 'balanced') without the invisible-char step, in one scan.
+
+    Mirrors the regex semantics exactly: a join needs 2+ word chars on both
+    sides, and the word consumed as the right side of one join cannot serve as
+    the left side of the next ("ab-\ncd-\nef" -> "abcd-ef").
+    """
+    if '\n' not in text:
+        return text
+
+    parts = []
+    pos = 0
+    consumed_until = -1  # end of the right-hand word of the previous join
+    n = len(text)
+    for m in _HYPHEN_BREAK.finditer(text):
+        start, end = m.start(), m.end()
+        parts.append(text[pos:start])
+        pos = end
+        if (
+            start >= 2 and consumed_until != start
+            and _is_word(text[start - 1]) and _is_word(text[start - 2])
+            and end + 1 < n and _is_word(text[end]) and _is_word(text[end + 1])
+        ):
+            consumed_until = _WORD_RUN.match(text, end).end()
+        else:
+            parts.append('-')
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+def clean_text_fast(text):
+    """
+    Drop-in replacement for clean_text() with identical output (see the
+    equivalence test and benchmarks/bench_cleaning.py).
+    """
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    for ch in _INVISIBLE_CHARS:
+        if ch in text:
+            text = text.replace(ch, '')
+
+    text = _fix_word_breaks_balanced(text)
+
+    text = _CONTROL.sub(' ', text)
+    text = _DOT_LEADER.sub(' ', text)
+    text = _MULTI_SPACE.sub(' ', text)
+    text = _REFERENCE.sub('', text)
+
+    for old, new in _CHAR_MAP:
+        if old in text:
+            text = text.replace(old, new)
+
+    return text.strip()
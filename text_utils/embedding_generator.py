@@ -1,34 +1,188 @@
+import os
+import json
+import time
+import contextlib
+import queue
 import threading
 import logging
-from sentence_transformers import SentenceTransformer
+from concurrent.futures import Future
+
+import numpy as np
+
+from text_utils.embedding_cache import EmbeddingCache
+from text_utils.chunking import ChunkingConfig
+from text_utils.token_batching import token_lengths, plan_token_batches
 
 # Configure default logging (you can override this in your main script)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _read_model_file(model_name: str, filename: str) -> dict | list | None:
+    """A JSON file of a local model directory or an already downloaded hub model, or None."""
+    if os.path.isdir(model_name):
+        path = os.path.join(model_name, filename)
+    else:
+        from huggingface_hub import try_to_load_from_cache
+        path = try_to_load_from_cache(model_name, filename)
+        if not isinstance(path, str):
+            from huggingface_hub import hf_hub_download
+            try:
+                path = hf_hub_download(model_name, filename)
+            except Exception:
+                return None
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def read_embedding_dimension(model_name: str) -> int | None:
+    """
+    Output size of a SentenceTransformer model from its config files, without
+    loading weights or running inference: the last Dense layer's out_features,
+    else the Pooling output size, else the transformer's hidden_size.
+    """
+    dimension = None
+    for module in _read_model_file(model_name, "modules.json") or []:
+        kind = module.get("type", "").rsplit(".", 1)[-1]
+        config = _read_model_file(model_name, f"{module.get('path')}/config.json") if module.get("path") else None
+        if not config:
+            continue
+        if kind == "Dense":
+            dimension = config["out_features"]
+        elif kind == "Pooling":
+            size = config.get("word_embedding_dimension") or config.get("embedding_dimension")
+            modes = sum(1 for k, v in config.items() if k.startswith("pooling_mode_") and v is True) or 1
+            dimension = size * modes if size else dimension
+
+    if dimension is None:
+        config = _read_model_file(model_name, "config.json") or {}
+        dimension = config.get("hidden_size")
+    return dimension
+
 class EmbeddingGenerator:
     """
     Thread-safe embedding generator for document chunks.
-    Uses a shared SentenceTransformer model safely across threads (CPU only).
+    Uses a shared model (SentenceTransformer or ONNX Runtime) safely across threads (CPU only).
     """
 
-    _model_instance = None
+    BACKENDS = ("torch", "onnx", "onnx-int8")
+
+    _model_instances = {}            # (backend, model_name[, replicas]) -> loaded model or replica pool
     _model_lock = threading.Lock()   # ensures single model load
     _encode_lock = threading.Lock()  # ensures thread-safe encode() calls
 
-    def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2", device="cpu"):
+    def __init__(
+        self,
+        model_name="sentence-transformers/all-MiniLM-L6-v2",
+        device="cpu",
+        cache: EmbeddingCache | None = None,
+        backend: str = "torch",
+        onnx_dir: str | None = None,
+        replicas: int = 0,
+        threads: int | None = None,
+        token_budget: int | None = None,
+    ):
         """
         Initialize a thread-safe embedding generator.
-        Loads the model only once (singleton style).
+        The model is loaded on first use, and only once per process (singleton style).
+
+        With an EmbeddingCache, generate() only sends chunks it has not seen before
+        (for this model) to the model and serves the rest from the cache.
+
+        `backend` selects the runtime: "torch" (SentenceTransformer), "onnx" or
+        "onnx-int8" (the same model exported to ONNX and run in ONNX Runtime,
+        the latter with dynamically int8-quantized weights). The ONNX export is
+        read from `onnx_dir` and created there on first use if missing.
+
+        With `replicas > 0` the model is not loaded here but in that many worker
+        processes, each pinned to its own share of the cores (EmbeddingReplicaPool),
+        and encode calls run in parallel instead of behind the shared lock.
+        `threads` fixes the intra-op thread count of an in-process model.
+
+        With a `token_budget`, chunks are bucketed by token length and batched so
+        that `batch size × longest chunk` stays within the budget, instead of
+        fixed `batch_size` batches padded to their longest member.
         """
-        with EmbeddingGenerator._model_lock:
-            if EmbeddingGenerator._model_instance is None:
-                logger.info(f"Loading embedding model '{model_name}' on {device}")
-                EmbeddingGenerator._model_instance = SentenceTransformer(model_name, device=device)
-            else:
-                logger.info("Reusing already loaded SentenceTransformer model")
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}', expected one of {self.BACKENDS}")
+
+        self.model_name = model_name
+        self.device = device
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        self.replicas = replicas
+        self.threads = threads
+        self.token_budget = token_budget
+        self.cache = cache
+        # Quantized vectors differ slightly, so they must not be mixed with torch ones in the cache
+        self._cache_namespace = model_name if backend == "torch" else f"{model_name}@{backend}"
+        self._key = (backend, model_name, replicas) if replicas else (backend, model_name)
+        self._model = None
+        self._dimension = None
+
+    @property
+    def model(self):
+        """The shared model (or replica pool), loaded on first access."""
+        if self._model is None:
+            with EmbeddingGenerator._model_lock:
+                if self._key not in EmbeddingGenerator._model_instances:
+                    EmbeddingGenerator._model_instances[self._key] = self._start_model()
+                else:
+                    logger.info(f"Reusing already loaded {self.backend} model '{self.model_name}'")
+                self._model = EmbeddingGenerator._model_instances[self._key]
+        return self._model
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None or self._key in EmbeddingGenerator._model_instances
+
+    def _start_model(self):
+        if self.replicas:
+            from text_utils.embedding_replicas import EmbeddingReplicaPool
+            logger.info(f"Starting {self.replicas} replicas of embedding model '{self.model_name}' ({self.backend} backend)")
+            return EmbeddingReplicaPool(self.model_name, self.device, self.backend, self.onnx_dir, replicas=self.replicas)
+        logger.info(f"Loading embedding model '{self.model_name}' on {self.device} ({self.backend} backend)")
+        return self._load(self.model_name, self.device, self.backend, self.onnx_dir, self.threads)
+
+    def warmup(self):
+        """Load the model and run one tiny batch, so the first real request does not pay for either."""
+        self._encode(["warmup"], batch_size=1)
 
-        self.model = EmbeddingGenerator._model_instance
+    @property
+    def dimension(self) -> int:
+        """Embedding size, read from the model's config files; the model is loaded only if they can't be read."""
+        if self._dimension is None:
+            self._dimension = read_embedding_dimension(self.model_name) or self.model.get_sentence_embedding_dimension()
+        return self._dimension
+
+    @staticmethod
+    def _load(model_name, device, backend, onnx_dir, threads=None):
+        if backend == "torch":
+            # Imported here so that importing this module does not pull in torch
+            import torch
+            from sentence_transformers import SentenceTransformer
+            if threads:
+                torch.set_num_threads(threads)
+            return SentenceTransformer(model_name, device=device)
+
+        from text_utils.onnx_backend import OnnxSentenceEncoder, ensure_onnx_export
+        onnx_dir = ensure_onnx_export(model_name, onnx_dir)
+        return OnnxSentenceEncoder(onnx_dir, quantized=backend == "onnx-int8", threads=threads)
+
+    @property
+    def max_seq_length(self) -> int:
+        """Tokens per input the model actually reads; anything beyond is truncated."""
+        return self.model.max_seq_length
+
+    def token_chunking_config(self, overlap_tokens: int = 32) -> ChunkingConfig:
+        """ChunkingConfig that packs chunks to exactly what this model can read."""
+        special = self.model.tokenizer.num_special_tokens_to_add()
+        return ChunkingConfig(
+            strategy="tokens",
+            model_name=self.model_name,
+            max_tokens=self.max_seq_length - special,
+            overlap_tokens=overlap_tokens,
+        )
 
     def generate(self, chunks, batch_size=32):
         """
@@ -41,10 +195,68 @@ class EmbeddingGenerator:
         if isinstance(chunks, str):
             chunks = [chunks]
 
+        if self.cache is not None:
+            return self._generate_cached(chunks, batch_size)
+        return self._embed(chunks, batch_size)
+
+    def _generate_cached(self, chunks, batch_size):
+        """Serve known chunks from the cache and encode only the misses."""
+        keys = [EmbeddingCache.make_key(self._cache_namespace, chunk) for chunk in chunks]
+        found = self.cache.get_many(keys)
+
+        missing = {}
+        for key, chunk in zip(keys, chunks):
+            if key not in found:
+                missing.setdefault(key, chunk)
+
+        logger.debug(f"Embedding cache: {len(chunks) - len(missing)} hits, {len(missing)} to encode")
+
+        if missing:
+            vectors = self._embed(list(missing.values()), batch_size)
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed)
+            found.update(computed)
+
+        return np.stack([found[key] for key in keys])
+
+    def _embed(self, chunks, batch_size):
+        if self.token_budget:
+            return self._encode_by_tokens(chunks)
+        return self._encode(chunks, batch_size)
+
+    def _encode_by_tokens(self, chunks):
+        """Encode length-bucketed batches sized by the token budget, then restore the input order."""
+        lengths = token_lengths(self.model.tokenizer, chunks, self.max_seq_length)
+        batches = plan_token_batches(lengths, self.token_budget)
+        texts = [[chunks[i] for i in batch] for batch in batches]
+        logger.debug(f"Generating embeddings for {len(chunks)} chunks in {len(batches)} token-budget batches")
+
+        try:
+            if self.replicas:
+                parts = self.model.encode_batches(texts)
+            else:
+                with EmbeddingGenerator._encode_lock:
+                    parts = [
+                        self.model.encode(batch, batch_size=len(batch), convert_to_numpy=True, show_progress_bar=False)
+                        for batch in texts
+                    ]
+        except Exception as e:
+            logger.error(f"Error generating embeddings: {e}", exc_info=True)
+            raise
+
+        embeddings = np.empty((len(chunks), parts[0].shape[1]), dtype=parts[0].dtype)
+        for batch, part in zip(batches, parts):
+            embeddings[batch] = part
+        logger.info(f"Generated embeddings for {len(chunks)} chunks.")
+        return embeddings
+
+    def _encode(self, chunks, batch_size):
         logger.debug(f"Generating embeddings for {len(chunks)} chunks (batch_size={batch_size})")
 
+        # Replicas run in their own processes, so only an in-process model needs the lock
+        lock = contextlib.nullcontext() if self.replicas else EmbeddingGenerator._encode_lock
         try:
-            with EmbeddingGenerator._encode_lock:
+            with lock:
                 embeddings = self.model.encode(
                     chunks,
                     batch_size=batch_size,
@@ -59,3 +271,131 @@ class EmbeddingGenerator:
 
     def generate_single(self, text: str):
         return self.generate([text])[0]
+
+    def close(self):
+        """Stop the replica processes, if any. In-process models stay loaded for reuse."""
+        if self.replicas:
+            with EmbeddingGenerator._model_lock:
+                pool = EmbeddingGenerator._model_instances.pop((self.backend, self.model_name, self.replicas), None)
+            if pool is not None:
+                pool.close()
+
+
+class EmbeddingBatcher:
+    """
+    Cross-document micro-batcher in front of an EmbeddingGenerator.
+
+    Worker threads submit the chunks of their own document and get a Future back.
+    A single background thread gathers submissions from all callers into one model
+    batch and flushes it when `batch_size` chunks are pending or when the oldest
+    submission has waited `max_wait` seconds, whichever comes first.
+    """
+
+    _STOP = object()
+
+    def __init__(self, generator: EmbeddingGenerator | None = None, batch_size: int = 64, max_wait: float = 0.05,
+                 on_batch=None):
+        """`on_batch(size, seconds)`, if given, is called after every model call (e.g. to record metrics)."""
+        self.generator = generator or EmbeddingGenerator()
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.on_batch = on_batch
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, chunks) -> Future:
+        """
+        Queue chunks for embedding. The returned Future resolves to an array with
+        one vector per chunk, in the order they were submitted.
+        """
+        if self._closed:
+            raise RuntimeError("EmbeddingBatcher is closed")
+
+        if isinstance(chunks, str):
+            chunks = [chunks]
+
+        future = Future()
+        if not chunks:
+            future.set_result([])
+            return future
+
+        self._queue.put((list(chunks), future))
+        return future
+
+    def generate(self, chunks):
+        """Blocking drop-in for EmbeddingGenerator.generate()."""
+        return self.submit(chunks).result()
+
+    def close(self):
+        """Flush whatever is still pending and stop the background thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(EmbeddingBatcher._STOP)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self):
+        pending = []
+        pending_chunks = 0
+        deadline = None
+
+        while True:
+            timeout = None if not pending else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None  # max_wait expired
+
+            if item is EmbeddingBatcher._STOP:
+                self._flush(pending)
+                return
+
+            if item is not None:
+                if not pending:
+                    deadline = time.monotonic() + self.max_wait
+                pending.append(item)
+                pending_chunks += len(item[0])
+                if pending_chunks < self.batch_size:
+                    continue
+
+            self._flush(pending)
+            pending = []
+            pending_chunks = 0
+
+    def _flush(self, pending):
+        # Drop submissions whose caller cancelled the future in the meantime
+        pending = [(chunks, future) for chunks, future in pending if future.set_running_or_notify_cancel()]
+        if not pending:
+            return
+
+        texts = [chunk for chunks, _ in pending for chunk in chunks]
+        logger.debug(f"Flushing {len(texts)} chunks from {len(pending)} documents")
+
+        started = time.perf_counter()
+        try:
+            embeddings = self.generator.generate(texts, batch_size=self.batch_size)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - started
+
+        offset = 0
+        for chunks, future in pending:
+            future.set_result(embeddings[offset:offset + len(chunks)])
+            offset += len(chunks)
+
+        if self.on_batch is not None:
+            try:
+                self.on_batch(len(texts), elapsed)
+            except Exception as e:
+                logger.warning(f"⚠️ on_batch callback failed: {e}")
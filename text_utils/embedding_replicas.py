@@ -0,0 +1,163 @@
+import os
+import math
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# The EmbeddingGenerator living inside a replica process
+_replica = None
+
+
+def available_cores() -> list[int]:
+    """CPU ids this process may run on (respects taskset/cgroup limits where the OS exposes them)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_core_groups(replicas: int, cores: list[int] | None = None) -> list[list[int]]:
+    """
+    Split cores into one contiguous group per replica, e.g. 32 cores and 4
+    replicas → 4 groups of 8. With more replicas than cores, replicas share cores.
+    """
+    cores = sorted(cores) if cores else available_cores()
+    replicas = max(1, replicas)
+    if replicas > len(cores):
+        logger.warning(f"⚠️ {replicas} embedding replicas on {len(cores)} cores; replicas will share cores")
+        return [[cores[i % len(cores)]] for i in range(replicas)]
+    return [group.tolist() for group in np.array_split(np.array(cores), replicas)]
+
+
+def _init_replica(model_name, device, backend, onnx_dir, cores):
+    """Pin this worker process to its cores and load the model with a matching thread count."""
+    global _replica
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    # Set before torch / onnxruntime are imported so their thread pools pick it up
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(len(cores))
+
+    from text_utils.embedding_generator import EmbeddingGenerator
+
+    _replica = EmbeddingGenerator(model_name, device=device, backend=backend, onnx_dir=onnx_dir, threads=len(cores))
+
+
+def _replica_info() -> dict:
+    return {"pid": os.getpid(), "max_seq_length": _replica.max_seq_length, "dimension": _replica.dimension}
+
+
+def _encode_in_replica(chunks, batch_size):
+    return np.asarray(_replica._encode(chunks, batch_size), dtype=np.float32)
+
+
+class EmbeddingReplicaPool:
+    """
+    N copies of an embedding model, each in its own worker process pinned to its
+    own set of cores with a fixed intra-op thread count.
+
+    Small batches do not keep many torch threads busy, so a single encoder on a
+    large host plateaus after a few cores. Independent replicas avoid that:
+    encode() splits a batch into one slice per replica and runs the slices in
+    parallel, and concurrent callers are routed to the least busy replicas.
+
+    Stands in for the SentenceTransformer model inside EmbeddingGenerator
+    (encode(), tokenizer, max_seq_length), so generate() does not change.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        device: str = "cpu",
+        backend: str = "torch",
+        onnx_dir: str | None = None,
+        replicas: int = 2,
+        cores: list[int] | None = None,
+    ):
+        self.model_name = model_name
+        if backend != "torch":
+            # Export once here rather than racing to do it in every replica
+            from text_utils.onnx_backend import ensure_onnx_export
+            onnx_dir = ensure_onnx_export(model_name, onnx_dir)
+        self.core_groups = plan_core_groups(replicas, cores)
+
+        # spawn, not fork: the parent may already run threads or hold a model
+        context = multiprocessing.get_context("spawn")
+        self._executors = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=context,
+                initializer=_init_replica,
+                initargs=(model_name, device, backend, onnx_dir, group),
+            )
+            for group in self.core_groups
+        ]
+        self._in_flight = [0] * len(self._executors)
+        self._lock = threading.Lock()
+        self._tokenizer = None
+
+        # Load all replicas in parallel and wait until they are ready
+        infos = [f.result() for f in [ex.submit(_replica_info) for ex in self._executors]]
+        self.max_seq_length = infos[0]["max_seq_length"]
+        self._dimension = infos[0]["dimension"]
+        logger.info(
+            f"🧵 Started {len(self._executors)} embedding replicas on cores "
+            + ", ".join(f"{g[0]}-{g[-1]}" if len(g) > 1 else str(g[0]) for g in self.core_groups)
+        )
+
+    @property
+    def replicas(self) -> int:
+        return len(self._executors)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dimension
+
+    @property
+    def tokenizer(self):
+        """Tokenizer of the model, loaded in this process without the model itself."""
+        if self._tokenizer is None:
+            from text_utils.chunking import get_tokenizer
+            self._tokenizer = get_tokenizer(self.model_name)
+        return self._tokenizer
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Embed sentences across the replicas; one row per sentence, in input order."""
+        sentences = list(sentences)
+        if not sentences:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        slice_size = math.ceil(len(sentences) / self.replicas)
+        futures = [
+            self._submit(sentences[start:start + slice_size], min(batch_size, slice_size))
+            for start in range(0, len(sentences), slice_size)
+        ]
+        return np.concatenate([f.result() for f in futures])
+
+    def encode_batches(self, batches: list[list[str]]) -> list[np.ndarray]:
+        """Encode ready-made batches (one model call each) in parallel; one array per batch."""
+        futures = [self._submit(batch, len(batch)) for batch in batches]
+        return [f.result() for f in futures]
+
+    def _submit(self, sentences, batch_size):
+        index = self._acquire()
+        future = self._executors[index].submit(_encode_in_replica, sentences, batch_size)
+        future.add_done_callback(lambda _, i=index: self._release(i))
+        return future
+
+    def _acquire(self) -> int:
+        with self._lock:
+            index = min(range(len(self._in_flight)), key=self._in_flight.__getitem__)
+            self._in_flight[index] += 1
+            return index
+
+    def _release(self, index: int):
+        with self._lock:
+            self._in_flight[index] -= 1
+
+    def close(self):
+        for executor in self._executors:
+            executor.shutdown()
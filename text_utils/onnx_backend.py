@@ -0,0 +1,188 @@
+import os
+import json
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Written next to the exported graph; holds what the encoder needs besides the weights
+ONNX_CONFIG = "onnx_config.json"
+MODEL_FILE = "model.onnx"
+MODEL_FILE_INT8 = "model_int8.onnx"
+
+
+def default_onnx_dir(model_name: str) -> str:
+    """Where an exported model lives unless EMBEDDING_ONNX_DIR says otherwise."""
+    return os.path.join("onnx_models", model_name.replace("/", "__"))
+
+
+def ensure_onnx_export(model_name: str, onnx_dir: str | None = None) -> str:
+    """Return the export directory of a model, exporting it first if it does not exist yet."""
+    onnx_dir = onnx_dir or default_onnx_dir(model_name)
+    if not os.path.exists(os.path.join(onnx_dir, ONNX_CONFIG)):
+        export_onnx(model_name, onnx_dir)
+    return onnx_dir
+
+
+def export_onnx(model_name: str, out_dir: str, quantize: bool = True) -> str:
+    """
+    Export a SentenceTransformer model to ONNX, plus a dynamically int8-quantized copy.
+
+    Only the transformer is exported (input ids → token embeddings). Pooling and
+    normalization are read from the SentenceTransformer pipeline and stored in
+    onnx_config.json, so OnnxSentenceEncoder can reproduce them in NumPy.
+    Needs torch and sentence_transformers; loading the export afterwards does not.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Pooling, Normalize
+
+    os.makedirs(out_dir, exist_ok=True)
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    modules = list(st_model)
+    pooling = next((m for m in modules if isinstance(m, Pooling)), None)
+    if pooling is None:
+        mode = "mean"
+    elif hasattr(pooling, "get_pooling_mode_str"):
+        mode = pooling.get_pooling_mode_str()
+    else:  # sentence-transformers >= 6
+        mode = pooling.pooling_mode
+    if mode not in ("mean", "cls", "max"):
+        raise ValueError(f"Pooling mode '{mode}' is not supported by the ONNX backend")
+
+    config = {
+        "model_name": model_name,
+        "max_seq_length": st_model.max_seq_length,
+        "pooling": mode,
+        "normalize": any(isinstance(m, Normalize) for m in modules),
+        "dimension": st_model.get_sentence_embedding_dimension(),
+    }
+
+    sample = tokenizer(["onnx export"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    class _Wrapper(torch.nn.Module):
+        # Positional inputs in a fixed order and a single tensor output trace cleanly
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)), return_dict=True).last_hidden_state
+
+    path = os.path.join(out_dir, MODEL_FILE)
+    logger.info(f"Exporting '{model_name}' to ONNX at {path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            _Wrapper(transformer),
+            tuple(sample[name] for name in input_names),
+            path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False,
+        )
+    tokenizer.save_pretrained(out_dir)
+    with open(os.path.join(out_dir, ONNX_CONFIG), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        int8_path = os.path.join(out_dir, MODEL_FILE_INT8)
+        logger.info(f"Quantizing weights to int8 at {int8_path}")
+        quantize_dynamic(path, int8_path, weight_type=QuantType.QInt8)
+
+    return out_dir
+
+
+class OnnxSentenceEncoder:
+    """
+    SentenceTransformer stand-in that runs an exported model in ONNX Runtime.
+
+    Exposes the parts of the SentenceTransformer API EmbeddingGenerator uses:
+    encode(), tokenizer, max_seq_length and get_sentence_embedding_dimension().
+    Tokenization uses the fast tokenizer saved with the export, pooling and
+    normalization are done in NumPy as configured in onnx_config.json.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, threads: int | None = None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, ONNX_CONFIG), encoding="utf-8") as f:
+            self.config = json.load(f)
+
+        self.model_dir = model_dir
+        self.quantized = quantized
+        self.max_seq_length = self.config["max_seq_length"]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir, use_fast=True)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        path = os.path.join(model_dir, MODEL_FILE_INT8 if quantized else MODEL_FILE)
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dimension"]
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs):
+        """Embed sentences; returns a float32 array with one row per sentence, in input order."""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        if not sentences:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+
+        # Like SentenceTransformer, batch similar lengths together to keep padding low
+        order = np.argsort([-len(s) for s in sentences], kind="stable")
+        out = np.empty((len(sentences), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for start in range(0, len(sentences), batch_size):
+            idx = order[start:start + batch_size]
+            out[idx] = self._encode_batch([sentences[i] for i in idx])
+
+        return out[0] if single else out
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self._input_names}
+        hidden = self.session.run(None, feeds)[0]
+        mask = encoded["attention_mask"].astype(np.float32)[:, :, None]
+
+        pooling = self.config["pooling"]
+        if pooling == "cls":
+            pooled = hidden[:, 0]
+        elif pooling == "max":
+            pooled = np.where(mask > 0, hidden, -1e9).max(axis=1)
+        else:
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.config["normalize"]:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+
+def cosine_parity(reference: np.ndarray, candidate: np.ndarray) -> dict:
+    """Row-wise cosine similarity between two embedding matrices of the same texts."""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    dot = (reference * candidate).sum(axis=1)
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    cos = dot / np.clip(norms, 1e-12, None)
+    return {"min": float(cos.min()), "mean": float(cos.mean()), "count": int(len(cos))}
@@ -0,0 +1,48 @@
+# A token rarely spans more characters than this, so a prefix this long already fills the window
+_MAX_CHARS_PER_TOKEN = 10
+
+
+def token_lengths(tokenizer, texts: list[str], max_length: int) -> list[int]:
+    """
+    Tokens per text as the model will see them: special tokens included, truncated to max_length.
+
+    Only a prefix of long texts is tokenized; the tokenizer would otherwise split
+    a whole 500-word window just to truncate it. The result is used for batching
+    only, so an occasional underestimate (e.g. very long URLs) is harmless.
+    """
+    limit = max_length * _MAX_CHARS_PER_TOKEN
+    prefixes = [text if len(text) <= limit else text[:limit] for text in texts]
+    encoded = tokenizer(prefixes, add_special_tokens=True, truncation=True, max_length=max_length)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+
+def plan_token_batches(lengths: list[int], token_budget: int, max_batch_size: int | None = None) -> list[list[int]]:
+    """
+    Group input indices into batches whose padded size stays within a token budget.
+
+    Indices are sorted by length, so every batch holds inputs of similar length
+    and is padded only up to its own longest member. A batch is closed when
+    adding the next input would make `batch size × longest length` exceed
+    `token_budget`: many short rows go into one batch, long windows into small
+    ones. An input longer than the budget still gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches: list[list[int]] = []
+    current: list[int] = []
+
+    for i in order:
+        # Sorted ascending, so the new input is the longest of the batch
+        full = max_batch_size is not None and len(current) >= max_batch_size
+        if current and (full or (len(current) + 1) * lengths[i] > token_budget):
+            batches.append(current)
+            current = []
+        current.append(i)
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def padded_tokens(lengths: list[int], batches: list[list[int]]) -> int:
+    """Total tokens the model processes for these batches, padding included."""
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches)
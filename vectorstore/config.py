@@ -1,31 +1,198 @@
-from qdrant_client import QdrantClient
+from qdrant_client import QdrantClient, AsyncQdrantClient, models
 import os, logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def setup_qdrant(embedding_size: int, create_if_missing: bool = True):
+def _client_settings() -> dict:
+    return {
+        "host": os.getenv("QDRANT_HOST", "localhost"),
+        "port": int(os.getenv("QDRANT_PORT", "6333")),
+        "grpc_port": int(os.getenv("QDRANT_GRPC_PORT", "6334")),
+        "prefer_grpc": os.getenv("QDRANT_PREFER_GRPC", "0").lower() in ("1", "true", "yes"),
+    }
 
-    qdrant_host = os.getenv("QDRANT_HOST", "localhost")
-    qdrant_port = int(os.getenv("QDRANT_PORT", "6333"))
-    collection = os.getenv("QDRANT_COLLECTION", "documents")
+def use_local_index() -> bool:
+    """VECTOR_BACKEND=local swaps Qdrant for the embedded index in vectorstore.local_index."""
+    backend = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+    if backend not in ("qdrant", "local"):
+        raise ValueError(f"Unknown VECTOR_BACKEND '{backend}', expected 'qdrant' or 'local'")
+    return backend == "local"
+
+def _local_client():
+    from vectorstore.local_index import open_local_client
+    return open_local_client(
+        os.getenv("LOCAL_INDEX_PATH", "local_index"),
+        dtype=os.getenv("LOCAL_INDEX_DTYPE", "float32"),
+        ivf_lists=int(os.getenv("LOCAL_INDEX_IVF_LISTS", "0")),
+        nprobe=int(os.getenv("LOCAL_INDEX_NPROBE", "8")),
+    )
+
+def make_qdrant_client() -> QdrantClient:
+    """
+    Create a Qdrant client from env settings.
+    With QDRANT_PREFER_GRPC=1 the client talks gRPC (QDRANT_GRPC_PORT) instead of REST.
+    With VECTOR_BACKEND=local it returns a LocalIndexClient (same methods) instead.
+    """
+    if use_local_index():
+        return _local_client()
+    return QdrantClient(**_client_settings())
+
+def make_async_qdrant_client() -> AsyncQdrantClient:
+    """
+    Asyncio counterpart of make_qdrant_client(), for use inside the API's event loop.
+    Skips the client/server version probe, which would otherwise block on Qdrant
+    when the client is created at import time.
+    """
+    if use_local_index():
+        from vectorstore.local_index import AsyncLocalIndexClient
+        return AsyncLocalIndexClient(_local_client())
+    return AsyncQdrantClient(**_client_settings(), check_compatibility=False)
+
+# Payload fields the pipeline (dedup, stale-chunk cleanup) and the search API filter on.
+# Created together with the collection, before any points, so that Qdrant builds
+# the extra HNSW links that let filtered searches stay inside the graph traversal.
+PAYLOAD_INDEXES = {
+    "doc_id": models.PayloadSchemaType.KEYWORD,
+    "hash": models.PayloadSchemaType.KEYWORD,
+    "source": models.PayloadSchemaType.KEYWORD,
+    "domain": models.PayloadSchemaType.KEYWORD,
+    "extension": models.PayloadSchemaType.KEYWORD,
+    "ingested_at": models.PayloadSchemaType.INTEGER,  # unix seconds, range-filtered
+}
+
+# -----------------------------------------------------------
+# Collection performance profiles (QDRANT_PROFILE)
+#
+# Each profile trades memory for latency differently:
+#   - default:        Qdrant defaults, everything in RAM (previous behaviour)
+#   - ram-fast:       denser HNSW graph in RAM, best latency/recall, most memory
+#   - disk-large:     vectors, graph and payload on disk, PQ codes in RAM,
+#                     for collections of tens of millions of chunks
+#   - quantized-int8: int8 scalar-quantized vectors in RAM, originals on disk
+#                     for rescoring; ~4x less RAM at near-identical recall
+#
+# "search" holds the query-time params that go with the profile (e.g. rescoring).
+# -----------------------------------------------------------
+PROFILES = {
+    "default": {
+        "vectors": {},
+        "hnsw": None,
+        "quantization": None,
+        "on_disk_payload": None,
+        "search": None,
+    },
+    "ram-fast": {
+        "vectors": {"on_disk": False},
+        "hnsw": models.HnswConfigDiff(m=32, ef_construct=256, on_disk=False),
+        "quantization": None,
+        "on_disk_payload": False,
+        "search": models.SearchParams(hnsw_ef=128),
+    },
+    "disk-large": {
+        "vectors": {"on_disk": True},
+        "hnsw": models.HnswConfigDiff(m=16, ef_construct=100, on_disk=True),
+        "quantization": models.ProductQuantization(
+            product=models.ProductQuantizationConfig(
+                compression=models.CompressionRatio.X16,
+                always_ram=True,
+            )
+        ),
+        "on_disk_payload": True,
+        "search": models.SearchParams(
+            hnsw_ef=128,
+            quantization=models.QuantizationSearchParams(rescore=True, oversampling=3.0),
+        ),
+    },
+    "quantized-int8": {
+        "vectors": {"on_disk": True},
+        "hnsw": models.HnswConfigDiff(m=16, ef_construct=128),
+        "quantization": models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True,
+            )
+        ),
+        "on_disk_payload": False,
+        "search": models.SearchParams(
+            quantization=models.QuantizationSearchParams(rescore=True, oversampling=2.0),
+        ),
+    },
+}
+
+def get_profile(profile: str | None = None) -> dict:
+    """Return the named collection profile, falling back to QDRANT_PROFILE, then 'default'."""
+    name = profile or os.getenv("QDRANT_PROFILE", "default")
+    if name not in PROFILES:
+        raise ValueError(f"Unknown Qdrant profile '{name}', expected one of {sorted(PROFILES)}")
+    return PROFILES[name]
+
+def get_search_params(profile: str | None = None) -> models.SearchParams | None:
+    """Query-time search params matching the collection profile."""
+    return get_profile(profile)["search"]
+
+def ensure_payload_indexes(qdrant: QdrantClient, collection: str):
+    """Create indexes for the payload fields the pipeline and the search API filter on (idempotent)."""
+    for field_name, schema in PAYLOAD_INDEXES.items():
+        qdrant.create_payload_index(collection_name=collection, field_name=field_name, field_schema=schema)
+
+# -----------------------------------------------------------
+# Ingest generation marker
+#
+# A one-point side collection whose payload holds a counter (a nanosecond
+# timestamp) that VectorDBStore bumps after every write. The API compares it
+# to decide when its cached search results are stale.
+# -----------------------------------------------------------
+GENERATION_POINT_ID = 0
+
+def generation_collection(collection: str) -> str:
+    return f"{collection}__generation"
+
+def ensure_generation_marker(qdrant: QdrantClient, collection: str):
+    """Create the side collection holding the ingest generation of `collection`, if missing."""
+    name = generation_collection(collection)
+    if not qdrant.collection_exists(name):
+        qdrant.create_collection(
+            collection_name=name,
+            vectors_config=models.VectorParams(size=1, distance=models.Distance.DOT),
+        )
+
+def get_collection_name() -> str:
+    return os.getenv("QDRANT_COLLECTION", "documents")
+
+def setup_qdrant(embedding_size: int, create_if_missing: bool = True, profile: str | None = None):
+
+    collection = get_collection_name()
     distance = os.getenv("QDRANT_DISTANCE", "Cosine")
+    profile = profile or os.getenv("QDRANT_PROFILE", "default")
 
-    qdrant = QdrantClient(host=qdrant_host, port=qdrant_port)
+    qdrant = make_qdrant_client()
 
     existing = [c.name for c in qdrant.get_collections().collections]
     
     if collection not in existing:
         if create_if_missing:
-            qdrant.recreate_collection(
+            settings = get_profile(profile)
+            qdrant.create_collection(
                 collection_name=collection,
-                vectors_config={"size": embedding_size, "distance": distance},
+                vectors_config=models.VectorParams(size=embedding_size, distance=distance, **settings["vectors"]),
+                hnsw_config=settings["hnsw"],
+                quantization_config=settings["quantization"],
+                on_disk_payload=settings["on_disk_payload"],
             )
-            logger.info(f"✅ Created collection '{collection}'")
+            ensure_payload_indexes(qdrant, collection)
+            logger.info(f"✅ Created collection '{collection}' (profile '{profile}')")
         else:
             raise RuntimeError(f"Collection '{collection}' not found — did you run ingestion?")
     else:
         logger.info(f"ℹ️ Collection '{collection}' already exists")
+        if create_if_missing:
+            # Adds indexes introduced after the collection was created
+            ensure_payload_indexes(qdrant, collection)
+
+    if create_if_missing:
+        ensure_generation_marker(qdrant, collection)
 
     return qdrant, collection
  
\ No newline at end of file
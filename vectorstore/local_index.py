@@ -0,0 +1,559 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+
+import numpy as np
+from qdrant_client import models
+from qdrant_client.http.models import QueryResponse
+
+logger = logging.getLogger(__name__)
+
+_META = "meta.json"
+_VECTORS = "vectors.bin"
+_ALIVE = "alive.bin"
+_LISTS = "lists.bin"
+_CENTROIDS = "centroids.npy"
+_PAYLOADS = "payloads.db"
+
+_INITIAL_CAPACITY = 1024
+_BLOCK_ROWS = 32_768       # rows scored per matmul, bounds the float32 temporaries of float16 storage
+_MAX_PARAMS = 500          # SQLite limit on bound parameters per statement
+_EXACT_FILTER_ROWS = 20_000  # filters matching fewer rows than this are scored exactly, never via IVF
+
+
+class LocalIndex:
+    """
+    One collection stored in a directory: an embedded alternative to a Qdrant collection.
+
+    Vectors live in a memory-mapped float32 (or float16) matrix, one row per
+    point, so the OS page cache holds them and several processes can share one
+    copy. Payloads and point ids are kept in a SQLite side store, together with
+    a (key, value) table for the indexed payload fields used by filters.
+
+    Search is exact by default: vectorized dot products over the matrix in
+    blocks, then argpartition for the top k. With `ivf_lists > 0`, the vectors
+    are clustered with k-means once enough points exist, and a query only
+    scores the rows of its `nprobe` nearest clusters.
+
+    Cosine and Dot distances are supported; for Cosine, vectors are normalized
+    on insert. Deleted points leave a tombstone row. One writer process at a
+    time; readers in other processes pick up changes from meta.json.
+    """
+
+    def __init__(self, path: str, dim: int | None = None, distance: str = "Cosine", dtype: str = "float32",
+                 ivf_lists: int = 0, nprobe: int = 8):
+        self.path = path
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self._meta_mtime = None
+        self._inverted = None  # (version, cluster -> row indices)
+
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, _META)):
+            self._load_meta()
+        else:
+            if dim is None:
+                raise ValueError(f"No local index at '{path}' and no dimension given to create one")
+            if distance not in ("Cosine", "Dot"):
+                raise ValueError(f"Local index supports Cosine and Dot distance, not '{distance}'")
+            self.meta = {
+                "dim": dim, "distance": distance, "dtype": dtype, "count": 0, "capacity": _INITIAL_CAPACITY,
+                "ivf_lists": ivf_lists, "trained": False, "version": 0, "indexes": [],
+            }
+            self._write_meta()
+
+        self._conn = sqlite3.connect(os.path.join(path, _PAYLOADS), check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            # `id` has no declared type, so integer and UUID-string ids keep their type
+            self._conn.execute("CREATE TABLE IF NOT EXISTS points (row INTEGER PRIMARY KEY, id UNIQUE, payload TEXT)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS fields (row INTEGER, key TEXT, value)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_fields ON fields (key, value)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_fields_row ON fields (row)")
+        self._open_arrays()
+
+    # -----------------------------------------------------------
+    # Files
+    # -----------------------------------------------------------
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _write_meta(self):
+        self.meta["version"] += 1
+        tmp = self._file(_META + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self._file(_META))
+        self._meta_mtime = os.stat(self._file(_META)).st_mtime_ns
+
+    def _load_meta(self):
+        with open(self._file(_META), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self._meta_mtime = os.stat(self._file(_META)).st_mtime_ns
+
+    def _open_arrays(self):
+        capacity, dim = self.meta["capacity"], self.meta["dim"]
+        self._vectors = self._memmap(_VECTORS, self.meta["dtype"], (capacity, dim))
+        self._alive = self._memmap(_ALIVE, np.uint8, (capacity,))
+        self._lists = self._memmap(_LISTS, np.int32, (capacity,))
+        centroids = self._file(_CENTROIDS)
+        self._centroids = np.load(centroids) if self.meta["trained"] and os.path.exists(centroids) else None
+
+    def _memmap(self, name, dtype, shape):
+        path = self._file(name)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if not os.path.exists(path) or os.path.getsize(path) < size:
+            with open(path, "ab") as f:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _refresh(self):
+        """Pick up writes made by another process (a changed meta.json)."""
+        try:
+            mtime = os.stat(self._file(_META)).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._meta_mtime:
+            with self._lock:
+                capacity = self.meta["capacity"]
+                trained = self.meta["trained"]
+                self._load_meta()
+                if self.meta["capacity"] != capacity or self.meta["trained"] != trained:
+                    self._open_arrays()
+
+    def _grow(self, needed: int):
+        capacity = self.meta["capacity"]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for array in (self._vectors, self._alive, self._lists):
+            array.flush()
+        self.meta["capacity"] = capacity
+        self._open_arrays()
+
+    @property
+    def count(self) -> int:
+        """Number of live points."""
+        self._refresh()
+        return int(np.count_nonzero(self._alive[:self.meta["count"]]))
+
+    @property
+    def dim(self) -> int:
+        return self.meta["dim"]
+
+    # -----------------------------------------------------------
+    # Writes
+    # -----------------------------------------------------------
+    def upsert(self, ids: list, vectors, payloads: list[dict | None]):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Vector size {vectors.shape[1]} does not match the index dimension {self.dim}")
+        if self.meta["distance"] == "Cosine":
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+        # An id repeated within the batch keeps its last occurrence, as in Qdrant;
+        # otherwise each copy would get a row and only one of them a payload
+        last = {pid: i for i, pid in enumerate(ids)}
+        if len(last) < len(ids):
+            keep = sorted(last.values())
+            ids, vectors, payloads = [ids[i] for i in keep], vectors[keep], [payloads[i] for i in keep]
+
+        with self._lock:
+            rows = self._rows_of(ids)
+            next_row = self.meta["count"]
+            for i, row in enumerate(rows):
+                if row is None:
+                    rows[i] = next_row
+                    next_row += 1
+            self._grow(next_row)
+
+            rows_array = np.array(rows, dtype=np.int64)
+            self._vectors[rows_array] = vectors.astype(self.meta["dtype"], copy=False)
+            self._alive[rows_array] = 1
+            if self._centroids is not None:
+                self._lists[rows_array] = self._nearest_cluster(vectors, self._centroids)
+
+            indexed = set(self.meta["indexes"])
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO points (row, id, payload) VALUES (?, ?, ?)",
+                    [(row, pid, json.dumps(payload or {}, ensure_ascii=False)) for row, pid, payload in zip(rows, ids, payloads)],
+                )
+                self._delete_fields(rows)
+                self._conn.executemany(
+                    "INSERT INTO fields (row, key, value) VALUES (?, ?, ?)",
+                    [(row, key, value) for row, payload in zip(rows, payloads)
+                     for key, value in _field_values(payload or {}, indexed)],
+                )
+
+            self.meta["count"] = next_row
+            if self.meta["ivf_lists"] and not self.meta["trained"] and next_row >= 39 * self.meta["ivf_lists"]:
+                self._train()
+            self._flush()
+
+    def delete(self, ids: list):
+        with self._lock:
+            rows = [row for row in self._rows_of(ids) if row is not None]
+            if not rows:
+                return
+            self._alive[np.array(rows, dtype=np.int64)] = 0
+            with self._conn:
+                self._delete_fields(rows)
+                for part in _parts(rows):
+                    self._conn.execute(f"DELETE FROM points WHERE row IN ({','.join('?' * len(part))})", part)
+            self._flush()
+
+    def create_field_index(self, key: str):
+        """Make a payload field filterable, indexing the points stored so far."""
+        with self._lock:
+            if key in self.meta["indexes"]:
+                return
+            self.meta["indexes"].append(key)
+            with self._conn:
+                rows = self._conn.execute("SELECT row, payload FROM points").fetchall()
+                self._conn.executemany(
+                    "INSERT INTO fields (row, key, value) VALUES (?, ?, ?)",
+                    [(row, k, v) for row, payload in rows for k, v in _field_values(json.loads(payload), {key})],
+                )
+            self._write_meta()
+
+    def build_ivf(self):
+        """(Re)cluster all live vectors now, instead of waiting for enough points."""
+        with self._lock:
+            self._train()
+            self._flush()
+
+    def _rows_of(self, ids: list) -> list:
+        found = {}
+        for part in _parts(list(ids)):
+            found.update(self._conn.execute(
+                f"SELECT id, row FROM points WHERE id IN ({','.join('?' * len(part))})", part
+            ).fetchall())
+        return [found.get(pid) for pid in ids]
+
+    def _delete_fields(self, rows):
+        for part in _parts(rows):
+            self._conn.execute(f"DELETE FROM fields WHERE row IN ({','.join('?' * len(part))})", part)
+
+    def _flush(self):
+        for array in (self._vectors, self._alive, self._lists):
+            array.flush()
+        self._write_meta()
+
+    def _train(self):
+        count = self.meta["count"]
+        lists = self.meta["ivf_lists"]
+        live = np.flatnonzero(self._alive[:count])
+        if len(live) < lists:
+            return
+        rng = np.random.default_rng(0)
+        sample = rng.choice(live, size=min(len(live), 256 * lists), replace=False)
+        started = time.perf_counter()
+        centroids = _kmeans(np.asarray(self._vectors[np.sort(sample)], dtype=np.float32), lists, rng)
+        for start in range(0, count, _BLOCK_ROWS):
+            block = np.asarray(self._vectors[start:min(start + _BLOCK_ROWS, count)], dtype=np.float32)
+            self._lists[start:start + len(block)] = self._nearest_cluster(block, centroids)
+        np.save(self._file(_CENTROIDS), centroids)
+        self._centroids = centroids
+        self.meta["trained"] = True
+        logger.info(f"🧭 Clustered {count} vectors into {lists} IVF lists in {time.perf_counter() - started:.1f}s")
+
+    @staticmethod
+    def _nearest_cluster(vectors, centroids):
+        # argmin ||x - c||² == argmax (x·c - ||c||²/2)
+        return np.argmax(vectors @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1).astype(np.int32)
+
+    # -----------------------------------------------------------
+    # Reads
+    # -----------------------------------------------------------
+    def search(self, query, limit: int = 10, query_filter: models.Filter | None = None, exact: bool = False,
+               nprobe: int | None = None) -> list[tuple]:
+        """Top `limit` points as (id, score, payload), best first."""
+        self._refresh()
+        q = np.asarray(query, dtype=np.float32).ravel()
+        if self.meta["distance"] == "Cosine":
+            q = q / max(float(np.linalg.norm(q)), 1e-12)
+
+        with self._lock:
+            count = self.meta["count"]
+            vectors, alive, lists, centroids = self._vectors, self._alive, self._lists, self._centroids
+            version = self.meta["version"]
+
+        rows = self._filter_rows(query_filter)
+        use_ivf = centroids is not None and not exact and (rows is None or len(rows) > _EXACT_FILTER_ROWS)
+        if use_ivf:
+            probe = np.argsort(-(centroids @ q))[:nprobe or self.nprobe]
+            candidates = np.concatenate([self._inverted_lists(lists, count, version, len(centroids))[c] for c in probe])
+            rows = candidates if rows is None else np.intersect1d(candidates, rows, assume_unique=True)
+
+        if rows is None:
+            scores = np.empty(count, dtype=np.float32)
+            for start in range(0, count, _BLOCK_ROWS):
+                block = vectors[start:min(start + _BLOCK_ROWS, count)]
+                scores[start:start + len(block)] = np.asarray(block, dtype=np.float32) @ q
+            scores[alive[:count] == 0] = -np.inf
+            rows = np.arange(count)
+        else:
+            rows = rows[rows < count]
+            scores = np.asarray(vectors[rows], dtype=np.float32) @ q if len(rows) else np.empty(0, dtype=np.float32)
+            scores[alive[rows] == 0] = -np.inf
+
+        k = min(limit, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return self._hits(rows[top].tolist(), scores[top].tolist())
+
+    def retrieve(self, ids: list) -> list[tuple]:
+        """(id, payload) of the points that exist, in the order of `ids`."""
+        found = {}
+        with self._lock:
+            for part in _parts(list(ids)):
+                found.update((pid, payload) for pid, payload in self._conn.execute(
+                    f"SELECT id, payload FROM points WHERE id IN ({','.join('?' * len(part))})", part
+                ))
+        return [(pid, json.loads(found[pid])) for pid in ids if pid in found]
+
+    def _hits(self, rows: list[int], scores: list[float]) -> list[tuple]:
+        found = {}
+        with self._lock:
+            for part in _parts(rows):
+                found.update((row, (pid, payload)) for row, pid, payload in self._conn.execute(
+                    f"SELECT row, id, payload FROM points WHERE row IN ({','.join('?' * len(part))})", part
+                ))
+        return [(found[row][0], score, json.loads(found[row][1])) for row, score in zip(rows, scores) if row in found]
+
+    def _inverted_lists(self, lists, count, version, n_lists):
+        cached = self._inverted
+        if cached is None or cached[0] != version:
+            assignment = np.asarray(lists[:count])
+            order = np.argsort(assignment, kind="stable")
+            bounds = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+            cached = (version, [order[bounds[c]:bounds[c + 1]] for c in range(n_lists)])
+            self._inverted = cached
+        return cached[1]
+
+    def _filter_rows(self, query_filter: models.Filter | None) -> np.ndarray | None:
+        """Rows matching a filter of must/must_not conditions on indexed fields, or None for no filter."""
+        if query_filter is None:
+            return None
+        if query_filter.should or query_filter.min_should:
+            raise ValueError("Local index filters support 'must' and 'must_not' conditions only")
+
+        clauses, params = [], []
+        for negate, conditions in ((False, query_filter.must), (True, query_filter.must_not)):
+            for condition in _as_list(conditions):
+                sql, args = self._condition_sql(condition)
+                clauses.append(("row NOT IN " if negate else "row IN ") + sql)
+                params.extend(args)
+        if not clauses:
+            return None
+
+        with self._lock:
+            rows = self._conn.execute(f"SELECT row FROM points WHERE {' AND '.join(clauses)}", params).fetchall()
+        return np.array(sorted(r for (r,) in rows), dtype=np.int64)
+
+    def _condition_sql(self, condition):
+        if not isinstance(condition, models.FieldCondition):
+            raise ValueError(f"Unsupported filter condition {type(condition).__name__}")
+        if condition.key not in self.meta["indexes"]:
+            raise ValueError(f"Payload field '{condition.key}' is not indexed; create a payload index first")
+
+        sql, args = "(SELECT row FROM fields WHERE key = ?", [condition.key]
+        if isinstance(condition.match, models.MatchValue):
+            sql += " AND value = ?"
+            args.append(condition.match.value)
+        elif isinstance(condition.match, models.MatchAny):
+            sql += f" AND value IN ({','.join('?' * len(condition.match.any))})"
+            args.extend(condition.match.any)
+        elif condition.range is not None:
+            for op, bound in ((">", condition.range.gt), (">=", condition.range.gte),
+                              ("<", condition.range.lt), ("<=", condition.range.lte)):
+                if bound is not None:
+                    sql += f" AND value {op} ?"
+                    args.append(bound)
+        else:
+            raise ValueError("Local index filters support match value/any and range conditions")
+        return sql + ")", args
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+
+def _kmeans(data: np.ndarray, k: int, rng, iterations: int = 10) -> np.ndarray:
+    """Plain Lloyd's k-means; empty clusters are re-seeded with random points."""
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = LocalIndex._nearest_cluster(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        counts = np.bincount(assignment, minlength=k)
+        empty = counts == 0
+        centroids = sums / np.maximum(counts, 1)[:, None]
+        if empty.any():
+            centroids[empty] = data[rng.choice(len(data), size=int(empty.sum()), replace=False)]
+    return centroids.astype(np.float32)
+
+
+def _field_values(payload: dict, keys):
+    """(key, value) pairs of indexed scalar payload fields; list values are indexed per element."""
+    for key in keys:
+        value = payload.get(key)
+        for item in value if isinstance(value, list) else [value]:
+            if item is not None and not isinstance(item, (dict, list)):
+                yield key, item
+
+
+def _parts(items: list):
+    for i in range(0, len(items), _MAX_PARAMS):
+        yield items[i:i + _MAX_PARAMS]
+
+
+def _select(payload: dict, with_payload) -> dict | None:
+    """Apply a Qdrant `with_payload` value: bool, list of fields or PayloadSelectorInclude/Exclude."""
+    if with_payload is True:
+        return payload
+    if not with_payload:
+        return None
+    if isinstance(with_payload, models.PayloadSelectorExclude):
+        return {k: v for k, v in payload.items() if k not in with_payload.exclude}
+    include = with_payload.include if isinstance(with_payload, models.PayloadSelectorInclude) else with_payload
+    return {k: payload[k] for k in include if k in payload}
+
+
+def _as_list(conditions):
+    if conditions is None:
+        return []
+    return conditions if isinstance(conditions, list) else [conditions]
+
+
+class LocalIndexClient:
+    """
+    The subset of the QdrantClient API this project uses, served from LocalIndex
+    collections under one directory. Selected with VECTOR_BACKEND=local, so
+    VectorDBStore, BufferedVectorDBStore, setup_qdrant() and the search API run
+    unchanged without a Qdrant server.
+    """
+
+    def __init__(self, path: str = "local_index", dtype: str = "float32", ivf_lists: int = 0, nprobe: int = 8):
+        self.path = path
+        self.dtype = dtype
+        self.ivf_lists = ivf_lists
+        self.nprobe = nprobe
+        self._collections: dict[str, LocalIndex] = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _index(self, name: str) -> LocalIndex:
+        with self._lock:
+            if name not in self._collections:
+                if not self.collection_exists(name):
+                    raise ValueError(f"Collection {name} not found")
+                self._collections[name] = LocalIndex(os.path.join(self.path, name), nprobe=self.nprobe)
+            return self._collections[name]
+
+    # Collections
+    def get_collections(self) -> models.CollectionsResponse:
+        names = sorted(n for n in os.listdir(self.path) if os.path.exists(os.path.join(self.path, n, _META)))
+        return models.CollectionsResponse(collections=[models.CollectionDescription(name=n) for n in names])
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return os.path.exists(os.path.join(self.path, collection_name, _META))
+
+    def create_collection(self, collection_name: str, vectors_config: models.VectorParams, **kwargs) -> bool:
+        # HNSW, quantization and on-disk settings are Qdrant-specific and ignored here
+        distance = getattr(vectors_config.distance, "value", vectors_config.distance)
+        # The one-point marker collections are never worth clustering
+        ivf_lists = self.ivf_lists if vectors_config.size > 1 else 0
+        with self._lock:
+            self._collections[collection_name] = LocalIndex(
+                os.path.join(self.path, collection_name), dim=vectors_config.size, distance=distance,
+                dtype=self.dtype, ivf_lists=ivf_lists, nprobe=self.nprobe,
+            )
+        return True
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema=None, **kwargs):
+        self._index(collection_name).create_field_index(field_name)
+
+    def count(self, collection_name: str, **kwargs) -> models.CountResult:
+        return models.CountResult(count=self._index(collection_name).count)
+
+    # Points
+    def upsert(self, collection_name: str, points, wait: bool = True, **kwargs) -> models.UpdateResult:
+        if isinstance(points, models.Batch):
+            ids, vectors, payloads = points.ids, points.vectors, points.payloads or [None] * len(points.ids)
+        else:
+            ids = [p.id for p in points]
+            vectors = [p.vector for p in points]
+            payloads = [p.payload for p in points]
+        if ids:
+            self._index(collection_name).upsert(list(ids), vectors, list(payloads))
+        return models.UpdateResult(operation_id=0, status=models.UpdateStatus.COMPLETED)
+
+    def delete(self, collection_name: str, points_selector, wait: bool = True, **kwargs) -> models.UpdateResult:
+        ids = points_selector.points if isinstance(points_selector, models.PointIdsList) else list(points_selector)
+        self._index(collection_name).delete(list(ids))
+        return models.UpdateResult(operation_id=0, status=models.UpdateStatus.COMPLETED)
+
+    def retrieve(self, collection_name: str, ids: list, **kwargs) -> list[models.Record]:
+        return [models.Record(id=pid, payload=payload) for pid, payload in self._index(collection_name).retrieve(ids)]
+
+    def query_points(self, collection_name: str, query, query_filter: models.Filter | None = None, limit: int = 10,
+                     search_params: models.SearchParams | None = None, with_payload=True, **kwargs) -> QueryResponse:
+        # Vectors are never returned, as if with_vectors=False
+        exact = bool(search_params and search_params.exact)
+        hits = self._index(collection_name).search(query, limit=limit, query_filter=query_filter, exact=exact)
+        return QueryResponse(points=[
+            models.ScoredPoint(id=pid, version=0, score=score, payload=_select(payload, with_payload))
+            for pid, score, payload in hits
+        ])
+
+    def query_batch_points(self, collection_name: str, requests: list[models.QueryRequest], **kwargs) -> list[QueryResponse]:
+        return [
+            self.query_points(collection_name, r.query, query_filter=r.filter, limit=r.limit or 10, search_params=r.params,
+                              with_payload=True if r.with_payload is None else r.with_payload)
+            for r in requests
+        ]
+
+    def close(self, **kwargs):
+        with self._lock:
+            for index in self._collections.values():
+                index.close()
+            self._collections.clear()
+
+
+class AsyncLocalIndexClient:
+    """Async facade over a LocalIndexClient; calls run in a worker thread so searches don't block the event loop."""
+
+    def __init__(self, client: LocalIndexClient):
+        self._client = client
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+
+_clients: dict[tuple, LocalIndexClient] = {}
+_clients_lock = threading.Lock()
+
+
+def open_local_client(path: str, dtype: str = "float32", ivf_lists: int = 0, nprobe: int = 8) -> LocalIndexClient:
+    """One shared client per directory and settings, so all threads of a process see the same open index."""
+    key = (os.path.abspath(path), dtype, ivf_lists, nprobe)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = LocalIndexClient(path, dtype=dtype, ivf_lists=ivf_lists, nprobe=nprobe)
+        return _clients[key]